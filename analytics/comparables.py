@@ -0,0 +1,365 @@
+# analytics/comparables.py
+import argparse
+import os
+import pickle
+import re
+import sys
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.history import extract_district
+from model.features import FLOOR_ABOVE_10, FLOOR_RE, FLOOR_WORDS, parse_floor
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = 'data/comparables/index.pkl'
+
+# Kolumny wczytywane z magazynu
+SOURCE_COLUMNS = ['url', 'title', 'price', 'area', 'rooms', 'floor', 'year_built', 'address', 'district',
+                  'latitude', 'longitude', 'scrape_date']
+# Atrybuty porównywane w przestrzeni wektorowej (powierzchnia w skali log)
+ATTRIBUTES = ['area', 'rooms', 'year_built', 'floor', 'price_m2']
+DEFAULT_WEIGHTS = {'area': 2.0, 'rooms': 1.0, 'year_built': 0.5, 'floor': 0.25, 'price_m2': 1.0}
+# Waga kilometra odległości w partycji ze współrzędnymi
+GEO_WEIGHT_PER_KM = 0.5
+KM_PER_DEGREE_LAT = 111.2
+KM_PER_DEGREE_LON = 111.2 * np.cos(np.radians(52.2))
+
+
+def comparable_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Ogłoszenia sprowadzone do atrybutów porównywanych (kolumnowo)"""
+    def numeric(name):
+        if name not in df.columns:
+            return np.full(len(df), np.nan)
+        return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+    def text(name):
+        if name not in df.columns:
+            return np.full(len(df), None, dtype=object)
+        return df[name].astype(object).where(df[name].notna(), None).to_numpy(dtype=object)
+
+    price = numeric('price')
+    area = numeric('area')
+    floor = df['floor'] if 'floor' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_m2 = np.where(area > 0, price / area, np.nan)
+    district = extract_district(df)
+    return pd.DataFrame({
+        'url': text('url'),
+        'title': text('title'),
+        'price': price,
+        'area': area,
+        'rooms': numeric('rooms'),
+        # Tekst z parsera albo liczba z wiersza samego indeksu
+        'floor': parse_floor(floor)['floor'].fillna(pd.to_numeric(floor, errors='coerce')).to_numpy(),
+        'year_built': numeric('year_built'),
+        'price_m2': price_m2,
+        'district': district.astype(object).where(district.notna(), None).to_numpy(dtype=object),
+        'latitude': numeric('latitude'),
+        'longitude': numeric('longitude'),
+        'scrape_date': text('scrape_date'),
+    })
+
+
+def _number(value) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return number if np.isfinite(number) else np.nan
+
+
+def comparable_row(listing: Dict[str, Any]) -> Dict[str, Any]:
+    """To samo co `comparable_frame` dla jednego ogłoszenia, bez narzutu pandas"""
+    price = _number(listing.get('price'))
+    area = _number(listing.get('area'))
+    floor = listing.get('floor')
+    if isinstance(floor, str):
+        match = re.match(FLOOR_RE, floor.strip().lower())
+        words = {text: number for text, number in FLOOR_WORDS.values()}
+        floor = (np.nan if match is None else words.get(match.group(1), FLOOR_ABOVE_10) if match.group(1)
+                 else float(match.group(2)))
+    district = listing.get('district')
+    address = listing.get('address')
+    if not isinstance(district, str) and isinstance(address, str) and ',' in address:
+        district = address.split(',', 2)[1].strip()
+    return {
+        'url': listing.get('url'),
+        'price_m2': price / area if area > 0 else np.nan,
+        'area': area,
+        'rooms': _number(listing.get('rooms')),
+        'floor': _number(floor),
+        'year_built': _number(listing.get('year_built')),
+        'district': district if isinstance(district, str) else None,
+        'latitude': _number(listing.get('latitude')),
+        'longitude': _number(listing.get('longitude')),
+    }
+
+
+class _Partition:
+    """Podzbiór ofert z drzewem KD i małym buforem dopisanych od ostatniej przebudowy
+
+    Nowe oferty trafiają do bufora przeszukiwanego siłowo; gdy urośnie
+    ponad `compaction_ratio` drzewa, drzewo jest przebudowywane.
+    """
+
+    def __init__(self):
+        self.tree_rows = np.empty(0, dtype=np.int64)
+        self.tree: Optional[KDTree] = None
+        self.delta_rows: List[int] = []
+        self.delta_vectors: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.tree_rows) + len(self.delta_rows)
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray):
+        self.delta_rows.extend(rows.tolist())
+        self.delta_vectors.extend(vectors)
+
+    def rebuild(self, rows: np.ndarray, vectors: np.ndarray, leaf_size: int):
+        self.tree_rows = rows
+        self.tree = KDTree(vectors, leaf_size=leaf_size) if len(rows) else None
+        self.delta_rows, self.delta_vectors = [], []
+
+    def query(self, vector: np.ndarray, k: int):
+        """(odległości, wiersze) k najbliższych z drzewa i bufora, rosnąco"""
+        distances, rows = [], []
+        if self.tree is not None:
+            tree_k = min(k, len(self.tree_rows))
+            found_distances, found = self.tree.query(vector[None, :], k=tree_k)
+            distances.append(found_distances[0])
+            rows.append(self.tree_rows[found[0]])
+        if self.delta_rows:
+            delta = np.sqrt(((np.asarray(self.delta_vectors) - vector) ** 2).sum(axis=1))
+            distances.append(delta)
+            rows.append(np.asarray(self.delta_rows, dtype=np.int64))
+        if not rows:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        distances = np.concatenate(distances)
+        rows = np.concatenate(rows)
+        order = np.argsort(distances, kind='stable')[:k]
+        return distances[order], rows[order]
+
+
+class ComparablesIndex:
+    """Indeks ofert porównywalnych: drzewa KD nad znormalizowanymi atrybutami
+
+    Partycje: wszystkie oferty, osobno każda dzielnica oraz oferty ze
+    współrzędnymi (wektor uzupełniony o położenie w km). Zapytanie trafia do
+    najwęższej partycji z co najmniej k ofertami. Nowe zrzuty z magazynu
+    są dopisywane przyrostowo (`update`), a ta sama oferta z nowszego zrzutu
+    zastępuje starszą.
+    """
+
+    def __init__(self, weights: Dict[str, float] = None, leaf_size: int = 40, compaction_ratio: float = 0.2,
+                 min_delta: int = 1024):
+        self.weights = np.array([(weights or DEFAULT_WEIGHTS)[name] for name in ATTRIBUTES])
+        self.leaf_size = leaf_size
+        self.compaction_ratio = compaction_ratio
+        self.min_delta = min_delta
+        self.rows = comparable_frame(pd.DataFrame())
+        self.alive = np.empty(0, dtype=bool)
+        self.latest_row: Dict[str, int] = {}
+        self.runs: set = set()
+        self.partitions: Dict[str, _Partition] = {}
+        self.center = np.zeros(len(ATTRIBUTES))
+        self.scale = np.ones(len(ATTRIBUTES))
+        self.scaled_rows = 0
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    def _fit_scaling(self):
+        """Mediana i rozstęp międzykwartylowy atrybutów - wspólna skala wszystkich wymiarów"""
+        values = self._attributes(self.rows[self.alive])
+        self.center = np.nan_to_num(np.nanmedian(values, axis=0))
+        q1, q3 = np.nanpercentile(values, [25, 75], axis=0)
+        spread = np.nan_to_num(q3 - q1)
+        self.scale = np.where(spread > 0, spread, 1.0)
+        self.scaled_rows = len(self)
+
+    @staticmethod
+    def _attributes(rows: pd.DataFrame) -> np.ndarray:
+        values = rows[ATTRIBUTES].to_numpy(dtype=np.float64).copy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values[:, 0] = np.log(values[:, 0])
+        values[~np.isfinite(values)] = np.nan
+        return values
+
+    def _scaled(self, values: np.ndarray, coordinates: np.ndarray = None) -> np.ndarray:
+        """(x - mediana) / IQR * waga; brak wartości = mediana, współrzędne w km"""
+        scaled = np.nan_to_num((values - self.center) / self.scale) * self.weights
+        if coordinates is not None:
+            kilometres = coordinates * np.array([KM_PER_DEGREE_LAT, KM_PER_DEGREE_LON])
+            scaled = np.hstack([scaled, kilometres * GEO_WEIGHT_PER_KM])
+        return scaled
+
+    def vectors(self, rows: pd.DataFrame, geo: bool = False) -> np.ndarray:
+        coordinates = rows[['latitude', 'longitude']].to_numpy(dtype=np.float64) if geo else None
+        return self._scaled(self._attributes(rows), coordinates)
+
+    @staticmethod
+    def _partition_mask(rows: pd.DataFrame, name: str) -> np.ndarray:
+        if name == 'all':
+            return np.ones(len(rows), dtype=bool)
+        if name == 'geo':
+            return rows['latitude'].notna().to_numpy() & rows['longitude'].notna().to_numpy()
+        return rows['district'].to_numpy(dtype=object) == name.split('=', 1)[1]
+
+    @staticmethod
+    def _partition_keys(rows: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Przynależność wierszy do partycji: nazwa -> maska"""
+        keys = {'all': np.ones(len(rows), dtype=bool)}
+        geo = rows['latitude'].notna().to_numpy() & rows['longitude'].notna().to_numpy()
+        if geo.any():
+            keys['geo'] = geo
+        district = rows['district'].to_numpy(dtype=object)
+        for name in pd.unique(district[pd.notna(district)]):
+            keys[f'district={name}'] = district == name
+        return keys
+
+    def add(self, df: pd.DataFrame) -> int:
+        """Dopisuje oferty (np. jeden zrzut), zwraca liczbę dodanych wierszy"""
+        new = comparable_frame(df)
+        new = new[new['price_m2'].notna()].drop_duplicates('url', keep='last').reset_index(drop=True)
+        if new.empty:
+            return 0
+
+        start = len(self.rows)
+        positions = np.arange(start, start + len(new))
+        # Starsza wersja tej samej oferty przestaje być wynikiem
+        for url, position in zip(new['url'], positions):
+            if url is not None:
+                previous = self.latest_row.get(url)
+                if previous is not None:
+                    self.alive[previous] = False
+                self.latest_row[url] = position
+        self.rows = pd.concat([self.rows, new], ignore_index=True) if start else new
+        self.alive = np.concatenate([self.alive, np.ones(len(new), dtype=bool)])
+
+        if not self.scaled_rows or len(self) > 2 * self.scaled_rows:
+            # Rozkład atrybutów mógł się zmienić - nowa skala i przebudowa wszystkiego
+            self._fit_scaling()
+            self.rebuild()
+            return len(new)
+
+        for name, mask in self._partition_keys(new).items():
+            partition = self.partitions.setdefault(name, _Partition())
+            partition.add(positions[mask], self.vectors(new[mask], geo=name == 'geo'))
+            if len(partition.delta_rows) > max(self.min_delta, self.compaction_ratio * len(partition.tree_rows)):
+                self._rebuild_partition(name)
+        return len(new)
+
+    def _rebuild_partition(self, name: str, mask: np.ndarray = None):
+        if mask is None:
+            mask = self._partition_mask(self.rows, name)
+        positions = np.flatnonzero(mask & self.alive)
+        partition = self.partitions.setdefault(name, _Partition())
+        partition.rebuild(positions, self.vectors(self.rows.iloc[positions], geo=name == 'geo'), self.leaf_size)
+
+    def rebuild(self):
+        """Przebudowa wszystkich drzew (pomija oferty zastąpione nowszymi)"""
+        self.partitions = {}
+        for name, mask in self._partition_keys(self.rows).items():
+            self._rebuild_partition(name, mask=mask)
+
+    def update(self, store) -> int:
+        """Dopisuje zrzuty z magazynu, których indeks jeszcze nie widział"""
+        added = 0
+        for run_id in store.runs():
+            if run_id in self.runs:
+                continue
+            added += self.add(store.read(columns=SOURCE_COLUMNS, runs=[run_id]))
+            self.runs.add(run_id)
+            logger.info(f"Indeks ofert porównywalnych: dodano zrzut {run_id}")
+        return added
+
+    def query(self, listing: Dict[str, Any], k: int = 10) -> pd.DataFrame:
+        """k ofert najbardziej podobnych do `listing` (bez niej samej), z odległością"""
+        target = comparable_row(listing)
+        geo = not (np.isnan(target['latitude']) or np.isnan(target['longitude']))
+        district = target['district']
+        candidates = ['geo'] if geo else []
+        candidates += [f'district={district}'] if district else []
+        name = next((name for name in candidates + ['all']
+                     if len(self.partitions.get(name, ())) >= k), 'all')
+        partition = self.partitions.get(name)
+        if partition is None:
+            return self.rows.iloc[:0].assign(distance=[], partition=[])
+
+        values = np.array([[target[name] for name in ATTRIBUTES]], dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values[:, 0] = np.log(values[:, 0])
+        values[~np.isfinite(values)] = np.nan
+        coordinates = np.array([[target['latitude'], target['longitude']]]) if name == 'geo' else None
+        vector = self._scaled(values, coordinates)[0]
+
+        urls = self.rows['url'].to_numpy()
+        fetch = k + 1
+        while True:
+            distances, rows = partition.query(vector, fetch)
+            keep = self.alive[rows] & (urls[rows] != target['url'])
+            if keep.sum() >= k or fetch >= len(partition):
+                break
+            fetch *= 2
+        distances, rows = distances[keep][:k], rows[keep][:k]
+        return self.rows.iloc[rows].assign(distance=distances, partition=name).reset_index(drop=True)
+
+    def save(self, path: str = INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> 'ComparablesIndex':
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    @classmethod
+    def open(cls, path: str = INDEX_PATH, **kwargs) -> 'ComparablesIndex':
+        """Zapisany indeks albo nowy, pusty"""
+        return cls.load(path) if os.path.exists(path) else cls(**kwargs)
+
+
+if __name__ == "__main__":
+    # Klasy z modułu, nie z __main__ - inaczej zapisanego indeksu nie wczyta serwis
+    from analytics.comparables import ComparablesIndex
+    from storage.listing_store import ListingStore
+
+    parser = argparse.ArgumentParser(description="Oferty porównywalne z magazynu")
+    parser.add_argument('--store', default='data/store')
+    parser.add_argument('--index', default=INDEX_PATH)
+    parser.add_argument('--url', help="Pokaż oferty podobne do oferty o tym URLu")
+    parser.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    index = ComparablesIndex.open(args.index)
+    started = time.perf_counter()
+    added = index.update(ListingStore(args.store))
+    if added:
+        index.save(args.index)
+    print(f"Indeks: {len(index)} ofert (dodano {added} w {time.perf_counter() - started:.2f}s)")
+
+    if args.url:
+        position = index.latest_row.get(args.url)
+        if position is None:
+            print(f"Brak oferty {args.url} w indeksie")
+        else:
+            listing = index.rows.iloc[position].to_dict()
+            started = time.perf_counter()
+            found = index.query(listing, k=args.k)
+            print(f"Oferty podobne ({(time.perf_counter() - started) * 1000:.1f} ms):")
+            with pd.option_context('display.width', 160, 'display.max_colwidth', 50):
+                print(found[['title', 'price', 'area', 'rooms', 'district', 'price_m2', 'distance']]
+                      .round(2).to_string())
@@ -0,0 +1,245 @@
+# analytics/dedup.py
+import argparse
+import os
+import re
+import sys
+import time
+import logging
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.history import extract_district
+from scrapers.otodom_urls import offer_id
+
+logger = logging.getLogger(__name__)
+
+DEDUP_DIR = 'data/dedup'
+
+# Kolumny wczytywane z magazynu - opisy tylko partiami, do podpisów MinHash
+SOURCE_COLUMNS = ['url', 'title', 'description', 'price', 'area', 'rooms', 'address', 'district',
+                  'scraped_at', 'scrape_date', 'run_id']
+
+SIGNATURE_SIZE = 64
+# 16 pasm po 4 wiersze: para trafia do kandydatów od podobieństwa ~0.5
+BANDS = 16
+SIMILARITY_THRESHOLD = 0.6
+SHINGLE_WORDS = 3
+# Początek opisu wystarcza do rozpoznania ponownie wystawionej oferty
+MAX_TEXT_CHARS = 2000
+
+WORD_RE = re.compile(r'\w+')
+
+_rng = np.random.RandomState(20250726)
+_MULTIPLIERS = (_rng.randint(1, 2 ** 31, SIGNATURE_SIZE).astype(np.uint64) << np.uint64(32)) | \
+    _rng.randint(1, 2 ** 31, SIGNATURE_SIZE).astype(np.uint64) | np.uint64(1)
+_OFFSETS = (_rng.randint(0, 2 ** 31, SIGNATURE_SIZE).astype(np.uint64) << np.uint64(32)) | \
+    _rng.randint(0, 2 ** 31, SIGNATURE_SIZE).astype(np.uint64)
+_EMPTY = np.iinfo(np.uint32).max
+
+
+def minhash_signatures(texts: Sequence[str], chunk_size: int = 2048) -> np.ndarray:
+    """Podpisy MinHash (n x SIGNATURE_SIZE, uint32) dla trójek słów tekstów
+
+    Słowa całej partii są hashowane naraz (`pd.util.hash_array`), trójki
+    składane arytmetycznie, a minimum po każdej z permutacji liczone
+    `np.minimum.reduceat` dla wszystkich tekstów partii jednocześnie.
+    """
+    signatures = np.full((len(texts), SIGNATURE_SIZE), _EMPTY, dtype=np.uint32)
+    for start in range(0, len(texts), chunk_size):
+        words, lengths = [], []
+        for text in texts[start:start + chunk_size]:
+            tokens = WORD_RE.findall(str(text or '')[:MAX_TEXT_CHARS].lower())
+            words.extend(tokens)
+            lengths.append(len(tokens))
+        if not words:
+            continue
+        lengths = np.array(lengths)
+        hashes = pd.util.hash_array(np.array(words, dtype=object))
+
+        # Trójka słów zaczynająca się na pozycji i; krótsze teksty - pojedyncze słowa
+        shingles = hashes.copy()
+        for offset in range(1, SHINGLE_WORDS):
+            shifted = np.zeros_like(hashes)
+            shifted[:-offset] = hashes[offset:]
+            shingles = shingles * np.uint64(1099511628211) ^ shifted
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        window = np.where(lengths >= SHINGLE_WORDS, lengths - SHINGLE_WORDS + 1, lengths)
+        position = np.arange(len(hashes)) - np.repeat(starts, lengths)
+        valid = position < np.repeat(window, lengths)
+        shingles = np.where(np.repeat(lengths >= SHINGLE_WORDS, lengths), shingles, hashes)[valid]
+        counts = window[lengths > 0]
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        rows = start + np.flatnonzero(lengths > 0)
+        for column in range(SIGNATURE_SIZE):
+            permuted = ((shingles * _MULTIPLIERS[column] + _OFFSETS[column]) >> np.uint64(32)).astype(np.uint32)
+            signatures[rows, column] = np.minimum.reduceat(permuted, offsets)
+    return signatures
+
+
+def _group_pairs(keys: np.ndarray, members: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pary (pierwszy w grupie, pozostały) dla elementów o równych kluczach"""
+    if not len(keys):
+        return members[:0], members[:0]
+    order = np.argsort(keys, kind='stable')
+    keys, members = keys[order], members[order]
+    same = np.concatenate([[False], keys[1:] == keys[:-1]])
+    heads = np.maximum.accumulate(np.where(~same, np.arange(len(keys)), 0))
+    return members[heads[same]], members[same]
+
+
+def candidate_pairs(signatures: np.ndarray, blocks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pary kandydatów z LSH: ten sam blok i identyczne pasmo podpisu
+
+    Każde pasmo łączy tylko z pierwszym elementem swojego kubełka, więc
+    liczba par rośnie liniowo z liczbą ofert, a nie kwadratowo.
+    """
+    present = np.flatnonzero((signatures != _EMPTY).any(axis=1) & (blocks != 0))
+    rows = SIGNATURE_SIZE // BANDS
+    left, right = [], []
+    for band in range(BANDS):
+        values = signatures[present, band * rows:(band + 1) * rows].astype(np.uint64)
+        key = blocks[present] * np.uint64(0x9E3779B97F4A7C15) + np.uint64(band)
+        for column in range(rows):
+            key = key * np.uint64(1099511628211) ^ values[:, column]
+        first, second = _group_pairs(key, present)
+        left.append(first)
+        right.append(second)
+    return np.concatenate(left), np.concatenate(right)
+
+
+def block_keys(frame: pd.DataFrame) -> np.ndarray:
+    """Blok: dzielnica, liczba pokoi i powierzchnia zaokrąglona do m² (0 - bez bloku)
+
+    Sama liczba pokoi i powierzchnia to w dużym mieście tysiące ofert
+    w jednym bloku - podobne opisy z różnych dzielnic (szablony biur)
+    łączyłyby się w jedną ofertę. Bez dzielnicy blokiem są pokoje i metraż.
+    """
+    rooms = pd.to_numeric(frame['rooms'], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    area = pd.to_numeric(frame['area'], errors='coerce').fillna(0).round().to_numpy(dtype=np.int64)
+    district = extract_district(frame).str.lower().fillna('').to_numpy(dtype=object)
+    keys = (rooms * 100003 + area).astype(np.uint64) * np.uint64(0x100000001B3) ^ pd.util.hash_array(district)
+    return np.where((rooms > 0) & (area > 0), keys | np.uint64(1), 0).astype(np.uint64)
+
+
+def assign_identities(frame: pd.DataFrame, signatures: np.ndarray,
+                      threshold: float = SIMILARITY_THRESHOLD) -> pd.Series:
+    """Stały identyfikator oferty dla każdej obserwacji
+
+    Obserwacje łączą się, gdy mają ten sam klucz oferty (ID z URLa) albo
+    gdy ich podpisy MinHash zgadzają się w co najmniej `threshold` pozycji.
+    Identyfikatorem grupy jest klucz najwcześniej zaobserwowanej oferty,
+    więc nie zmienia się po dopisaniu kolejnych zrzutów.
+    """
+    n = len(frame)
+    keys = frame['offer_key'].to_numpy(dtype=object)
+    key_codes = pd.factorize(keys)[0].astype(np.uint64)
+    exact_left, exact_right = _group_pairs(key_codes, np.arange(n))
+
+    near_left, near_right = candidate_pairs(signatures, block_keys(frame))
+    if len(near_left):
+        similarity = (signatures[near_left] == signatures[near_right]).mean(axis=1)
+        keep = similarity >= threshold
+        near_left, near_right = near_left[keep], near_right[keep]
+
+    left = np.concatenate([exact_left, near_left])
+    right = np.concatenate([exact_right, near_right])
+    graph = sparse.coo_matrix((np.ones(len(left), dtype=np.int8), (left, right)), shape=(n, n))
+    _, component = connected_components(graph, directed=False)
+
+    order = np.lexsort((frame['scraped_at'].astype(str).to_numpy(), frame['scrape_date'].astype(str).to_numpy()))
+    first = pd.Series(order).groupby(component[order]).first()
+    return pd.Series(keys[first.loc[component].to_numpy()], index=frame.index, name='identity')
+
+
+def price_history(frame: pd.DataFrame) -> pd.DataFrame:
+    """Zmiany ceny w ramach tożsamości oferty: pierwsza obserwacja i każda zmiana"""
+    observed = frame[frame['price'].notna()].sort_values(['identity', 'scrape_date', 'scraped_at'])
+    grouped = observed.groupby('identity', sort=False)
+    previous_price = grouped['price'].shift()
+    previous_url = grouped['url'].shift()
+    changed = previous_price.isna() | (observed['price'] != previous_price)
+    history = observed.assign(
+        previous_price=previous_price,
+        change_pct=(observed['price'] / previous_price - 1) * 100,
+        relisted=previous_url.notna() & (observed['url'] != previous_url),
+    )[changed | (previous_url.notna() & (observed['url'] != previous_url))]
+    return history[['identity', 'scrape_date', 'url', 'price', 'previous_price', 'change_pct',
+                    'relisted']].reset_index(drop=True)
+
+
+def identity_summary(frame: pd.DataFrame) -> pd.DataFrame:
+    """Jedna linia na tożsamość: pierwsze/ostatnie wystąpienie, liczba URLi i obserwacji"""
+    grouped = frame.sort_values(['scrape_date', 'scraped_at']).groupby('identity')
+    return pd.DataFrame({
+        'first_seen': grouped['scrape_date'].min(),
+        'last_seen': grouped['scrape_date'].max(),
+        'observations': grouped.size(),
+        'urls': grouped['url'].nunique(),
+        'first_price': grouped['price'].first(),
+        'last_price': grouped['price'].last(),
+    }).reset_index()
+
+
+def deduplicate_store(store, start: str = None, end: str = None,
+                      batch_size: int = 16 * 1024) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Tożsamości i historia cen ze wszystkich ukończonych crawli magazynu (`ListingStore.runs`)
+
+    Tytuły i opisy są czytane partiami i od razu zamieniane na podpisy,
+    więc w pamięci zostaje ~256 B na obserwację zamiast pełnych tekstów.
+    """
+    frames: List[pd.DataFrame] = []
+    signatures: List[np.ndarray] = []
+    for batch in store.scan(columns=SOURCE_COLUMNS, start=start, end=end, runs=store.runs(),
+                            batch_size=batch_size):
+        if not batch.num_rows:
+            continue
+        df = batch.to_pandas()
+        texts = (df['title'].fillna('') + ' ' + df['description'].fillna('')).tolist()
+        signatures.append(minhash_signatures(texts))
+        frames.append(df.drop(columns=['title', 'description']))
+    if not frames:
+        empty = pd.DataFrame(columns=['url', 'price', 'scraped_at', 'scrape_date', 'run_id', 'offer_key', 'identity'])
+        return empty, price_history(empty)
+
+    frame = pd.concat(frames, ignore_index=True)
+    frame['price'] = frame['price'].astype('float64')
+    frame['offer_key'] = frame['url'].map(offer_id)
+    frame['identity'] = assign_identities(frame, np.concatenate(signatures))
+    return frame, price_history(frame)
+
+
+if __name__ == "__main__":
+    from storage.listing_store import ListingStore
+
+    parser = argparse.ArgumentParser(description="Deduplikacja ofert między zrzutami i historia cen")
+    parser.add_argument('--store', default='data/store')
+    parser.add_argument('--from', dest='start', help="Pierwsza data zrzutu (RRRR-MM-DD)")
+    parser.add_argument('--to', dest='end', help="Ostatnia data zrzutu (RRRR-MM-DD)")
+    parser.add_argument('--output', default=DEDUP_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    frame, history = deduplicate_store(ListingStore(args.store), start=args.start, end=args.end)
+    summary = identity_summary(frame)
+    elapsed = time.perf_counter() - started
+
+    os.makedirs(args.output, exist_ok=True)
+    frame[['identity', 'offer_key', 'url', 'scrape_date', 'run_id', 'price']].to_parquet(
+        os.path.join(args.output, 'observations.parquet'), index=False)
+    summary.to_parquet(os.path.join(args.output, 'identities.parquet'), index=False)
+    history.to_parquet(os.path.join(args.output, 'price_history.parquet'), index=False)
+
+    print(f"{len(frame)} obserwacji -> {len(summary)} ofert ({elapsed:.1f}s)")
+    print(f"   - wystawione ponownie pod nowym URLem: {(summary['urls'] > 1).sum()}")
+    print(f"   - ze zmianą ceny: {history.loc[history['change_pct'].fillna(0) != 0, 'identity'].nunique()}")
+    print(f"Zapisano wyniki do {args.output}")
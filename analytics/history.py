@@ -0,0 +1,146 @@
+# analytics/history.py
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .sketches import QuantileSketch
+
+# Kolumny potrzebne do trendów - tylko je wczytujemy z magazynu
+HISTORY_COLUMNS = ['price', 'area', 'rooms', 'address', 'district', 'scrape_date']
+GROUPINGS = ['district', 'rooms']
+
+
+def extract_district(df: pd.DataFrame) -> pd.Series:
+    """Dzielnica z kolumny `district`, a gdy jej brak - drugi człon adresu"""
+    from_address = pd.Series(None, index=df.index, dtype=object)
+    if 'address' in df.columns:
+        from_address = df['address'].astype('string').str.split(',', n=2).str[1].str.strip()
+    if 'district' in df.columns:
+        return df['district'].astype('string').fillna(from_address)
+    return from_address
+
+
+class GroupStats:
+    """Liczniki, sumy i szkice kwantyli cen jednej grupy - można je łączyć"""
+    __slots__ = ('count', 'price_sum', 'price_m2_sum', 'price_m2_count', 'price', 'price_m2')
+
+    def __init__(self, relative_accuracy: float):
+        self.count = 0
+        self.price_sum = 0.0
+        self.price_m2_sum = 0.0
+        self.price_m2_count = 0
+        self.price = QuantileSketch(relative_accuracy)
+        self.price_m2 = QuantileSketch(relative_accuracy)
+
+    def add(self, prices: np.ndarray, prices_m2: np.ndarray):
+        """Dodaje ceny i ceny za m² (NaN, gdy brak powierzchni)"""
+        valid_m2 = prices_m2[np.isfinite(prices_m2)]
+        self.count += len(prices)
+        self.price_sum += float(prices.sum())
+        self.price_m2_sum += float(valid_m2.sum())
+        self.price_m2_count += len(valid_m2)
+        self.price.add(prices)
+        self.price_m2.add(valid_m2)
+
+    def merge(self, other: 'GroupStats') -> 'GroupStats':
+        self.count += other.count
+        self.price_sum += other.price_sum
+        self.price_m2_sum += other.price_m2_sum
+        self.price_m2_count += other.price_m2_count
+        self.price.merge(other.price)
+        self.price_m2.merge(other.price_m2)
+        return self
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'mean_price': self.price_sum / self.count if self.count else np.nan,
+            'median_price': self.price.median(),
+            'mean_price_m2': self.price_m2_sum / self.price_m2_count if self.price_m2_count else np.nan,
+            'median_price_m2': self.price_m2.median(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'price_sum': self.price_sum,
+            'price_m2_sum': self.price_m2_sum,
+            'price_m2_count': self.price_m2_count,
+            'price': self.price.to_dict(),
+            'price_m2': self.price_m2.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'GroupStats':
+        stats = cls(data['price']['relative_accuracy'])
+        stats.count = data['count']
+        stats.price_sum = data['price_sum']
+        stats.price_m2_sum = data['price_m2_sum']
+        stats.price_m2_count = data['price_m2_count']
+        stats.price = QuantileSketch.from_dict(data['price'])
+        stats.price_m2 = QuantileSketch.from_dict(data['price_m2'])
+        return stats
+
+
+class HistoryAggregator:
+    """Jednoprzebiegowa agregacja cen po dzielnicach i liczbie pokoi w czasie
+
+    Stan to liczniki, sumy i szkice kwantyli na grupę (grupa, data zrzutu),
+    więc zużycie pamięci nie zależy od liczby przetworzonych wierszy.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.groups: Dict[Tuple[str, str, str], GroupStats] = {}
+        self.rows = 0
+
+    def add_batch(self, df: pd.DataFrame):
+        """Dodaje partię wierszy (wszystko liczone kolumnowo)"""
+        self.rows += len(df)
+        df = df[df['price'].notna()]
+        if df.empty:
+            return
+
+        price = df['price'].astype('float64').to_numpy()
+        area = df['area'].astype('float64').to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price_m2 = np.where(area > 0, price / area, np.nan)
+
+        frame = pd.DataFrame({
+            'district': extract_district(df).to_numpy(),
+            'rooms': df['rooms'].astype('Int64').astype('string').to_numpy(),
+            'scrape_date': df['scrape_date'].astype('string').to_numpy(),
+            'price': price,
+            'price_m2': price_m2,
+        })
+
+        for grouping in GROUPINGS:
+            grouped = frame.dropna(subset=[grouping]).groupby([grouping, 'scrape_date'], sort=False)
+            for (value, scrape_date), indices in grouped.indices.items():
+                key = (grouping, value, scrape_date)
+                stats = self.groups.get(key)
+                if stats is None:
+                    stats = self.groups[key] = GroupStats(self.relative_accuracy)
+                stats.add(frame['price'].to_numpy()[indices], frame['price_m2'].to_numpy()[indices])
+
+    def results(self) -> pd.DataFrame:
+        """Tabela trendów: jedna linia na (grupowanie, grupa, data zrzutu)"""
+        rows: List[dict] = []
+        for (grouping, value, scrape_date), stats in self.groups.items():
+            rows.append({'grouping': grouping, 'group': value, 'scrape_date': scrape_date, **stats.summary()})
+        columns = ['grouping', 'group', 'scrape_date', 'count', 'mean_price', 'median_price',
+                   'mean_price_m2', 'median_price_m2']
+        return pd.DataFrame(rows, columns=columns).sort_values(['grouping', 'group', 'scrape_date'],
+                                                               ignore_index=True)
+
+
+def aggregate_history(store, start: str = None, end: str = None, batch_size: int = 64 * 1024,
+                      relative_accuracy: float = 0.01) -> HistoryAggregator:
+    """Agreguje wszystkie ukończone crawle z magazynu (`ListingStore.runs`) w jednym przebiegu"""
+    aggregator = HistoryAggregator(relative_accuracy)
+    for batch in store.scan(columns=HISTORY_COLUMNS, start=start, end=end, runs=store.runs(),
+                            batch_size=batch_size):
+        if batch.num_rows:
+            aggregator.add_batch(batch.to_pandas())
+    return aggregator
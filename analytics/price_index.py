@@ -0,0 +1,266 @@
+# analytics/price_index.py
+import argparse
+import json
+import os
+import sys
+import time
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.history import GroupStats, extract_district
+from storage.listing_store import run_date
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = 'data/price_index/index.json'
+
+# Kolumny wczytywane z magazynu
+SOURCE_COLUMNS = ['price', 'area', 'rooms', 'market', 'address', 'district', 'scrape_date', 'run_id']
+# Wymiary klucza komórki indeksu
+DIMENSIONS = ['district', 'rooms', 'market', 'week']
+
+Key = Tuple[Optional[str], Optional[str], Optional[str], str]
+
+
+def week_start(day: str) -> str:
+    """Poniedziałek tygodnia (ISO) zawierającego dzień RRRR-MM-DD"""
+    value = date.fromisoformat(day[:10])
+    return (value - timedelta(days=value.weekday())).isoformat()
+
+
+def listing_district(listing: Dict[str, Any]) -> Optional[str]:
+    """Odpowiednik `extract_district` dla pojedynczego ogłoszenia"""
+    if listing.get('district') is not None:
+        return listing['district']
+    parts = (listing.get('address') or '').split(',', 2)
+    return parts[1].strip() if len(parts) > 1 else None
+
+
+def _key_value(value) -> Optional[str]:
+    return None if value is None or value is pd.NA or value != value else value
+
+
+class PriceIndex:
+    """Zmaterializowany indeks cen: (dzielnica, pokoje, rynek, tydzień)
+
+    Każda komórka trzyma liczniki, sumy i szkice kwantyli (`GroupStats`),
+    więc zapytanie o dowolny wycinek to złączenie kilku komórek, bez
+    czytania surowych zrzutów. Ogłoszenia dopisywane w trakcie crawla
+    (`add`) czekają w komórkach bieżącego zrzutu i trafiają do indeksu
+    przy `commit` - zapisany indeks obejmuje tylko całe zrzuty (`runs`),
+    a jego stan jest taki sam, jak po przebudowie z magazynu.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.cells: Dict[Key, GroupStats] = {}
+        self.runs: set = set()
+        # Zrzuty w toku: run_id -> komórki i liczba dopisanych ogłoszeń
+        self.pending: Dict[str, Dict[Key, GroupStats]] = {}
+        self.pending_rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def _stats(self, cells: Dict[Key, GroupStats], key: Key) -> GroupStats:
+        stats = cells.get(key)
+        if stats is None:
+            stats = cells[key] = GroupStats(self.relative_accuracy)
+        return stats
+
+    def add(self, listing: Dict[str, Any], run_id: str):
+        """Dopisuje jedno ogłoszenie zapisywanego zrzutu"""
+        cells = self.pending.setdefault(run_id, {})
+        self.pending_rows[run_id] = self.pending_rows.get(run_id, 0) + 1
+        price = listing.get('price')
+        if price is None:
+            return
+        area = listing.get('area')
+        price_m2 = float(price) / float(area) if area is not None and area > 0 else np.nan
+        rooms = listing.get('rooms')
+        key = (listing_district(listing), None if rooms is None else str(int(rooms)),
+               listing.get('market'), week_start(run_date(run_id)))
+        self._stats(cells, key).add(np.array([price], dtype=np.float64), np.array([price_m2]))
+
+    def add_batch(self, df: pd.DataFrame, cells: Dict[Key, GroupStats] = None):
+        """Dodaje partię wierszy z magazynu (kolumny jak w SOURCE_COLUMNS)"""
+        cells = self.cells if cells is None else cells
+        df = df[df['price'].notna()]
+        if df.empty:
+            return
+
+        price = df['price'].astype('float64').to_numpy()
+        area = df['area'].astype('float64').to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price_m2 = np.where(area > 0, price / area, np.nan)
+        scrape_date = df['scrape_date'].astype('string')
+        weeks = {day: week_start(day) for day in scrape_date.unique()}
+
+        frame = pd.DataFrame({
+            'district': extract_district(df).to_numpy(),
+            'rooms': df['rooms'].astype('Int64').astype('string').to_numpy(),
+            'market': df['market'].astype('string').to_numpy(),
+            'week': scrape_date.map(weeks).to_numpy(),
+        })
+        for key, indices in frame.groupby(DIMENSIONS, sort=False, dropna=False).indices.items():
+            key = tuple(_key_value(value) for value in key)
+            self._stats(cells, key).add(price[indices], price_m2[indices])
+
+    def update(self, store, runs: Sequence[str] = None, batch_size: int = 64 * 1024) -> int:
+        """Dodaje z magazynu zrzuty, których indeks jeszcze nie zawiera - jeden przebieg
+
+        Te same zrzuty co trendy i deduplikacja (`ListingStore.runs`) -
+        ukończone crawle, bez zrzutów w toku i z reparse.py.
+        """
+        missing = [run_id for run_id in store.runs() if run_id not in self.runs]
+        if runs is not None:
+            missing = [run_id for run_id in missing if run_id in runs]
+        if not missing:
+            return 0
+        rows = 0
+        for batch in store.scan(columns=SOURCE_COLUMNS, runs=missing, batch_size=batch_size):
+            if batch.num_rows:
+                self.add_batch(batch.to_pandas())
+                rows += batch.num_rows
+        self.runs.update(missing)
+        logger.info(f"Indeks cen: dodano {len(missing)} zrzutów ({rows} wierszy)")
+        return rows
+
+    def commit(self, run_id: str, rows: int, store=None):
+        """Przenosi ukończony zrzut do indeksu
+
+        Gdy indeks nie widział wszystkich `rows` ogłoszeń zrzutu (crawl
+        wznowiony po przerwaniu), zrzut jest wczytywany z magazynu.
+        """
+        cells = self.pending.pop(run_id, {})
+        added = self.pending_rows.pop(run_id, 0)
+        if run_id in self.runs:
+            return
+        if added == rows:
+            for key, stats in cells.items():
+                self._stats(self.cells, key).merge(stats)
+            self.runs.add(run_id)
+        elif store is not None:
+            self.update(store, runs=[run_id])
+
+    @classmethod
+    def rebuild(cls, store, relative_accuracy: float = 0.01, batch_size: int = 64 * 1024) -> 'PriceIndex':
+        """Indeks od zera z całej historii w magazynie"""
+        index = cls(relative_accuracy)
+        index.update(store, batch_size=batch_size)
+        return index
+
+    def _matching(self, district: str = None, rooms=None, market: str = None, week: str = None,
+                  start: str = None, end: str = None) -> Iterable[Tuple[Key, GroupStats]]:
+        rooms = None if rooms is None else str(rooms)
+        week = week_start(week) if week else None
+        start = week_start(start) if start else None
+        for cells in [self.cells, *self.pending.values()]:
+            for key, stats in cells.items():
+                if ((district is None or key[0] == district) and (rooms is None or key[1] == rooms)
+                        and (market is None or key[2] == market) and (week is None or key[3] == week)
+                        and (start is None or key[3] >= start) and (end is None or key[3] <= end)):
+                    yield key, stats
+
+    def query(self, district: str = None, rooms=None, market: str = None, week: str = None,
+              start: str = None, end: str = None) -> Dict[str, float]:
+        """Statystyki cen wycinka; pominięty wymiar oznacza wszystkie wartości
+
+        `week` to dowolny dzień tygodnia, `start`/`end` - zakres dni.
+        Obejmuje też ogłoszenia zrzutów w toku.
+        """
+        total = GroupStats(self.relative_accuracy)
+        for _, stats in self._matching(district, rooms, market, week, start, end):
+            total.merge(stats)
+        return total.summary()
+
+    def table(self, by: Sequence[str] = ('district', 'week'), **filters) -> pd.DataFrame:
+        """Statystyki wycinka pogrupowane po wybranych wymiarach"""
+        positions = [DIMENSIONS.index(name) for name in by]
+        groups: Dict[tuple, GroupStats] = {}
+        for key, stats in self._matching(**filters):
+            self._stats(groups, tuple(key[i] for i in positions)).merge(stats)
+        rows = [{**dict(zip(by, key)), **stats.summary()} for key, stats in groups.items()]
+        columns = list(by) + ['count', 'mean_price', 'median_price', 'mean_price_m2', 'median_price_m2']
+        return pd.DataFrame(rows, columns=columns).sort_values(list(by), ignore_index=True)
+
+    def save(self, path: str = INDEX_PATH):
+        """Zapis zatwierdzonych zrzutów (bez zrzutów w toku)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        state = {
+            'relative_accuracy': self.relative_accuracy,
+            'runs': sorted(self.runs),
+            'cells': [[*key, stats.to_dict()] for key, stats in self.cells.items()],
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> 'PriceIndex':
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        index = cls(state['relative_accuracy'])
+        index.runs = set(state['runs'])
+        index.cells = {tuple(cell[:4]): GroupStats.from_dict(cell[4]) for cell in state['cells']}
+        return index
+
+    @classmethod
+    def open(cls, path: str = INDEX_PATH, **kwargs) -> 'PriceIndex':
+        """Zapisany indeks albo nowy, pusty"""
+        return cls.load(path) if os.path.exists(path) else cls(**kwargs)
+
+
+def main(argv: List[str] = None):
+    from storage.listing_store import ListingStore
+
+    parser = argparse.ArgumentParser(description="Indeks cen wg dzielnicy, liczby pokoi, rynku i tygodnia")
+    parser.add_argument('--store', default='data/store')
+    parser.add_argument('--index', default=INDEX_PATH)
+    parser.add_argument('--rebuild', action='store_true', help="Przebuduj indeks z całej historii")
+    parser.add_argument('--district')
+    parser.add_argument('--rooms', type=int)
+    parser.add_argument('--market', help="np. pierwotny, wtórny")
+    parser.add_argument('--week', help="Dowolny dzień tygodnia (RRRR-MM-DD)")
+    parser.add_argument('--from', dest='start', help="Od dnia (RRRR-MM-DD)")
+    parser.add_argument('--to', dest='end', help="Do dnia (RRRR-MM-DD)")
+    parser.add_argument('--by', nargs='+', choices=DIMENSIONS, help="Tabela pogrupowana po wymiarach")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = ListingStore(args.store)
+    started = time.perf_counter()
+    if args.rebuild:
+        index = PriceIndex.rebuild(store)
+        index.save(args.index)
+    else:
+        index = PriceIndex.open(args.index)
+        if index.update(store):
+            index.save(args.index)
+    print(f"Indeks: {len(index)} komórek, {len(index.runs)} zrzutów ({time.perf_counter() - started:.2f}s)")
+
+    filters = dict(district=args.district, rooms=args.rooms, market=args.market, week=args.week,
+                   start=args.start, end=args.end)
+    started = time.perf_counter()
+    if args.by:
+        result = index.table(by=args.by, **filters)
+        elapsed = time.perf_counter() - started
+        with pd.option_context('display.width', 160, 'display.max_rows', 200):
+            print(result.round(0).to_string(index=False))
+    else:
+        result = index.query(**filters)
+        elapsed = time.perf_counter() - started
+        print(json.dumps({name: round(value, 2) for name, value in result.items()}, ensure_ascii=False))
+    print(f"Zapytanie: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
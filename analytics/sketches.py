@@ -0,0 +1,83 @@
+# analytics/sketches.py
+import math
+from typing import Any, Dict
+
+import numpy as np
+
+
+class QuantileSketch:
+    """Szkic kwantyli ze stałym błędem względnym (w stylu DDSketch)
+
+    Wartości trafiają do kubełków o granicach rosnących geometrycznie, więc
+    mediana jest obarczona błędem co najwyżej `relative_accuracy`, a rozmiar
+    szkicu zależy od rozpiętości wartości, nie od ich liczby. Szkice o tej
+    samej dokładności można łączyć (`merge`) - wynik jest taki sam, jak przy
+    jednym przebiegu po wszystkich danych.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, values) -> 'QuantileSketch':
+        """Dodaje tablicę wartości (braki i wartości ujemne są pomijane)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values) & (values >= 0)]
+        if not len(values):
+            return self
+
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        self.count += len(values)
+        if len(positive):
+            keys, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype(np.int64),
+                                     return_counts=True)
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                self.bins[key] = self.bins.get(key, 0) + count
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Nie można łączyć szkiców o różnej dokładności")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Przybliżony kwantyl rzędu q (0..1); NaN dla pustego szkicu"""
+        if not self.count:
+            return float('nan')
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'bins': {str(key): count for key, count in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'])
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.bins = {int(key): count for key, count in data['bins'].items()}
+        return sketch
@@ -1,23 +1,41 @@
 # analyze_data.py
-import pandas as pd
+import argparse
 import json
 import os
-from datetime import datetime
-import numpy as np
+import sys
 
-def analyze_scraped_data(file_path):
-    """Analizuje zebrane dane i pokazuje statystyki"""
-    
-    print(f"\n{'='*60}")
-    print(f"ANALIZA DANYCH Z PLIKU: {os.path.basename(file_path)}")
-    print(f"{'='*60}\n")
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# pandas i analytics importowane w funkcjach - sam start i komunikaty o braku danych bez ich kosztu
+
+def load_listings(file_path):
+    """Wczytuje zrzut ogłoszeń z pliku CSV/JSON/JSONL/Parquet"""
+    import pandas as pd
     
     if file_path.endswith('.json'):
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
         df = pd.DataFrame(data)
+    elif file_path.endswith('.jsonl'):
+        df = pd.read_json(file_path, lines=True)
+    elif file_path.endswith('.parquet'):
+        df = pd.read_parquet(file_path)
     else:
         df = pd.read_csv(file_path)
+    return df
+
+
+def analyze_scraped_data(file_path, df=None):
+    """Analizuje zebrane dane i pokazuje statystyki"""
+    import pandas as pd
+    from analytics.history import extract_district
+    
+    print(f"\n{'='*60}")
+    print(f"ANALIZA DANYCH Z PLIKU: {os.path.basename(file_path)}")
+    print(f"{'='*60}\n")
+    
+    if df is None:
+        df = load_listings(file_path)
     
     print(f"Podstawowe informacje:")
     print(f"   - Liczba ofert: {len(df)}")
@@ -26,12 +44,12 @@ def analyze_scraped_data(file_path):
     
     print(f"Kompletność danych:")
     for col in df.columns:
-        if col not in ['url', 'scraped_at']:
+        if col not in ['url', 'scraped_at', 'scrape_date', 'run_id']:
             non_empty = df[col].notna().sum()
             if col == 'features':
-                non_empty = sum(1 for f in df[col] if f and len(f) > 0)
+                non_empty = (df[col].str.len().fillna(0) > 0).sum()
             elif col == 'description':
-                non_empty = sum(1 for d in df[col] if d and len(str(d).strip()) > 0)
+                non_empty = (df[col].astype('string').str.strip().str.len().fillna(0) > 0).sum()
             
             percentage = (non_empty / len(df)) * 100
             status = "OK" if percentage > 80 else "WARN" if percentage > 50 else "BRAK"
@@ -83,7 +101,7 @@ def analyze_scraped_data(file_path):
     
     if 'address' in df.columns and df['address'].notna().any():
         print(f"\nNajpopularniejsze lokalizacje:")
-        df['district'] = df['address'].apply(lambda x: str(x).split(',')[1].strip() if pd.notna(x) and ',' in str(x) else None)
+        df['district'] = extract_district(df)
         if df['district'].notna().any():
             district_counts = df['district'].value_counts().head(10)
             for district, count in district_counts.items():
@@ -109,21 +127,92 @@ def analyze_scraped_data(file_path):
     print(f"\n{'='*60}\n")
 
 
-if __name__ == "__main__":
-    data_dir = "data/raw"
-    
+def latest_file(data_dir):
+    """Najnowszy plik z ogłoszeniami w katalogu (bez wskaźników latest)"""
     files = []
     if os.path.exists(data_dir):
         for file in os.listdir(data_dir):
-            if file.endswith(('.json', '.csv')) and 'otodom' in file:
+            if file.endswith(('.json', '.jsonl', '.csv')) and 'otodom' in file:
                 file_path = os.path.join(data_dir, file)
+                if os.path.islink(file_path):
+                    continue
                 files.append((file_path, os.path.getmtime(file_path)))
     
-    if files:
-        files.sort(key=lambda x: x[1], reverse=True)
-        latest_file = files[0][0]
+    if not files:
+        return None
+    files.sort(key=lambda x: x[1], reverse=True)
+    return files[0][0]
+
+
+def analyze_history(store, start=None, end=None, top=10):
+    """Trendy cen we wszystkich zrzutach - jeden strumieniowy przebieg"""
+    import pandas as pd
+    from analytics.history import aggregate_history
+    
+    print(f"\n{'='*60}")
+    print(f"ANALIZA HISTORII: {len(store.runs())} zrzutów")
+    print(f"{'='*60}\n")
+    
+    aggregator = aggregate_history(store, start=start, end=end)
+    trends = aggregator.results()
+    print(f"Przetworzono {aggregator.rows} wierszy")
+    if trends.empty:
+        print("Brak ofert z ceną w wybranym okresie")
+        return trends
+    
+    with pd.option_context('display.width', 160, 'display.max_columns', 20):
+        districts = trends[trends['grouping'] == 'district']
+        if not districts.empty:
+            busiest = districts.groupby('group')['count'].sum().nlargest(top).index
+            print(f"\nMediana ceny za m² wg dzielnic (top {top}):")
+            print(districts[districts['group'].isin(busiest)]
+                  .pivot(index='group', columns='scrape_date', values='median_price_m2')
+                  .round(0).to_string())
         
-        print(f"Analizuję najnowszy plik: {latest_file}")
-        analyze_scraped_data(latest_file)
+        rooms = trends[trends['grouping'] == 'rooms']
+        if not rooms.empty:
+            print(f"\nMediana ceny wg liczby pokoi:")
+            print(rooms.pivot(index='group', columns='scrape_date', values='median_price').round(0).to_string())
+            print(f"\nMediana ceny za m² wg liczby pokoi:")
+            print(rooms.pivot(index='group', columns='scrape_date', values='median_price_m2').round(0).to_string())
+    
+    print(f"\n{'='*60}\n")
+    return trends
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analiza zebranych ogłoszeń")
+    parser.add_argument('--history', action='store_true', help="Trendy cen ze wszystkich zrzutów w magazynie")
+    parser.add_argument('--from', dest='start', help="Pierwsza data zrzutu (RRRR-MM-DD)")
+    parser.add_argument('--to', dest='end', help="Ostatnia data zrzutu (RRRR-MM-DD)")
+    parser.add_argument('--output', help="Zapis tabeli trendów do pliku CSV")
+    args = parser.parse_args(argv)
+    
+    from storage.listing_store import ListingStore
+    
+    data_dir = "data/raw"
+    store = ListingStore('data/store')
+    snapshots = store.runs()
+    latest = latest_file(data_dir)
+    
+    if args.history:
+        if snapshots:
+            trends = analyze_history(store, start=args.start, end=args.end)
+            if args.output:
+                trends.to_csv(args.output, index=False)
+                print(f"Zapisano trendy do {args.output}")
+        else:
+            print("Magazyn data/store jest pusty - zaimportuj zrzuty: python storage/listing_store.py data/raw/*.csv")
+    elif snapshots:
+        run_id = snapshots[-1]
+        print(f"Analizuję najnowszy zrzut z magazynu: {run_id}")
+        analyze_scraped_data(store.run_dir(run_id), df=store.read(runs=[run_id]))
+    elif latest:
+        print(f"Analizuję najnowszy plik: {latest}")
+        analyze_scraped_data(latest)
     else:
-        print("Nie znaleziono plików z danymi w katalogu data/raw/")
\ No newline at end of file
+        print("Nie znaleziono plików z danymi w katalogu data/raw/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# benchmarks/corpus.py
+import json
+import os
+import random
+import sys
+import zlib
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'fixtures')
+SOURCE_FILE = os.path.join(ROOT_DIR, 'data', 'raw', 'otodom_listings_20250726_212042.json')
+
+OFFERS_PER_SEARCH_PAGE = 36
+
+FLOOR_CODES = {'parter': 'ground_floor', 'suterena': 'cellar', 'poddasze': 'garret'}
+MARKET_CODES = {'pierwotny': 'PRIMARY', 'wtórny': 'SECONDARY'}
+ADVERTISER_CODES = {'prywatny': 'private', 'biuro nieruchomości': 'agency', 'deweloper': 'developer'}
+
+
+def offer_slug(url: str) -> str:
+    return urlsplit(url).path.rstrip('/').rsplit('/', 1)[-1]
+
+
+def _filler(rng: random.Random, size: int) -> str:
+    """Nawigacja, skrypty i stopka - objętość typowa dla prawdziwej strony"""
+    words = ['mieszkanie', 'kawalerka', 'dom', 'działka', 'Warszawa', 'Kraków', 'Mokotów', 'Wola',
+             'inwestycja', 'kredyt', 'ogłoszenie', 'sprzedaż', 'wynajem', 'kontakt', 'regulamin']
+    parts = []
+    total = 0
+    while total < size:
+        word = rng.choice(words)
+        chunk = (f'<li class="nav-{rng.randint(0, 999)}"><a href="/pl/{word.lower()}/{rng.randint(0, 99999)}">'
+                 f'{word}</a></li><script>window.__t{rng.randint(0, 99999)}={rng.random()};</script>')
+        parts.append(chunk)
+        total += len(chunk)
+    return ''.join(parts)
+
+
+def _money(value: int) -> str:
+    return f"{value:,}".replace(',', ' ')
+
+
+def _characteristic(key: str, value: Any, localized: str = None) -> Dict[str, Any]:
+    return {'key': key, 'value': '' if value is None else str(value),
+            'localizedValue': localized if localized is not None else str(value)}
+
+
+def build_ad(listing: Dict[str, Any]) -> Dict[str, Any]:
+    """Obiekt `ad` z __NEXT_DATA__ odtworzony z zapisanego ogłoszenia"""
+    characteristics = []
+    if listing.get('price'):
+        characteristics.append(_characteristic('price', listing['price'], f"{_money(listing['price'])} zł"))
+    if listing.get('area'):
+        characteristics.append(_characteristic('m', listing['area'], f"{listing['area']} m²".replace('.', ',')))
+    if listing.get('rooms'):
+        characteristics.append(_characteristic('rooms_num', listing['rooms']))
+    if listing.get('floor'):
+        floor = str(listing['floor'])
+        code = FLOOR_CODES.get(floor, f'floor_{floor}')
+        characteristics.append(_characteristic('floor_no', code, floor))
+    if listing.get('rent'):
+        characteristics.append(_characteristic('rent', listing['rent'], f"{_money(listing['rent'])} zł"))
+    for key, field in [('construction_status', 'finish_state'), ('building_ownership', 'ownership'),
+                       ('building_type', 'building_type'), ('building_material', 'building_material')]:
+        if listing.get(field):
+            characteristics.append(_characteristic(key, listing[field], listing[field]))
+    if listing.get('year_built'):
+        characteristics.append(_characteristic('build_year', listing['year_built']))
+
+    address = listing.get('address') or ''
+    street = address.split(',')[0] if address.startswith('ul.') else None
+    extras = ['lift'] if listing.get('elevator') else []
+
+    return {
+        'id': zlib.crc32(listing['url'].encode('utf-8')) % 10 ** 8,
+        'title': listing.get('title') or '',
+        'market': MARKET_CODES.get(listing.get('market')),
+        'advertiserType': ADVERTISER_CODES.get(listing.get('advertiser_type')),
+        'characteristics': characteristics,
+        'target': {'Extras_types': extras},
+        'features': listing.get('features') or [],
+        'location': {'address': {
+            'street': {'name': street} if street else None,
+            'city': {'name': 'Warszawa'},
+        }},
+        'description': f"<p>{listing.get('title') or ''}</p><p>{'Mieszkanie na sprzedaż. ' * 40}</p>",
+    }
+
+
+def build_offer_page(listing: Dict[str, Any], rng: random.Random, padding: int, legacy: bool) -> str:
+    """Strona oferty - z blokiem __NEXT_DATA__ albo sam tekst (ścieżka zapasowa)"""
+    title = listing.get('title') or ''
+    rows = []
+    if listing.get('price'):
+        rows.append(f"<strong>{_money(listing['price'])} zł</strong>")
+    rows.append(f"<div>{str(listing.get('area', '')).replace('.', ',')} m²</div>")
+    if listing.get('rooms'):
+        rows.append(f"<div>Liczba pokoi: {listing['rooms']}</div>")
+    if listing.get('floor'):
+        rows.append(f"<div>Piętro: {listing['floor']}/5</div>")
+
+    params = []
+    params.append(f"Czynsz: {_money(listing['rent']) + ' zł' if listing.get('rent') else 'brak informacji'}")
+    params.append(f"Stan wykończenia: {listing.get('finish_state') or 'brak informacji'}")
+    if listing.get('market'):
+        params.append(f"Rynek: {listing['market']}")
+    params.append(f"Forma własności: {listing.get('ownership') or 'brak informacji'}")
+    params.append(f"Typ ogłoszeniodawcy: {listing.get('advertiser_type') or 'brak informacji'}")
+    params.append(f"Informacje dodatkowe: {' '.join(listing.get('features') or [])}")
+    params.append(f"BudynekRok budowy: {listing.get('year_built') or 'brak informacji'}")
+    params.append(f"Winda: {'tak' if listing.get('elevator') else 'nie'}")
+    params.append(f"Rodzaj zabudowy: {listing.get('building_type') or 'brak informacji'}")
+    params.append(f"Materiał budynku: {listing.get('building_material') or 'brak informacji'}")
+    params_html = ''.join(f'<div>{param}</div>' for param in params)
+
+    description = f"OpisPokaż więcej<p>{'Mieszkanie na sprzedaż. ' * 40}</p>ID: {rng.randint(10 ** 7, 10 ** 8)}"
+    meta = f"Mieszkanie na sprzedaż w miejscowości Warszawa, {listing.get('address') or 'Warszawa'}"
+    state = ''
+    if not legacy:
+        next_data = {'props': {'pageProps': {'ad': build_ad(listing)}}, 'page': '/pl/oferta/[slug]'}
+        state = (f'<script id="__NEXT_DATA__" type="application/json">'
+                 f'{json.dumps(next_data, ensure_ascii=False)}</script>')
+
+    return (f'<!DOCTYPE html><html lang="pl"><head><meta charset="utf-8"><title>{title}</title>'
+            f'<meta name="description" content="{meta}"></head><body>'
+            f'<nav><ul>{_filler(rng, padding // 2)}</ul></nav><main><h1>{title}</h1>'
+            f'{"".join(rows)}<section>{params_html}</section><section>{description}</section></main>'
+            f'<footer><ul>{_filler(rng, padding // 2)}</ul></footer>{state}</body></html>')
+
+
+def build_search_page(slugs: List[str], rng: random.Random, padding: int) -> str:
+    articles = ''.join(
+        f'<article><a data-cy="listing.link" href="/pl/oferta/{slug}">'
+        f'<p>Oferta {i + 1}</p></a></article>' for i, slug in enumerate(slugs)
+    )
+    return (f'<!DOCTYPE html><html lang="pl"><head><meta charset="utf-8"></head><body>'
+            f'<nav><ul>{_filler(rng, padding)}</ul></nav><main>{articles}</main></body></html>')
+
+
+def build_corpus(directory: str = CORPUS_DIR, source: str = SOURCE_FILE, padding: int = 200 * 1024,
+                 seed: int = 20250726) -> Dict[str, Any]:
+    """Generuje deterministyczny korpus stron z zapisanego zrzutu ogłoszeń"""
+    rng = random.Random(seed)
+    with open(source, 'r', encoding='utf-8') as f:
+        listings = json.load(f)
+
+    for sub in ('offer', 'offer-legacy', 'search'):
+        os.makedirs(os.path.join(directory, sub), exist_ok=True)
+
+    slugs = []
+    for listing in listings:
+        slug = offer_slug(listing['url'])
+        slugs.append(slug)
+        for sub, legacy in (('offer', False), ('offer-legacy', True)):
+            with open(os.path.join(directory, sub, f'{slug}.html'), 'w', encoding='utf-8') as f:
+                f.write(build_offer_page(listing, rng, padding, legacy))
+
+    pages = 0
+    for start in range(0, len(slugs), OFFERS_PER_SEARCH_PAGE):
+        pages += 1
+        with open(os.path.join(directory, 'search', f'page-{pages:04d}.html'), 'w', encoding='utf-8') as f:
+            f.write(build_search_page(slugs[start:start + OFFERS_PER_SEARCH_PAGE], rng, padding // 4))
+
+    manifest = {'source': os.path.relpath(source, ROOT_DIR), 'seed': seed, 'padding': padding,
+                'offers': slugs, 'search_pages': pages,
+                'expected': {slug: listing for slug, listing in zip(slugs, listings)}}
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return manifest
+
+
+class Corpus:
+    """Korpus stron wczytany do pamięci"""
+
+    def __init__(self, directory: str = CORPUS_DIR):
+        manifest_path = os.path.join(directory, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            build_corpus(directory)
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+        self.directory = directory
+        self.offers = self._load('offer', self.manifest['offers'])
+        self.legacy_offers = self._load('offer-legacy', self.manifest['offers'])
+        self.search_pages = [self.read('search', f'page-{page:04d}.html')
+                             for page in range(1, self.manifest['search_pages'] + 1)]
+        # Prawdziwe strony zapisane poleceniem `capture`
+        captured_dir = os.path.join(directory, 'captured')
+        self.captured = {}
+        if os.path.isdir(captured_dir):
+            self.captured = {name[:-5]: self.read('captured', name)
+                             for name in sorted(os.listdir(captured_dir)) if name.endswith('.html')}
+
+    def read(self, sub: str, name: str) -> bytes:
+        with open(os.path.join(self.directory, sub, name), 'rb') as f:
+            return f.read()
+
+    def _load(self, sub: str, slugs: List[str]) -> Dict[str, bytes]:
+        return {slug: self.read(sub, f'{slug}.html') for slug in slugs
+                if os.path.exists(os.path.join(self.directory, sub, f'{slug}.html'))}
+
+
+def capture(urls: List[str], directory: str = CORPUS_DIR):
+    """Dopisuje do korpusu prawdziwe strony ofert pobrane z Otodom"""
+    from scrapers.otodom_scraper import OtodomScraper
+
+    scraper = OtodomScraper()
+    os.makedirs(os.path.join(directory, 'captured'), exist_ok=True)
+    for url in urls:
+        content = scraper.fetch_listing(url)
+        if content is not None:
+            with open(os.path.join(directory, 'captured', f'{offer_slug(url)}.html'), 'wb') as f:
+                f.write(content)
+            print(f"Zapisano {url}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == 'capture':
+        capture(sys.argv[2:])
+    else:
+        manifest = build_corpus()
+        print(f"Wygenerowano korpus: {len(manifest['offers'])} ofert, {manifest['search_pages']} stron wyników")
@@ -0,0 +1,150 @@
+# benchmarks/load_test.py
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import ROOT_DIR, SOURCE_FILE
+
+# Cele przy 16 równoległych klientach, z generatorem obciążenia na tej samej
+# jednordzeniowej maszynie. Pętla jest zamknięta, więc średnie opóźnienie to
+# około liczba klientów / przepustowość - bez micro-batchingu (jedno wywołanie
+# modelu na żądanie) serwis nie osiąga żadnego z nich.
+P99_TARGET_MS = 100.0
+RPS_TARGET = 250.0
+
+
+def sample_listings(source: str = SOURCE_FILE) -> List[Dict[str, Any]]:
+    with open(source, 'r', encoding='utf-8') as f:
+        listings = json.load(f)
+    # Tylko pola ze schematu serwisu, bez opisu - jak z parse_content
+    return [{key: value for key, value in listing.items() if key not in ('description', 'scraped_at')}
+            for listing in listings]
+
+
+def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{url}/health', timeout=1).ok:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Serwis pod {url} nie wystartował w {timeout:.0f}s")
+
+
+def run_load(url: str, listings: List[Dict[str, Any]], clients: int, duration: float,
+             bulk: int = 0) -> Dict[str, Any]:
+    """Zamknięta pętla: `clients` wątków wysyła żądania jedno po drugim przez `duration` s"""
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def client(seed: int):
+        rng = random.Random(seed)
+        session = requests.Session()
+        local, failed = [], 0
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            if bulk:
+                response = session.post(f'{url}/predict/batch', json=rng.sample(listings, min(bulk, len(listings))))
+            else:
+                response = session.post(f'{url}/predict', json=rng.choice(listings))
+            local.append(time.perf_counter() - started)
+            failed += not response.ok
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    timings = np.array(latencies) * 1000
+    requests_done = len(latencies)
+    return {
+        'clients': clients,
+        'requests': requests_done,
+        'errors': errors[0],
+        'rps': requests_done / elapsed,
+        'listings_per_sec': requests_done * (bulk or 1) / elapsed,
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p90_ms': float(np.percentile(timings, 90)),
+        'p99_ms': float(np.percentile(timings, 99)),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Test obciążeniowy serwisu predykcji")
+    parser.add_argument('--url', help="Adres działającego serwisu (domyślnie uruchamiany lokalnie)")
+    parser.add_argument('--model', help="Plik modelu dla lokalnego serwisu")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--bulk', type=int, default=0, help="Ogłoszeń na żądanie /predict/batch (0 - /predict)")
+    parser.add_argument('--max-batch', type=int, default=64, help="1 - bez micro-batchingu (porównanie)")
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--p99-ms', type=float, default=P99_TARGET_MS)
+    parser.add_argument('--min-rps', type=float, default=RPS_TARGET)
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if not url:
+        command = [sys.executable, os.path.join(ROOT_DIR, 'service', 'api.py'), '--port', str(args.port),
+                   '--max-batch', str(args.max_batch), '--max-wait-ms', str(args.max_wait_ms)]
+        if args.model:
+            command += ['--model', args.model]
+        server = subprocess.Popen(command, cwd=ROOT_DIR)
+        url = f'http://127.0.0.1:{args.port}'
+
+    try:
+        wait_ready(url)
+        listings = sample_listings()
+        run_load(url, listings, args.clients, args.warmup, args.bulk)
+        result = run_load(url, listings, args.clients, args.duration, args.bulk)
+        health = requests.get(f'{url}/health').json()
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print(f"{result['requests']} żądań, {result['clients']} klientów: {result['rps']:.0f} req/s "
+          f"({result['listings_per_sec']:.0f} ofert/s), błędy: {result['errors']}")
+    print(f"Opóźnienie: p50 {result['p50_ms']:.1f} ms, p90 {result['p90_ms']:.1f} ms, "
+          f"p99 {result['p99_ms']:.1f} ms")
+    print(f"Średnia partia w serwisie: {health['mean_batch']:.1f} ofert")
+
+    failed = []
+    if result['p99_ms'] > args.p99_ms:
+        failed.append(f"p99 {result['p99_ms']:.1f} ms > {args.p99_ms:.0f} ms")
+    if result['rps'] < args.min_rps:
+        failed.append(f"{result['rps']:.0f} req/s < {args.min_rps:.0f} req/s")
+    if result['errors']:
+        failed.append(f"{result['errors']} błędnych odpowiedzi")
+    if failed:
+        print(f"Cel niespełniony: {'; '.join(failed)}")
+        return 1
+    print(f"Cel spełniony: p99 <= {args.p99_ms:.0f} ms przy >= {args.min_rps:.0f} req/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
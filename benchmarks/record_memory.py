@@ -0,0 +1,89 @@
+# benchmarks/record_memory.py
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import SOURCE_FILE
+from storage.records import Listing, to_table
+
+
+def source_lines(source: str = SOURCE_FILE) -> List[str]:
+    """Ogłoszenia jako linie JSON - każdy rekord budowany od zera, jak po parsowaniu strony"""
+    with open(source, 'r', encoding='utf-8') as f:
+        listings = json.load(f)
+    lines = []
+    for listing in listings:
+        record = {key: value for key, value in listing.items() if value is not None}
+        if isinstance(record.get('features'), str):
+            record['features'] = [part.strip(" '") for part in record['features'].strip('[]').split(',')]
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return lines
+
+
+def measure(build: Callable[[], Any]) -> Dict[str, float]:
+    """Pamięć zajęta przez wynik `build` (tracemalloc) i czas budowy"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return {'mb': used / 2 ** 20, 'seconds': elapsed}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pamięć ogłoszeń: dict a zwarty rekord Listing")
+    parser.add_argument('--records', type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    lines = source_lines()
+    n = args.records
+
+    def dicts():
+        records = []
+        for i in range(n):
+            record = json.loads(lines[i % len(lines)])
+            record['url'] = f"{record.get('url', '')}-{i}"
+            records.append(record)
+        return records
+
+    def compact():
+        records = []
+        for i in range(n):
+            record = Listing(json.loads(lines[i % len(lines)]))
+            record['url'] = f"{record.get('url', '')}-{i}"
+            records.append(record)
+        return records
+
+    results = {'dict': measure(dicts), 'Listing': measure(compact)}
+    sample = compact()
+    started = time.perf_counter()
+    arrow = to_table(sample)
+    results['Listing -> Arrow'] = {'mb': arrow.nbytes / 2 ** 20, 'seconds': time.perf_counter() - started}
+
+    # Bez strat: słownik -> Listing -> JSON -> Listing -> słownik (cechy jako zbiór)
+    for line in lines:
+        original = json.loads(line)
+        restored = Listing.from_json(Listing(original).to_json()).to_dict()
+        original['features'] = sorted(original.get('features') or [])
+        restored['features'] = sorted(restored.get('features') or [])
+        assert restored == original, f"konwersja stratna: {line[:80]}"
+
+    baseline = results['dict']['mb']
+    for name, result in results.items():
+        print(f"{name:18s} {result['mb']:8.1f} MB  {result['mb'] * 2 ** 20 / n:7.0f} B/ofertę  "
+              f"x{baseline / result['mb']:.1f}  budowa {result['seconds']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
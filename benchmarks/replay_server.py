@@ -0,0 +1,198 @@
+# benchmarks/replay_server.py
+import argparse
+import hashlib
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from benchmarks.corpus import CORPUS_DIR, Corpus
+else:
+    from .corpus import CORPUS_DIR, Corpus
+
+
+class ReplayServer:
+    """Lokalny serwer HTTP odtwarzający korpus stron Otodom
+
+    Udaje ścieżki `/pl/wyniki/...?page=N` i `/pl/oferta/<slug>`, dodaje
+    opóźnienie `latency` (+/- `jitter`) i obsługuje ETag/304.
+
+    Wstrzykiwanie błędów: `error_rate` odpowiedzi 503, `throttle_rate`
+    odpowiedzi 429 z `Retry-After`, `stall_rate` odpowiedzi wstrzymanych
+    o `stall_seconds` (timeouty klienta), a przy `capacity` każde żądanie
+    ponad tyle równoległych dostaje 429 - jak serwis z limitem połączeń.
+    """
+
+    def __init__(self, corpus: Corpus = None, latency: float = 0.0, jitter: float = 0.0,
+                 legacy: bool = False, host: str = '127.0.0.1', port: int = 0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, retry_after: int = 1,
+                 stall_rate: float = 0.0, stall_seconds: float = 10.0, capacity: int = None,
+                 seed: int = None):
+        self.corpus = corpus or Corpus()
+        self.latency = latency
+        self.jitter = jitter
+        self.offers = self.corpus.legacy_offers if legacy else self.corpus.offers
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.capacity = capacity
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.bytes_sent = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.statuses = Counter()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def resolve(self, path: str):
+        """Treść strony dla ścieżki żądania albo None (404)"""
+        parts = urlsplit(path)
+        if parts.path.startswith('/pl/wyniki/'):
+            page = int(parse_qs(parts.query).get('page', ['1'])[0])
+            if 1 <= page <= len(self.corpus.search_pages):
+                return self.corpus.search_pages[page - 1]
+            return b'<html><body><main></main></body></html>'
+        if parts.path.startswith('/pl/oferta/'):
+            return self.offers.get(parts.path.rsplit('/', 1)[-1])
+        return None
+
+    def fault(self):
+        """Wylosowany błąd dla bieżącego żądania: (status, opóźnienie) albo None"""
+        with self.lock:
+            if self.capacity and self.in_flight > self.capacity:
+                return 429, 0.0
+            roll = self.random.random()
+        if roll < self.error_rate:
+            return 503, 0.0
+        roll -= self.error_rate
+        if roll < self.throttle_rate:
+            return 429, 0.0
+        roll -= self.throttle_rate
+        if roll < self.stall_rate:
+            return None, self.stall_seconds
+        return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    self.respond()
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+            def send_empty(self, status: int, headers: dict = None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                with server.lock:
+                    server.statuses[status] += 1
+
+            def respond(self):
+                if server.latency or server.jitter:
+                    time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+
+                fault = server.fault()
+                if fault:
+                    status, stall = fault
+                    if stall:
+                        time.sleep(stall)
+                    elif status == 429:
+                        self.send_empty(429, {'Retry-After': str(server.retry_after)})
+                        return
+                    else:
+                        self.send_empty(status)
+                        return
+
+                body = server.resolve(self.path)
+                if body is None:
+                    self.send_empty(404)
+                    return
+
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_empty(304, {'ETag': etag})
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+                with server.lock:
+                    server.bytes_sent += len(body)
+                    server.statuses[200] += 1
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'ReplayServer':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serwer odtwarzający korpus stron Otodom")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.1, help="Opóźnienie odpowiedzi w sekundach")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--legacy', action='store_true', help="Strony ofert bez bloku __NEXT_DATA__")
+    parser.add_argument('--corpus', default=CORPUS_DIR)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Odsetek odpowiedzi 503")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Odsetek odpowiedzi 429")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--stall-rate', type=float, default=0.0, help="Odsetek odpowiedzi wstrzymanych")
+    parser.add_argument('--stall-seconds', type=float, default=10.0)
+    parser.add_argument('--capacity', type=int, help="Limit równoległych żądań, ponad niego 429")
+    args = parser.parse_args()
+
+    replay = ReplayServer(Corpus(args.corpus), latency=args.latency, jitter=args.jitter,
+                          legacy=args.legacy, port=args.port, error_rate=args.error_rate,
+                          throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+                          stall_rate=args.stall_rate, stall_seconds=args.stall_seconds,
+                          capacity=args.capacity)
+    print(f"Serwer odtwarzający działa pod {replay.base_url}")
+    try:
+        replay.server.serve_forever()
+    except KeyboardInterrupt:
+        replay.server.server_close()
@@ -0,0 +1,214 @@
+# benchmarks/run.py
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import CORPUS_DIR, ROOT_DIR, Corpus
+from benchmarks.replay_server import ReplayServer
+
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+
+# Kierunek poprawy dla porównań między commitami
+HIGHER_IS_BETTER = ('listings_per_sec', 'coverage')
+# Starsze wyniki zapisywały liczbę ofert na sekundę pod mylącą nazwą
+RENAMED_METRICS = {'pages_per_sec': 'listings_per_sec'}
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss jest w KB na Linuksie i w bajtach na macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def time_per_item(func: Callable, items: List[Any], rounds: int) -> Dict[str, float]:
+    """Mediana i minimum czasu jednego wywołania (ms) z `rounds` przebiegów"""
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for item in items:
+            func(item)
+        timings.append((time.perf_counter() - started) / len(items) * 1000)
+    return {'median_ms': statistics.median(timings), 'min_ms': min(timings), 'items': len(items)}
+
+
+def field_coverage(parsed: List[Dict[str, Any]], expected: List[Dict[str, Any]]) -> float:
+    """Odsetek pól obecnych w zapisanych wynikach, które parser też wyciągnął"""
+    total = found = 0
+    for got, want in zip(parsed, expected):
+        for key, value in want.items():
+            if key in ('url', 'scraped_at') or value in (None, '', [], 'brak informacji'):
+                continue
+            total += 1
+            found += got.get(key) not in (None, '', [])
+    return found / total if total else 0.0
+
+
+def micro_benchmarks(corpus: Corpus, rounds: int) -> Dict[str, Dict[str, float]]:
+    from bs4 import BeautifulSoup
+    from scrapers.base_scraper import HTML_PARSER
+    from scrapers.otodom_scraper import OtodomScraper
+
+    scraper = OtodomScraper()
+    expected = [corpus.manifest['expected'][slug] for slug in corpus.offers]
+    results = {}
+
+    offers = list(corpus.offers.values())
+    results['parse_listing_json'] = time_per_item(scraper.parse_content, offers, rounds)
+    results['parse_listing_json']['coverage'] = field_coverage([scraper.parse_content(o) for o in offers], expected)
+
+    legacy = list(corpus.legacy_offers.values())
+    results['parse_listing_fallback'] = time_per_item(scraper.parse_content, legacy, rounds)
+    results['parse_listing_fallback']['coverage'] = field_coverage([scraper.parse_content(o) for o in legacy],
+                                                                   expected)
+
+    blocks = []
+    for page in legacy:
+        text = BeautifulSoup(page, HTML_PARSER).get_text()
+        start = text.find('Czynsz:')
+        end = text.find('OpisPokaż więcej', start)
+        if start != -1 and end != -1:
+            blocks.append(text[start:end])
+    if blocks:
+        results['parse_parameters_block'] = time_per_item(scraper.parse_parameters_block, blocks, rounds * 10)
+
+    results['extract_listing_urls'] = time_per_item(scraper.extract_listing_urls, corpus.search_pages, rounds)
+
+    if corpus.captured:
+        results['parse_listing_captured'] = time_per_item(scraper.parse_content,
+                                                          list(corpus.captured.values()), rounds)
+    return results
+
+
+def _end_to_end(corpus_dir: str, latency: float, pages: int, concurrency: int, parse_workers: int,
+                legacy: bool, queue: multiprocessing.Queue):
+    """Uruchamiany w osobnym procesie, żeby zmierzyć jego własne szczytowe RSS"""
+    logging.disable(logging.INFO)
+    from scrapers.otodom_scraper import OtodomScraper
+
+    with ReplayServer(Corpus(corpus_dir), latency=latency, legacy=legacy) as replay:
+        scraper = OtodomScraper(base_url=replay.base_url, delay=0, concurrency=concurrency,
+                                parse_workers=parse_workers)
+        started = time.perf_counter()
+        listings = scraper.scrape_all(max_pages=pages, incremental=False)
+        elapsed = time.perf_counter() - started
+        queue.put({
+            'listings': len(listings),
+            'requests': replay.requests,
+            'bytes': replay.bytes_sent,
+            'wall_s': elapsed,
+            'listings_per_sec': len(listings) / elapsed if elapsed else 0.0,
+            'peak_rss_mb': peak_rss_mb(),
+        })
+
+
+def end_to_end(corpus_dir: str, latency: float, pages: int, concurrency: int, parse_workers: int,
+               legacy: bool) -> Dict[str, Any]:
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_end_to_end,
+                              args=(corpus_dir, latency, pages, concurrency, parse_workers, legacy, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    result.update({'latency_s': latency, 'concurrency': concurrency, 'parse_workers': parse_workers,
+                   'legacy': legacy})
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Porównuje metryki z poprzednim wynikiem, zwraca listę regresji"""
+    regressions = []
+    print(f"\nPorównanie z {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for name, metrics in current['results'].items():
+        old_metrics = baseline.get('results', {}).get(name)
+        if not old_metrics:
+            continue
+        old_metrics = {RENAMED_METRICS.get(metric, metric): value for metric, value in old_metrics.items()}
+        for metric in ('median_ms', 'listings_per_sec', 'peak_rss_mb', 'coverage'):
+            if metric not in metrics or not old_metrics.get(metric):
+                continue
+            change = metrics[metric] / old_metrics[metric] - 1
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = 'REGRESJA' if worse > threshold else 'ok'
+            print(f"   [{flag}] {name}.{metric}: {old_metrics[metric]:.3f} -> {metrics[metric]:.3f} "
+                  f"({change:+.1%})")
+            if worse > threshold:
+                regressions.append(f"{name}.{metric}")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarki scrapera na korpusie stron offline")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05, help="Opóźnienie serwera w teście end-to-end")
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--parse-workers', type=int, default=0)
+    parser.add_argument('--skip-e2e', action='store_true')
+    parser.add_argument('--corpus', default=CORPUS_DIR)
+    parser.add_argument('--compare', help="Plik JSON z poprzednim wynikiem")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Próg regresji (względny)")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    corpus = Corpus(args.corpus)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'results': micro_benchmarks(corpus, args.rounds),
+    }
+    if not args.skip_e2e:
+        report['results']['scrape_all'] = end_to_end(args.corpus, args.latency, args.pages, args.concurrency,
+                                                     args.parse_workers, legacy=False)
+        report['results']['scrape_all_fallback'] = end_to_end(args.corpus, args.latency, args.pages,
+                                                              args.concurrency, args.parse_workers, legacy=True)
+    report['results']['process'] = {'peak_rss_mb': peak_rss_mb()}
+
+    for name, metrics in report['results'].items():
+        shown = ', '.join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                          for key, value in metrics.items())
+        print(f"{name}: {shown}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{report['commit']}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nZapisano wyniki do {path}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"Wykryto regresje: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# benchmarks/startup.py
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(ROOT_DIR, 'cli.py')
+
+# Moduły, których krótkie polecenia nie powinny ładować
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'bs4', 'lxml', 'requests', 'sklearn', 'scipy', 'xgboost',
+                 'fastapi', 'uvicorn']
+
+# (nazwa, argumenty cli.py, limit mediany w ms albo None)
+CASES = [
+    ('cli --help', ['--help'], 150.0),
+    ('health (brak serwisu)', ['health', '--url', 'http://127.0.0.1:9', '--timeout', '0.5'], 150.0),
+    ('crawl --help', ['crawl', '--help'], 150.0),
+    ('analyze --help', ['analyze', '--help'], 150.0),
+    ('worker --help', ['worker', '--help'], None),
+    ('train --help', ['train', '--help'], None),
+    ('serve --help', ['serve', '--help'], None),
+]
+
+
+def cold_start(args: List[str], runs: int) -> Dict[str, object]:
+    """Mediana czasu (ms) całego procesu i ciężkie moduły, które załadował"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, CLI] + args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    # -X importtime wypisuje każdy import na stderr: "import time: self | cumulative | moduł"
+    trace = subprocess.run([sys.executable, '-X', 'importtime', CLI] + args,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    imported = {line.rsplit('|', 1)[-1].strip() for line in trace.splitlines() if line.startswith('import time:')}
+    return {
+        'median_ms': statistics.median(timings),
+        'min_ms': min(timings),
+        'heavy': [module for module in HEAVY_MODULES if module in imported],
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Czas zimnego startu poleceń cli.py")
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    baseline = cold_start_python(args.runs)
+    print(f"{'sam interpreter':24s} {baseline:7.1f} ms")
+    failed = []
+    for name, cli_args, limit in CASES:
+        result = cold_start(cli_args, args.runs)
+        heavy = ', '.join(result['heavy']) or '-'
+        print(f"{name:24s} {result['median_ms']:7.1f} ms (min {result['min_ms']:.1f})  ciężkie moduły: {heavy}")
+        if limit is not None and (result['median_ms'] > limit or result['heavy']):
+            failed.append(name)
+    if failed:
+        print(f"Za wolny start albo ciężkie importy: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+def cold_start_python(runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'])
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
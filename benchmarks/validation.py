@@ -0,0 +1,99 @@
+# benchmarks/validation.py
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import SOURCE_FILE
+from storage.validation import CHECKS, BatchValidator
+
+# Błędy typowe dla parsera regexowego: (nazwa, reguła, która zwykle je łapie, zmiana ogłoszenia)
+CORRUPTIONS: List[tuple] = [
+    ('cena za m² jako cena', 'range', lambda l: l.update(price=int(l['price'] / l['area']))),
+    ('czynsz jako cena', 'range', lambda l: l.update(price=random.randint(300, 2000))),
+    ('pierwsze m² na stronie', 'range', lambda l: l.update(area=random.choice([1.0, 2.5, 4000.0]))),
+    ('piętro ze śmieciem', 'floor', lambda l: l.update(floor='parterCzynsz:0 zł Stan wykończenia')),
+    ('pokoje a powierzchnia', 'rooms_area', lambda l: l.update(rooms=8, area=25.0)),
+    ('cena tekstem', 'type', lambda l: l.update(price='1 200 000 zł')),
+    ('cena x3', 'price_m2_outlier', lambda l: l.update(price=l['price'] * 3)),
+    ('cena /4', 'price_m2_outlier', lambda l: l.update(price=l['price'] // 4)),
+]
+
+
+def clean_listings(source: str = SOURCE_FILE) -> List[Dict[str, Any]]:
+    """Ogłoszenia korpusu, które same przechodzą walidację, z dzielnicą z adresu"""
+    with open(source, 'r', encoding='utf-8') as f:
+        listings = [{key: value for key, value in listing.items() if value is not None}
+                    for listing in json.load(f)]
+    accepted, _ = BatchValidator().validate(listings)
+    return [listing for listing in accepted if listing.get('price') and listing.get('area')]
+
+
+def synthetic(base: List[Dict[str, Any]], n: int, corrupt_ratio: float,
+              seed: int = 0) -> tuple:
+    """n ogłoszeń (ceny z rozrzutem ±10%) i indeksy wierszy z wstrzykniętym błędem"""
+    random.seed(seed)
+    listings, injected = [], {}
+    for i in range(n):
+        listing = dict(base[i % len(base)])
+        listing['price'] = int(listing['price'] * random.uniform(0.9, 1.1))
+        listing['url'] = f"{listing.get('url', '')}-{i}"
+        if random.random() < corrupt_ratio:
+            name, _, corrupt = random.choice(CORRUPTIONS)
+            corrupt(listing)
+            injected[i] = name
+        listings.append(listing)
+    return listings, injected
+
+
+def run(listings: List[Dict[str, Any]], batch: int) -> tuple:
+    validator = BatchValidator()
+    rejected_rows = {}
+    started = time.perf_counter()
+    for start in range(0, len(listings), batch):
+        _, rejected = validator.validate(listings[start:start + batch])
+        for record in rejected:
+            rejected_rows[int(record['listing']['url'].rsplit('-', 1)[1])] = record['reasons']
+    return validator.report(), rejected_rows, time.perf_counter() - started
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Przepustowość i skuteczność walidacji partii ogłoszeń")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--corrupt', type=float, default=0.02, help="Udział wierszy z wstrzykniętym błędem")
+    parser.add_argument('--batches', type=int, nargs='+', default=[500, 64 * 1024],
+                        help="Rozmiary partii (500 - jak w ListingSink)")
+    args = parser.parse_args(argv)
+
+    base = clean_listings()
+    listings, injected = synthetic(base, args.rows, args.corrupt)
+    print(f"{len(listings)} ogłoszeń ({len(base)} wzorców), z błędem: {len(injected)}")
+
+    failed = False
+    for batch in args.batches:
+        report, rejected, elapsed = run(listings, batch)
+        print(f"\nPartia {batch}: {len(listings) / elapsed:,.0f} ogłoszeń/s łącznie "
+              f"({elapsed / (len(listings) / batch) * 1000:.2f} ms na partię), same reguły "
+              f"{report['rows_per_sec']:,.0f} wierszy/s")
+        for name in CHECKS:
+            check = report['checks'][name]
+            print(f"  {name:18s} {check['rows_per_sec']:12,.0f} wierszy/s  odrzucone: {check['rejected']}")
+
+        false_positives = sum(1 for row in rejected if row not in injected)
+        print(f"  fałszywe odrzucenia: {false_positives} ({false_positives / (len(listings) - len(injected)):.3%})")
+        for name, check, _ in CORRUPTIONS:
+            rows = [row for row, kind in injected.items() if kind == name]
+            caught = sum(1 for row in rows if row in rejected)
+            by_check = sum(1 for row in rows if check in rejected.get(row, []))
+            print(f"  {name:24s} wykryte {caught}/{len(rows)} (w tym regułą {check}: {by_check})")
+            failed |= caught < 0.95 * len(rows)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# cli.py
+import argparse
+import importlib
+import json
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Polecenie -> (moduł z funkcją main(argv), opis). Moduł importowany dopiero
+# po wyborze polecenia, więc pandas, bs4 czy XGBoost ładuje tylko ten, kto ich używa.
+COMMANDS = {
+    'crawl': ('main', "Crawl Otodom w jednym procesie (--probe N - próbne pobranie)"),
+    'worker': ('crawl_worker', "Crawl rozproszony: seed / work / status"),
+    'reparse': ('reparse', "Ponowne parsowanie archiwum stron bez sieci"),
+    'analyze': ('analyze_data', "Statystyki najnowszego zrzutu albo trendy cen (--history)"),
+    'index': ('analytics.price_index', "Indeks cen wg dzielnicy, pokoi, rynku i tygodnia"),
+    'train': ('model.train', "Uczenie modelu cen"),
+    'score': ('model.score', "Ocena wszystkich ogłoszeń zrzutów modelem (predykcje i rezydua)"),
+    'serve': ('service.api', "Serwis predykcji HTTP"),
+}
+BENCHMARKS = {
+    'scraper': ('benchmarks.run', "Parsowanie i crawl na korpusie offline"),
+    'load': ('benchmarks.load_test', "Test obciążeniowy serwisu predykcji"),
+    'memory': ('benchmarks.record_memory', "Pamięć rekordów ogłoszeń"),
+    'startup': ('benchmarks.startup', "Czas zimnego startu poleceń CLI"),
+    'validation': ('benchmarks.validation', "Przepustowość i skuteczność walidacji partii"),
+}
+
+
+def run_module(module: str, argv: list) -> int:
+    result = importlib.import_module(module).main(argv)
+    return result if isinstance(result, int) else 0
+
+
+def health(url: str, timeout: float) -> int:
+    """Kontrola serwisu predykcji - samo http.client, bez requests i urllib (ssl, email)"""
+    from http.client import HTTPConnection
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(url)
+    connection = HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    try:
+        connection.request('GET', parts.path.rstrip('/') + '/health')
+        response = connection.getresponse()
+        body = response.read()
+        if response.status != 200:
+            print(f"Serwis {url}: HTTP {response.status}", file=sys.stderr)
+            return 1
+        print(json.dumps(json.loads(body), ensure_ascii=False))
+        return 0
+    except (OSError, ValueError) as e:
+        print(f"Serwis {url} niedostępny: {e}", file=sys.stderr)
+        return 1
+    finally:
+        connection.close()
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog='cli.py', description="Housing price predictor")
+    parser.add_argument('--root', default=os.environ.get('HOUSING_ROOT', ROOT_DIR),
+                        help="Katalog projektu - ścieżki data/... liczone względem niego, nie bieżącego katalogu")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='POLECENIE')
+
+    # add_help=False - --help trafia do parsera wybranego modułu
+    for name, (_, description) in COMMANDS.items():
+        commands.add_parser(name, help=description, add_help=False)
+
+    bench = commands.add_parser('bench', help="Benchmarki: " + ', '.join(BENCHMARKS), add_help=False)
+    bench.add_argument('benchmark', choices=list(BENCHMARKS), metavar='{' + ','.join(BENCHMARKS) + '}')
+
+    check = commands.add_parser('health', help="Kontrola działającego serwisu predykcji")
+    check.add_argument('--url', default='http://127.0.0.1:8080')
+    check.add_argument('--timeout', type=float, default=2.0)
+
+    # Argumenty nieznane tutaj należą do wybranego polecenia
+    args, rest = parser.parse_known_args(argv)
+    os.chdir(args.root)
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+
+    if args.command == 'health':
+        if rest:
+            parser.error(f"nieznane argumenty: {' '.join(rest)}")
+        return health(args.url, args.timeout)
+    if args.command == 'bench':
+        return run_module(BENCHMARKS[args.benchmark][0], rest)
+    return run_module(COMMANDS[args.command][0], rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# crawl_worker.py
+import argparse
+import os
+import socket
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scrapers.frontier import ESTATES, REGIONS, TRANSACTIONS, CrawlFrontier, FrontierWorker, search_scopes
+
+FRONTIER_PATH = 'data/frontier.sqlite'
+
+
+def seed(args):
+    frontier = CrawlFrontier(args.frontier)
+    if args.reset:
+        frontier.reset()
+    regions = REGIONS if args.regions == ['all'] else args.regions
+    scopes = search_scopes(regions, args.transactions, args.estates, args.cities or ())
+    from scrapers.otodom_scraper import OtodomScraper
+    scraper = OtodomScraper()
+    added = sum(frontier.add_search(scraper.search_url(scope, 1), scope, 1) for scope in scopes)
+    print(f"Dodano {added} zakresów wyszukiwania ({len(scopes)} w zleceniu) do {args.frontier}")
+
+
+def work(args):
+    from scrapers.otodom_scraper import OtodomScraper
+    from storage.listing_sink import ListingSink
+    from storage.listing_store import ListingStore
+    from storage.validation import BatchValidator
+
+    if args.resume and not args.worker_id:
+        sys.exit("--resume wymaga --worker-id przerwanego procesu")
+    owner = args.worker_id or f'{socket.gethostname()}-{os.getpid()}'
+    os.makedirs('data/metrics', exist_ok=True)
+
+    scraper = OtodomScraper(
+        delay=args.delay,
+        concurrency=args.concurrency,
+        cache_dir='data/cache/http',
+        archive_dir='data/archive',
+        index_path='data/listing_index.sqlite',
+        parse_workers=args.parse_workers,
+    )
+    metrics = scraper.metrics
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    frontier = CrawlFrontier(args.frontier, lease_timeout=args.lease)
+    # Każdy proces pisze własny zrzut - bez współdzielonych plików w magazynie
+    run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{owner}"
+    sink = ListingSink('data/raw', prefix=f'otodom_{owner}', store=ListingStore('data/store'), run_id=run_id,
+                       resume=args.resume, validator=BatchValidator(metrics=metrics))
+
+    def write_listing(listing):
+        with metrics.timer('write'):
+            sink.write(listing)
+
+    def commit_batch():
+        # Checkpoint po każdej partii - przed zamknięciem jej zadań w kolejce
+        sink.checkpoint(sink.next_page)
+
+    worker = FrontierWorker(scraper, frontier, owner, max_pages=args.max_pages,
+                            incremental=not args.full, batch_size=args.batch)
+    print(f"Proces {owner}: pobieram zadania z {args.frontier}")
+    try:
+        worker.run(on_listing=write_listing, on_batch_done=commit_batch, idle_timeout=args.idle_timeout)
+    except BaseException:
+        sink.abort()
+        print(f"\nProces przerwany - dokończ zapis poleceniem: "
+              f"python crawl_worker.py work --worker-id {owner} --resume")
+        raise
+    finally:
+        metrics.write_report(json_path=f'data/metrics/crawl_{sink.run_id}.json')
+    sink.close()
+    print(f"Zapisano {sink.count - sink.rejected} ogłoszeń do {sink.parquet_dir}, "
+          f"w kwarantannie: {sink.rejected}")
+
+
+def status(args):
+    frontier = CrawlFrontier(args.frontier)
+    for kind, states in sorted(frontier.stats().items()):
+        print(f"{kind}: " + ', '.join(f"{state} {count}" for state, count in sorted(states.items())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rozproszony crawl Otodom ze wspólną kolejką zadań")
+    parser.add_argument('--frontier', default=FRONTIER_PATH, help="Plik SQLite z kolejką zadań")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help="Dodaje zakresy wyszukiwania do kolejki")
+    seed_parser.add_argument('--regions', nargs='+', default=['mazowieckie'],
+                             help=f"Województwa albo 'all' ({', '.join(REGIONS)})")
+    seed_parser.add_argument('--cities', nargs='+', help="Zamiast województw: województwo/miasto, np. mazowieckie/warszawa")
+    seed_parser.add_argument('--transactions', nargs='+', default=['sprzedaz'], choices=TRANSACTIONS)
+    seed_parser.add_argument('--estates', nargs='+', default=['mieszkanie'], choices=ESTATES)
+    seed_parser.add_argument('--reset', action='store_true', help="Wyczyść kolejkę poprzedniego crawla")
+    seed_parser.set_defaults(handler=seed)
+
+    work_parser = commands.add_parser('work', help="Uruchamia proces roboczy")
+    work_parser.add_argument('--worker-id', help="Nazwa procesu (domyślnie host-pid)")
+    work_parser.add_argument('--concurrency', type=int, default=4)
+    work_parser.add_argument('--delay', type=float, default=1.0, help="Sekundy na żądanie do hosta w tym procesie (limit nie jest "
+                             "wspólny - przy N procesach podaj N razy większy)")
+    work_parser.add_argument('--parse-workers', type=int, default=0)
+    work_parser.add_argument('--batch', type=int, default=36, help="Zadań w jednej dzierżawie")
+    work_parser.add_argument('--lease', type=float, default=300.0, help="Czas dzierżawy zadań (s)")
+    work_parser.add_argument('--max-pages', type=int, default=500, help="Maksymalna strona wyników w zakresie")
+    work_parser.add_argument('--idle-timeout', type=float, default=30.0)
+    work_parser.add_argument('--full', action='store_true', help="Pobieraj też oferty świeże w indeksie")
+    work_parser.add_argument('--metrics-port', type=int)
+    work_parser.add_argument('--resume', action='store_true',
+                             help="Dokończ zapis przerwanego procesu o tym samym --worker-id")
+    work_parser.set_defaults(handler=work)
+
+    status_parser = commands.add_parser('status', help="Stan kolejki")
+    status_parser.set_defaults(handler=status)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,173 @@
 # main.py
+import argparse
+import json
 import os
 import sys
-import pandas as pd
-import json
-from datetime import datetime
+import time
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from scrapers.otodom_scraper import OtodomScraper
+# Pola sprawdzane przy próbnym pobraniu (--probe)
+PROBE_FIELDS = ['price', 'area', 'rooms', 'floor', 'address', 'market', 'finish_state', 'year_built']
+
+
+def probe(scraper, count: int = 5, output: str = 'data/raw/test_results_v3.json'):
+    """Próbne pobranie kilku ofert z pierwszej strony wyników - szybka kontrola parsera"""
+    print("\nPobieranie listy ofert...")
+    urls = scraper.get_listings_urls(1)
+    if not urls:
+        print("Nie udało się pobrać URLi ofert")
+        return
+    print(f"Znaleziono {len(urls)} ofert")
+    
+    results = []
+    for i, url in enumerate(urls[:count]):
+        print(f"\nTestowanie oferty {i + 1}/{count}: {url}")
+        result = scraper.scrape_listing(url)
+        if result:
+            print("Znalezione dane:")
+            for key, value in result.items():
+                if key not in ['description', 'features', 'url', 'scraped_at']:
+                    print(f"  {key}: {value}")
+            if result.get('features'):
+                print(f"  features ({len(result['features'])}): {', '.join(result['features'][:5])}...")
+            results.append(dict(result))
+        time.sleep(2)
+    if not results:
+        return
+    
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nWyniki zapisane do {output}")
+    
+    print("\n=== KOMPLETNOŚĆ DANYCH ===")
+    for field in PROBE_FIELDS:
+        found = sum(result.get(field) is not None for result in results)
+        print(f"{field}: {found}/{len(results)} ({found / len(results) * 100:.0f}%)")
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrapowanie ogłoszeń z Otodom")
+    parser.add_argument('--pages', type=int, default=3, help="Maksymalna liczba stron wyników")
+    parser.add_argument('--full', action='store_true', help="Pełny crawl z pominięciem indeksu znanych ofert")
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help="Liczba procesów parsujących (0 - parsowanie w wątkach, -1 - liczba rdzeni)")
+    parser.add_argument('--resume', action='store_true', help="Wznów przerwany crawl od ostatniej ukończonej strony")
+    parser.add_argument('--metrics-port', type=int, help="Port HTTP z metrykami /metrics na czas crawla")
+    parser.add_argument('--probe', type=int, metavar='N', help="Tylko próbne pobranie N ofert (kontrola parsera)")
+    args = parser.parse_args(argv)
+    
+    # Ciężkie zależności dopiero po sparsowaniu argumentów - --help i błędy bez opóźnień
+    from analytics.price_index import PriceIndex
+    from scrapers.otodom_scraper import OtodomScraper
+    from storage.listing_sink import ListingSink
+    from storage.listing_store import ListingStore
+    from storage.validation import BatchValidator
+    
+    if args.probe:
+        probe(OtodomScraper(), args.probe)
+        return
+    
     os.makedirs('data/raw', exist_ok=True)
     os.makedirs('data/processed', exist_ok=True)
+    os.makedirs('data/metrics', exist_ok=True)
     
     print("Inicjalizuję scraper Otodom...")
-    scraper = OtodomScraper()
+    scraper = OtodomScraper(
+        concurrency=4,
+        cache_dir='data/cache/http',
+        archive_dir='data/archive',
+        index_path='data/listing_index.sqlite',
+        parse_workers=args.parse_workers,
+    )
+    
+    metrics = scraper.metrics
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
     
     print("Rozpoczynam scrapowanie...")
     print("To może potrwać kilka minut...")
     
-    listings = scraper.scrape_all(max_pages=3)
+    store = ListingStore('data/store')
+    price_index = PriceIndex.open()
+    validator = BatchValidator(metrics=metrics)
     
-    if listings:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        df = pd.DataFrame(listings)
-        csv_path = f'data/raw/otodom_listings_{timestamp}.csv'
-        df.to_csv(csv_path, index=False)
-        print(f"\nZapisano {len(listings)} ogłoszeń do {csv_path}")
+    def index_listings(listings):
+        # Do indeksu cen trafiają tylko ogłoszenia, które przeszły walidację
+        for listing in listings:
+            price_index.add(listing, sink.run_id)
+    
+    sink = ListingSink('data/raw', resume=args.resume, store=store, validator=validator,
+                       on_accept=index_listings)
+    
+    def write_listing(listing):
+        with metrics.timer('write'):
+            sink.write(listing)
+    
+    def write_metrics():
+        metrics.write_report(
+            json_path=f'data/metrics/crawl_{sink.run_id}.json',
+            prometheus_path='data/metrics/crawl.prom',
+        )
+    
+    try:
+        scraper.scrape_all(
+            max_pages=args.pages,
+            incremental=not args.full,
+            start_page=sink.next_page,
+            on_listing=write_listing,
+            on_page_done=sink.checkpoint,
+        )
+    except BaseException:
+        sink.abort()
+        write_metrics()
+        print(f"\nCrawl przerwany po stronie {sink.last_page} - wznów poleceniem: python main.py --resume")
+        raise
+    sink.close()
+    write_metrics()
+    # Zrzut trafia do indeksu cen razem ze zrzutami innych procesów (crawl_worker, reparse)
+    price_index.commit(sink.run_id, sink.parquet_rows - sink.rejected, store)
+    price_index.update(store)
+    price_index.save()
+    print(f"Raport metryk: data/metrics/crawl_{sink.run_id}.json")
+    
+    report = validator.report()
+    if report['rows']:
+        print(f"Walidacja: {report['rejected']}/{report['rows']} ogłoszeń w kwarantannie ({sink.quarantine_path})")
+        for name, check in report['checks'].items():
+            print(f"  {name:18s} {check['rejected']:6d} odrzuconych, {check['rows_per_sec']:,.0f} wierszy/s")
+    
+    broken = metrics.broken_fields()
+    if broken:
+        print(f"UWAGA: pola {', '.join(broken)} wypełnione w mniej niż połowie ofert - sprawdź parser")
+    
+    if sink.count:
+        print(f"\nZapisano {sink.count} ogłoszeń do {sink.jsonl_path}")
+        print(f"Zapisano dane Parquet do {sink.parquet_dir}")
         
-        json_path = f'data/raw/otodom_listings_{timestamp}.json'
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(listings, f, ensure_ascii=False, indent=2)
-        print(f"Zapisano dane JSON do {json_path}")
+        df = store.read(columns=['price', 'area', 'rooms'], runs=[sink.run_id])
         
         print("\n=== Podstawowe statystyki ===")
         print(f"Liczba ogłoszeń: {len(df)}")
         
-        if 'price' in df.columns:
+        if df['price'].notna().any():
             print(f"Średnia cena: {df['price'].mean():,.0f} zł")
             print(f"Mediana ceny: {df['price'].median():,.0f} zł")
         
-        if 'area' in df.columns:
+        if df['area'].notna().any():
             print(f"Średnia powierzchnia: {df['area'].mean():.1f} m²")
         
-        if 'rooms' in df.columns:
+        if df['rooms'].notna().any():
             print(f"Rozkład liczby pokoi:")
             print(df['rooms'].value_counts().sort_index())
         
-        df.to_csv('data/raw/otodom_latest.csv', index=False)
+        # Nowy zrzut trafia przyrostowo do indeksu ofert porównywalnych
+        from analytics.comparables import ComparablesIndex
+        comparables = ComparablesIndex.open()
+        if comparables.update(store):
+            comparables.save()
+            print(f"\nIndeks ofert porównywalnych: {len(comparables)} ofert")
         
     else:
         print("Nie udało się pobrać żadnych ogłoszeń")
@@ -0,0 +1,266 @@
+# model/features.py
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from analytics.history import extract_district
+
+# Zmiana sposobu budowy cech unieważnia zapisane macierze
+FEATURE_VERSION = 1
+
+# Kolumny wczytywane z magazynu/plików do budowy cech
+SOURCE_COLUMNS = ['price', 'area', 'rooms', 'floor', 'rent', 'year_built', 'elevator', 'finish_state',
+                  'market', 'ownership', 'advertiser_type', 'building_type', 'building_material',
+                  'address', 'district', 'latitude', 'longitude', 'features']
+
+NUMERIC_FEATURES = ['area', 'rooms', 'floor', 'ground_floor', 'basement', 'garret', 'rent', 'rent_m2',
+                    'year_built', 'elevator', 'latitude', 'longitude']
+CATEGORICAL_FEATURES = ['market', 'finish_state', 'ownership', 'advertiser_type', 'building_type',
+                        'building_material', 'district']
+ENCODED_FEATURES = CATEGORICAL_FEATURES + ['features']
+
+# Wartości parametrów, które w praktyce oznaczają brak danych
+MISSING_VALUES = ['brak informacji', 'zapytaj', '']
+
+# Piętra podawane słownie na Otodom: kolumna flagi -> (tekst, numer piętra)
+FLOOR_WORDS = {'ground_floor': ('parter', 0.0), 'basement': ('suterena', -1.0), 'garret': ('poddasze', np.nan)}
+FLOOR_RE = r'^(?:(parter|suterena|poddasze|> ?10)|(\d{1,2})(?!\d))'
+# "> 10" (kod floor_higher_10) - najniższe możliwe piętro
+FLOOR_ABOVE_10 = 11.0
+
+FEATURE_ITEM_RE = r"'([^']*)'"
+
+
+def parse_floor(floor: pd.Series) -> pd.DataFrame:
+    """Numer piętra i flagi z tekstu (np. "parter", "suterena", "3", "3/5", "> 10")
+
+    Wartości z doklejonym śmieciem ze starszego parsera są obcinane do
+    pierwszego słowa lub liczby.
+    """
+    parts = floor.astype(object).str.strip().str.lower().str.extract(FLOOR_RE)
+    word = parts[0].to_numpy(dtype=object)
+    value = pd.to_numeric(parts[1], errors='coerce').to_numpy(dtype=np.float64)
+    value[pd.Series(word).str.startswith('>', na=False).to_numpy()] = FLOOR_ABOVE_10
+    flags = {}
+    for name, (text, number) in FLOOR_WORDS.items():
+        flags[name] = (word == text).astype(np.float64)
+        value[word == text] = number
+    return pd.DataFrame({'floor': value, **flags}, index=floor.index)
+
+
+def split_features(features: pd.Series) -> pd.Series:
+    """Lista udogodnień w każdym wierszu - z list albo ich tekstowego zapisu z CSV"""
+    is_text = features.map(lambda value: isinstance(value, str))
+    result = features.where(~is_text & features.notna(), None)
+    if is_text.any():
+        result[is_text] = features[is_text].str.findall(FEATURE_ITEM_RE)
+    return result
+
+
+def multi_hot(rows: np.ndarray, keys: Sequence[str], n_rows: int, names: Sequence[str]) -> sparse.csr_matrix:
+    """Rzadkie kodowanie: jedynka w kolumnie `names.index(key)` wiersza `row`
+
+    Klucze spoza `names` są pomijane - tak koduje się nowe dane zgodnie
+    ze słownikiem modelu.
+    """
+    codes = pd.Index(names).get_indexer(keys)
+    known = codes >= 0
+    matrix = sparse.csr_matrix(
+        (np.ones(known.sum(), dtype=np.float32), (rows[known], codes[known])),
+        shape=(n_rows, len(names)),
+    )
+    # Powtórzone wartości w jednym wierszu dają 1, nie liczbę wystąpień
+    matrix.data[:] = 1.0
+    return matrix
+
+
+def numeric_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Gęsta część macierzy - liczby z NaN tam, gdzie brak danych"""
+    def column(name):
+        if name not in df.columns:
+            return np.full(len(df), np.nan)
+        return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+    area = column('area')
+    rent = column('rent')
+    elevator = np.full(len(df), np.nan)
+    if 'elevator' in df.columns:
+        # Bool z JSON/Parquet albo tekst "True"/"False" z CSV
+        text = df['elevator'].astype(str).to_numpy()
+        elevator[text == 'True'] = 1.0
+        elevator[text == 'False'] = 0.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rent_m2 = np.where(area > 0, rent / area, np.nan)
+
+    columns = {
+        'area': area,
+        'rooms': column('rooms'),
+        'rent': rent,
+        'rent_m2': rent_m2,
+        'year_built': column('year_built'),
+        'elevator': elevator,
+        'latitude': column('latitude'),
+        'longitude': column('longitude'),
+    }
+    floor = df['floor'] if 'floor' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    columns.update(parse_floor(floor).items())
+    return pd.DataFrame({name: columns[name] for name in NUMERIC_FEATURES}, index=df.index)
+
+
+def encoded_items(df: pd.DataFrame):
+    """Wszystkie kategorie i udogodnienia jako pary (wiersz, "kolumna=wartość")
+
+    Kolumny są sklejane w jedną tablicę, więc czyszczenie tekstu to kilka
+    operacji na całości zamiast osobnych dla każdej kolumny - liczy się
+    to przy małych partiach w serwisie predykcji.
+    """
+    rows, columns, values = [], [], []
+    positions = np.arange(len(df))
+    for name in ENCODED_FEATURES:
+        if name == 'district':
+            column = extract_district(df)
+        elif name == 'features' and name in df.columns:
+            column = split_features(df['features']).explode()
+        elif name in df.columns:
+            column = df[name]
+        else:
+            continue
+        rows.append(positions if name != 'features' else column.index.to_numpy(dtype=np.int64))
+        columns.append(np.full(len(column), name, dtype=object))
+        values.append(column.to_numpy(dtype=object))
+
+    text = pd.Series(np.concatenate(values), dtype=object).str.strip()
+    keep = (text.notna() & ~text.isin(MISSING_VALUES)).to_numpy()
+    keys = np.concatenate(columns)[keep] + '=' + text.to_numpy(dtype=object)[keep]
+    return np.concatenate(rows)[keep], keys
+
+
+def vocabulary_names(keys: Sequence[str]) -> List[str]:
+    """Kolumny rzadkiej części w stałym porządku: wg ENCODED_FEATURES, potem wartości"""
+    order = {name: position for position, name in enumerate(ENCODED_FEATURES)}
+    return sorted(set(keys), key=lambda key: (order[key.split('=', 1)[0]], key))
+
+
+class FeatureMatrix:
+    """Macierz cech: gęste liczby (NaN = brak) + rzadkie kodowanie kategorii i udogodnień"""
+
+    def __init__(self, dense: np.ndarray, sparse_part: sparse.csr_matrix, target: Optional[np.ndarray],
+                 dense_names: List[str], sparse_names: List[str], meta: Dict = None):
+        self.dense = dense
+        self.sparse = sparse_part
+        self.target = target
+        self.dense_names = dense_names
+        self.sparse_names = sparse_names
+        self.meta = meta or {}
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self.dense_names + self.sparse_names
+
+    @property
+    def vocabulary(self) -> Dict[str, List[str]]:
+        """Wartości kodowanych kolumn - potrzebne do zakodowania nowych danych"""
+        vocabulary: Dict[str, List[str]] = {}
+        for name in self.sparse_names:
+            prefix, value = name.split('=', 1)
+            vocabulary.setdefault(prefix, []).append(value)
+        return vocabulary
+
+    def __len__(self) -> int:
+        return self.dense.shape[0]
+
+    def to_csr(self, rows: np.ndarray = None) -> sparse.csr_matrix:
+        """Cała macierz jako CSR
+
+        Zera z części gęstej (np. parter, brak windy) są zapisane jawnie, bo
+        XGBoost traktuje niezapisane komórki CSR jako brak danych.
+        """
+        dense = np.asarray(self.dense if rows is None else self.dense[rows])
+        sparse_part = self.sparse if rows is None else self.sparse[rows]
+        present = ~np.isnan(dense)
+        indptr = np.concatenate([[0], np.cumsum(present.sum(axis=1))])
+        indices = np.nonzero(present)[1]
+        dense_csr = sparse.csr_matrix((dense[present].astype(np.float32), indices, indptr),
+                                      shape=dense.shape)
+        return sparse.hstack([dense_csr, sparse_part], format='csr')
+
+    def save(self, directory: str):
+        """Zapis do katalogu: dense.npy i target.npy (mapowane), sparse.npz, meta.json"""
+        tmp_dir = directory + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        np.save(os.path.join(tmp_dir, 'dense.npy'), np.ascontiguousarray(self.dense, dtype=np.float32))
+        if self.target is not None:
+            np.save(os.path.join(tmp_dir, 'target.npy'), np.asarray(self.target, dtype=np.float32))
+        sparse.save_npz(os.path.join(tmp_dir, 'sparse.npz'), self.sparse)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({**self.meta, 'dense_names': self.dense_names, 'sparse_names': self.sparse_names},
+                      f, ensure_ascii=False, indent=2)
+        # Katalog pojawia się w całości albo wcale
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_dir, directory)
+
+    @classmethod
+    def load(cls, directory: str) -> 'FeatureMatrix':
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        target_path = os.path.join(directory, 'target.npy')
+        return cls(
+            dense=np.load(os.path.join(directory, 'dense.npy'), mmap_mode='r'),
+            sparse_part=sparse.load_npz(os.path.join(directory, 'sparse.npz')).tocsr(),
+            target=np.load(target_path, mmap_mode='r') if os.path.exists(target_path) else None,
+            dense_names=meta.pop('dense_names'),
+            sparse_names=meta.pop('sparse_names'),
+            meta=meta,
+        )
+
+
+def build_matrix(df: pd.DataFrame, vocabulary: Dict[str, List[str]] = None,
+                 with_target: bool = True) -> FeatureMatrix:
+    """Buduje macierz cech kolumnowo, bez pętli po wierszach
+
+    Przy uczeniu pomijane są wiersze bez ceny lub powierzchni, a celem
+    jest log(1 + cena). Z `vocabulary` (z wytrenowanego modelu) kategorie
+    kodowane są tak samo jak przy uczeniu.
+    """
+    df = df.reset_index(drop=True)
+    if with_target:
+        price = pd.to_numeric(df['price'], errors='coerce')
+        area = pd.to_numeric(df['area'], errors='coerce')
+        df = df[price.gt(0) & area.gt(0)].reset_index(drop=True)
+
+    dense = numeric_features(df)
+    rows, keys = encoded_items(df)
+    if vocabulary is None:
+        names = vocabulary_names(keys)
+    else:
+        names = [f'{name}={value}' for name in ENCODED_FEATURES for value in vocabulary.get(name, [])]
+
+    target = None
+    if with_target:
+        target = np.log1p(pd.to_numeric(df['price']).to_numpy(dtype=np.float64)).astype(np.float32)
+    return FeatureMatrix(
+        dense=dense.to_numpy(dtype=np.float32),
+        sparse_part=multi_hot(rows, keys, len(df), names),
+        target=target,
+        dense_names=list(dense.columns),
+        sparse_names=names,
+        meta={'rows': len(df), 'feature_version': FEATURE_VERSION},
+    )
+
+
+def snapshot_hash(paths: Sequence[str]) -> str:
+    """Skrót zawartości plików źródłowych i wersji cech - klucz cache macierzy"""
+    digest = hashlib.sha1(f'features-v{FEATURE_VERSION}'.encode())
+    for path in sorted(paths):
+        digest.update(path.encode('utf-8'))
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
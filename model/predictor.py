@@ -0,0 +1,57 @@
+# model/predictor.py
+import glob
+import json
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from model.features import build_matrix
+
+MODEL_DIR = 'data/models'
+
+
+def latest_model(directory: str = MODEL_DIR) -> str:
+    """Najnowszy model zapisany przez model/train.py"""
+    models = [path for path in glob.glob(os.path.join(directory, 'price_xgb_*.json'))
+              if not path.endswith('.meta.json')]
+    if not models:
+        raise FileNotFoundError(f"Brak modelu w {directory} - uruchom: python model/train.py")
+    return max(models, key=os.path.getmtime)
+
+
+class PricePredictor:
+    """Wytrenowany model cen razem ze słownikiem kategorii - ładowany raz
+
+    Ogłoszenia kodowane są tą samą funkcją co przy uczeniu (`build_matrix`),
+    a predykcja dla całej partii to jedno wywołanie modelu.
+    """
+
+    def __init__(self, path: str = None, n_jobs: int = -1):
+        import xgboost as xgb
+
+        self.path = path or latest_model()
+        with open(self.path[:-5] + '.meta.json', 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.vocabulary: Dict[str, List[str]] = self.meta['vocabulary']
+        self.booster = xgb.Booster()
+        self.booster.load_model(self.path)
+        self.booster.set_param({'nthread': n_jobs})
+        self.iterations = self.meta['metrics'].get('best_iteration', -1) + 1
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)[:-5]
+
+    def predict_frame(self, df: pd.DataFrame) -> np.ndarray:
+        """Przewidywane ceny (zł) dla wierszy ramki w tej samej kolejności"""
+        if df.empty:
+            return np.empty(0)
+        matrix = build_matrix(df, vocabulary=self.vocabulary, with_target=False)
+        predicted = self.booster.inplace_predict(matrix.to_csr(), missing=np.nan,
+                                                 iteration_range=(0, self.iterations))
+        return np.expm1(predicted.astype(np.float64))
+
+    def predict(self, listings: List[Dict[str, Any]]) -> np.ndarray:
+        return self.predict_frame(pd.DataFrame.from_records(listings))
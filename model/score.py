@@ -0,0 +1,191 @@
+# model/score.py
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import time
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.features import SOURCE_COLUMNS
+from storage.listing_store import ListingStore
+from storage.schema import pandas_types
+
+logger = logging.getLogger(__name__)
+
+# Wyniki modelu obok zrzutu: run_id=.../_scores/<model>/ - podkreślnik ukrywa je przed czytelnikiem magazynu
+SCORES_DIR = '_scores'
+
+SCORE_SCHEMA = pa.schema([
+    ('url', pa.string()),
+    ('price', pa.int64()),
+    ('predicted_price', pa.float64()),
+    # Cena ofertowa minus przewidywana; ujemna - oferta tańsza niż wycena
+    ('residual', pa.float64()),
+    ('residual_pct', pa.float64()),
+])
+
+# Predyktor ładowany raz w każdym procesie
+_predictor = None
+
+
+def _init_worker(model_path: str):
+    global _predictor
+    logging.disable(logging.INFO)
+    from model.predictor import PricePredictor
+    # Jeden wątek XGBoost na proces - rdzenie dzielą procesy, nie wątki
+    _predictor = PricePredictor(model_path, n_jobs=1)
+
+
+def score_frame(predictor, df) -> pa.Table:
+    """Predykcje i rezydua dla ramki ogłoszeń"""
+    predicted = predictor.predict_frame(df)
+    price = df['price'].astype('float64').to_numpy(na_value=np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        residual_pct = np.where(predicted > 0, price / predicted - 1, np.nan)
+    return pa.Table.from_pydict({
+        'url': df['url'].astype(object).where(df['url'].notna(), None).tolist(),
+        'price': df['price'].astype('Int64').to_numpy(dtype=object, na_value=None).tolist(),
+        'predicted_price': predicted,
+        'residual': price - predicted,
+        'residual_pct': residual_pct,
+    }, schema=SCORE_SCHEMA)
+
+
+def _score_part(path: str, row_group: int, output: str, chunk: int, threshold: float) -> Tuple[int, int]:
+    """Ocenia jedną grupę wierszy pliku Parquet porcjami po `chunk` wierszy
+
+    Zwraca liczbę wierszy i ofert co najmniej `threshold` poniżej wyceny.
+    """
+    source = pq.ParquetFile(path)
+    columns = [name for name in SOURCE_COLUMNS + ['url'] if name in source.schema_arrow.names]
+    rows = underpriced = 0
+    with pq.ParquetWriter(output, SCORE_SCHEMA) as writer:
+        for batch in source.iter_batches(batch_size=chunk, row_groups=[row_group], columns=columns):
+            table = score_frame(_predictor, batch.to_pandas(types_mapper=pandas_types))
+            writer.write_table(table)
+            rows += table.num_rows
+            underpriced += int(np.sum(table.column('residual_pct').to_numpy() <= -threshold))
+    return rows, underpriced
+
+
+def run_tasks(store: ListingStore, run_id: str, directory: str) -> List[Tuple[str, int, str]]:
+    """(plik źródłowy, grupa wierszy, plik wynikowy) dla wszystkich części zrzutu"""
+    tasks = []
+    for path in sorted(glob.glob(os.path.join(store.run_dir(run_id), '*.parquet'))):
+        stem = os.path.basename(path)[:-len('.parquet')]
+        for row_group in range(pq.ParquetFile(path).num_row_groups):
+            tasks.append((path, row_group, os.path.join(directory, f'{stem}-{row_group:05d}.parquet')))
+    return tasks
+
+
+def scores_dir(store: ListingStore, run_id: str, model_name: str) -> str:
+    return os.path.join(store.run_dir(run_id), SCORES_DIR, model_name)
+
+
+def peak_memory_mb() -> Dict[str, float]:
+    """Szczytowe RSS procesu głównego i największego zakończonego procesu potomnego"""
+    return {
+        'main': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'worker': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def score_runs(store: ListingStore, runs: List[str], model_path: str, workers: int, chunk: int,
+               threshold: float = 0.2, force: bool = False) -> Dict[str, Tuple[int, int]]:
+    """Ocenia zrzuty w puli procesów: run_id -> (wiersze, oferty zaniżone)
+
+    Zrzuty jeszcze zapisywane (bez `_SUCCESS`) są pomijane - inaczej
+    częściowe wyniki blokowałyby później ocenę całego zrzutu.
+    Wyniki zrzutu powstają w katalogu tymczasowym i pojawiają się
+    atomowo (zmiana nazwy) dopiero po ocenie wszystkich części.
+    """
+    model_name = os.path.basename(model_path)[:-len('.json')]
+    scored = {}
+    # spawn - jak w ParsePipeline i reparse.py, bez dziedziczenia stanu procesu głównego
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(model_path,)) as pool:
+        for run_id in runs:
+            if not store.is_complete(run_id):
+                logger.warning(f"Zrzut {run_id} nie jest ukończony (brak znacznika _SUCCESS) - pomijam")
+                continue
+            directory = scores_dir(store, run_id, model_name)
+            if os.path.exists(directory) and not force:
+                logger.info(f"Zrzut {run_id} ma już wyniki modelu {model_name} - pomijam")
+                continue
+            tmp_directory = directory + '.tmp'
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            os.makedirs(tmp_directory)
+
+            totals = np.zeros(2, dtype=np.int64)
+            # Ograniczona liczba zadań w locie - pamięć nie rośnie z rozmiarem zrzutu
+            pending = deque()
+            for path, row_group, output in run_tasks(store, run_id, tmp_directory):
+                pending.append(pool.submit(_score_part, path, row_group, output, chunk, threshold))
+                if len(pending) >= 2 * workers:
+                    totals += pending.popleft().result()
+            while pending:
+                totals += pending.popleft().result()
+
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(tmp_directory, directory)
+            scored[run_id] = (int(totals[0]), int(totals[1]))
+            logger.info(f"Zrzut {run_id}: {totals[0]} ocenionych ogłoszeń w {directory}")
+    return scored
+
+
+def main(argv: List[str] = None):
+    from model.predictor import latest_model
+
+    parser = argparse.ArgumentParser(description="Ocena wszystkich ogłoszeń zrzutu modelem cen")
+    parser.add_argument('--store', default='data/store')
+    parser.add_argument('--runs', nargs='+', help="Zrzuty do oceny (domyślnie najnowszy ukończony crawl)")
+    parser.add_argument('--all', action='store_true', help="Wszystkie ukończone crawle w magazynie (bez zrzutów z reparse.py)")
+    parser.add_argument('--model', help="Plik modelu (domyślnie najnowszy z data/models)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk', type=int, default=50_000, help="Wierszy w jednej porcji procesu")
+    parser.add_argument('--force', action='store_true', help="Oceń ponownie zrzuty już ocenione tym modelem")
+    parser.add_argument('--underpriced', type=float, default=0.2,
+                        help="Próg zaniżonej ceny w podsumowaniu (udział poniżej wyceny)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = ListingStore(args.store)
+    # Bez zrzutów z reparse.py - powtarzają crawle, a sortują się po nich
+    snapshots = store.runs()
+    runs = snapshots if args.all else (args.runs or snapshots[-1:])
+    if not runs:
+        print(f"Magazyn {args.store} jest pusty")
+        return
+    model_path = args.model or latest_model()
+
+    started = time.perf_counter()
+    scored = score_runs(store, runs, model_path, args.workers, args.chunk, threshold=args.underpriced,
+                        force=args.force)
+    elapsed = time.perf_counter() - started
+    rows = sum(rows for rows, _ in scored.values())
+    memory = peak_memory_mb()
+    print(f"Ocenione zrzuty: {len(scored)}/{len(runs)}, {rows} ogłoszeń w {elapsed:.1f}s "
+          f"({rows / elapsed:,.0f} wierszy/s, {args.workers} procesów)")
+    print(f"Szczytowa pamięć: proces główny {memory['main']:.0f} MB, proces roboczy {memory['worker']:.0f} MB")
+
+    model_name = os.path.basename(model_path)[:-len('.json')]
+    for run_id, (run_rows, underpriced) in scored.items():
+        print(f"{run_id}: {run_rows} ofert, {underpriced} co najmniej {args.underpriced:.0%} poniżej wyceny "
+              f"({scores_dir(store, run_id, model_name)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# model/train.py
+import argparse
+import glob
+import itertools
+import json
+import os
+import sys
+import time
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.features import SOURCE_COLUMNS, FeatureMatrix, build_matrix, snapshot_hash
+from storage.listing_store import ListingStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FEATURE_CACHE_DIR = 'data/features'
+MODEL_DIR = 'data/models'
+
+
+def source_files(source: str) -> List[str]:
+    """Pliki, od których zależy macierz: części Parquet ukończonych crawli magazynu albo pojedynczy zrzut"""
+    if os.path.isdir(source):
+        store = ListingStore(source)
+        return sorted(path for run_id in store.runs()
+                      for path in glob.glob(os.path.join(store.run_dir(run_id), '*.parquet')))
+    return [source]
+
+
+def load_frame(source: str, runs: List[str] = None) -> pd.DataFrame:
+    """Surowe ogłoszenia z magazynu (tylko kolumny potrzebne do cech) lub pliku
+
+    Z magazynu domyślnie tylko ukończone crawle (`ListingStore.runs`) -
+    zrzut w toku albo z reparse.py dałby te same oferty po obu stronach
+    podziału na zbiór uczący i testowy.
+    """
+    if os.path.isdir(source):
+        store = ListingStore(source)
+        return store.read(columns=SOURCE_COLUMNS, runs=store.runs() if runs is None else runs)
+    if source.endswith('.json'):
+        with open(source, 'r', encoding='utf-8') as f:
+            return pd.DataFrame(json.load(f))
+    if source.endswith('.jsonl'):
+        return pd.read_json(source, lines=True)
+    if source.endswith('.parquet'):
+        return pd.read_parquet(source)
+    return pd.read_csv(source)
+
+
+def load_matrix(source: str, cache_dir: str = FEATURE_CACHE_DIR, use_cache: bool = True) -> FeatureMatrix:
+    """Macierz cech dla źródła - z cache, jeśli dane się nie zmieniły
+
+    Kluczem jest skrót zawartości plików źródłowych, więc ponowne uczenie
+    i przeszukiwanie hiperparametrów nie parsuje surowych danych od nowa.
+    """
+    files = source_files(source)
+    if not files:
+        raise FileNotFoundError(f"Brak danych w {source}")
+    key = snapshot_hash(files)
+    directory = os.path.join(cache_dir, key)
+
+    if use_cache and os.path.exists(os.path.join(directory, 'meta.json')):
+        logger.info(f"Macierz cech z cache: {directory}")
+        return FeatureMatrix.load(directory)
+
+    started = time.perf_counter()
+    matrix = build_matrix(load_frame(source))
+    matrix.meta.update({'key': key, 'source': source, 'files': len(files)})
+    logger.info(f"Zbudowano macierz {len(matrix)} x {len(matrix.feature_names)} "
+                f"w {time.perf_counter() - started:.2f}s")
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        matrix.save(directory)
+        matrix = FeatureMatrix.load(directory)
+    return matrix
+
+
+def split_rows(rows: int, test_size: float, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.random.default_rng(seed).permutation(rows)
+    test_rows = max(1, int(rows * test_size))
+    return np.sort(order[test_rows:]), np.sort(order[:test_rows])
+
+
+def evaluate(predicted_log: np.ndarray, actual_log: np.ndarray) -> Dict[str, float]:
+    predicted = np.expm1(predicted_log)
+    actual = np.expm1(actual_log)
+    return {
+        'mae': float(np.mean(np.abs(predicted - actual))),
+        'mape': float(np.mean(np.abs(predicted - actual) / actual)),
+        'rmse_log': float(np.sqrt(np.mean((predicted_log - actual_log) ** 2))),
+    }
+
+
+def train_model(matrix: FeatureMatrix, params: Dict[str, Any], test_size: float = 0.2, seed: int = 42,
+                n_jobs: int = -1):
+    """Uczy XGBoost na log(1 + cena), zwraca (model, metryki na zbiorze testowym)"""
+    import xgboost as xgb
+
+    train_rows, test_rows = split_rows(len(matrix), test_size, seed)
+    target = np.asarray(matrix.target)
+    names = matrix.feature_names
+    train = xgb.DMatrix(matrix.to_csr(train_rows), label=target[train_rows], feature_names=names,
+                        missing=np.nan, nthread=n_jobs)
+    test = xgb.DMatrix(matrix.to_csr(test_rows), label=target[test_rows], feature_names=names,
+                       missing=np.nan, nthread=n_jobs)
+
+    booster_params = {
+        'objective': 'reg:squarederror',
+        'tree_method': 'hist',
+        'nthread': n_jobs,
+        'seed': seed,
+        **{key: value for key, value in params.items() if key != 'n_estimators'},
+    }
+    booster = xgb.train(booster_params, train, num_boost_round=params.get('n_estimators', 400),
+                        evals=[(test, 'test')], early_stopping_rounds=50, verbose_eval=False)
+    predicted = booster.predict(test, iteration_range=(0, booster.best_iteration + 1))
+    metrics = evaluate(predicted, target[test_rows])
+    metrics['best_iteration'] = int(booster.best_iteration)
+    return booster, metrics
+
+
+def save_model(booster, matrix: FeatureMatrix, params: Dict[str, Any], metrics: Dict[str, float],
+               directory: str = MODEL_DIR) -> str:
+    """Zapisuje model razem ze słownikiem kategorii potrzebnym do predykcji"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"price_xgb_{matrix.meta.get('key', 'adhoc')}.json")
+    booster.save_model(path)
+    with open(path[:-5] + '.meta.json', 'w', encoding='utf-8') as f:
+        json.dump({
+            'params': params,
+            'metrics': metrics,
+            'rows': len(matrix),
+            'dense_names': matrix.dense_names,
+            'vocabulary': matrix.vocabulary,
+            'matrix': matrix.meta,
+        }, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Uczenie modelu cen mieszkań (XGBoost)")
+    parser.add_argument('source', nargs='?', default='data/store',
+                        help="Magazyn ogłoszeń albo plik CSV/JSON/JSONL/Parquet")
+    parser.add_argument('--max-depth', type=int, nargs='+', default=[6])
+    parser.add_argument('--learning-rate', type=float, nargs='+', default=[0.05])
+    parser.add_argument('--n-estimators', type=int, default=400)
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Wątki XGBoost (-1 - wszystkie rdzenie)")
+    parser.add_argument('--no-cache', action='store_true', help="Zbuduj macierz cech od nowa")
+    args = parser.parse_args(argv)
+
+    matrix = load_matrix(args.source, use_cache=not args.no_cache)
+    print(f"Macierz cech: {len(matrix)} ofert, {len(matrix.feature_names)} cech "
+          f"({len(matrix.dense_names)} liczbowych, {matrix.sparse.shape[1]} kodowanych)")
+
+    best = None
+    for max_depth, learning_rate in itertools.product(args.max_depth, args.learning_rate):
+        params = {'max_depth': max_depth, 'learning_rate': learning_rate, 'n_estimators': args.n_estimators}
+        started = time.perf_counter()
+        booster, metrics = train_model(matrix, params, n_jobs=args.n_jobs)
+        print(f"max_depth={max_depth} learning_rate={learning_rate}: MAE {metrics['mae']:,.0f} zł, "
+              f"MAPE {metrics['mape']:.1%} ({time.perf_counter() - started:.1f}s)")
+        if best is None or metrics['mae'] < best[2]['mae']:
+            best = (booster, params, metrics)
+
+    booster, params, metrics = best
+    path = save_model(booster, matrix, params, metrics)
+    print(f"Zapisano model {params} do {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# reparse.py
+import argparse
+import glob
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import groupby
+from typing import Any, Dict, List, Sequence, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scrapers.page_archive import PageArchive, read_segment_records
+from storage.listing_sink import ListingSink
+from storage.listing_store import REPARSE_SUFFIX, ListingStore
+from storage.validation import BatchValidator
+
+# Scraper budowany raz w każdym procesie parsującym
+_scraper = None
+
+
+def _init_worker():
+    global _scraper
+    logging.disable(logging.INFO)
+    from scrapers.otodom_scraper import OtodomScraper
+    _scraper = OtodomScraper()
+
+
+def _parse_chunk(directory: str, segment: str,
+                 entries: Sequence[Tuple[str, float, int, int]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Parsuje kolejne strony jednego segmentu; czas zrzutu to czas pobrania strony"""
+    listings, failed = [], 0
+    for url, fetched_at, body in read_segment_records(directory, segment, entries):
+        listing = _scraper.build_listing(body, url)
+        if not listing:
+            failed += 1
+            continue
+        listing['scraped_at'] = datetime.fromtimestamp(fetched_at).isoformat()
+        listings.append(dict(listing))
+    return listings, failed
+
+
+def chunks(records: Sequence[Tuple[str, float, str, int, int]], size: int):
+    """Zadania (segment, wpisy) po najwyżej `size` stron z jednego segmentu"""
+    for segment, rows in groupby(records, key=lambda row: row[2]):
+        rows = [(url, fetched_at, offset, length) for url, fetched_at, _, offset, length in rows]
+        for start in range(0, len(rows), size):
+            yield segment, rows[start:start + size]
+
+
+def fetch_day(fetched_at: float) -> str:
+    """Dzień pobrania strony (RRRRMMDD) - od niego pochodzi identyfikator zrzutu"""
+    return datetime.fromtimestamp(fetched_at).strftime('%Y%m%d')
+
+
+def write_results(future, sink: ListingSink) -> int:
+    listings, failed = future.result()
+    for listing in listings:
+        sink.write(listing)
+    return failed
+
+
+def parse_date(value: str) -> float:
+    return datetime.strptime(value, '%Y-%m-%d').timestamp() if value else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ponowne parsowanie zarchiwizowanych stron ofert bez sieci")
+    parser.add_argument('--archive', default='data/archive')
+    parser.add_argument('--store', default='data/store')
+    parser.add_argument('--raw', default='data/raw', help="Katalog plików JSON Lines i kwarantanny")
+    parser.add_argument('--from', dest='start', help="Pobrane od dnia (RRRR-MM-DD)")
+    parser.add_argument('--to', dest='end', help="Pobrane przed dniem (RRRR-MM-DD)")
+    parser.add_argument('--all-fetches', action='store_true',
+                        help="Każde pobranie osobno zamiast ostatniego dla oferty")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk', type=int, default=64, help="Stron w jednym zadaniu procesu")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    archive = PageArchive(args.archive)
+    records = archive.records('%/pl/oferta/%', start=parse_date(args.start), end=parse_date(args.end),
+                              latest=not args.all_fetches)
+    archive.close()
+    if not records:
+        print(f"Brak zarchiwizowanych ofert w {args.archive}")
+        return
+
+    print(f"Parsuję {len(records)} stron z archiwum w {args.workers} procesach...")
+    store = ListingStore(args.store)
+    validator = BatchValidator()
+    # Dzień po dniu, w dniu - kolejność segmentów i przesunięć jak w archiwum
+    records = sorted(records, key=lambda row: (fetch_day(row[1]), row[2], row[3]))
+    started = time.perf_counter()
+    failed = written = rejected = 0
+    # spawn - tak jak w ParsePipeline, bez dziedziczenia stanu procesu głównego
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker) as pool:
+        for day, day_records in groupby(records, key=lambda row: fetch_day(row[1])):
+            # Jeden zrzut na dzień pobrania; przyrostek odróżnia go od crawli tego dnia
+            # (pomija go indeks cen), a ponowne parsowanie dnia zastępuje poprzednie
+            run_id, prefix = day + REPARSE_SUFFIX, f'otodom_reparse_{day}'
+            shutil.rmtree(store.run_dir(run_id), ignore_errors=True)
+            for path in glob.glob(os.path.join(args.raw, f'{prefix}_*_{run_id}.jsonl')):
+                os.remove(path)
+            sink = ListingSink(args.raw, prefix=prefix, store=store, run_id=run_id,
+                               validator=validator)
+            # Ograniczona liczba zadań w locie - wyniki nie gromadzą się w pamięci
+            pending = deque()
+            for segment, entries in chunks(list(day_records), args.chunk):
+                pending.append(pool.submit(_parse_chunk, args.archive, segment, entries))
+                if len(pending) < 4 * args.workers:
+                    continue
+                failed += write_results(pending.popleft(), sink)
+            while pending:
+                failed += write_results(pending.popleft(), sink)
+            sink.close()
+            written += sink.count - sink.rejected
+            rejected += sink.rejected
+            print(f"{run_id}: {sink.count - sink.rejected} ogłoszeń w {sink.parquet_dir}, "
+                  f"w kwarantannie: {sink.rejected}")
+    elapsed = time.perf_counter() - started
+
+    print(f"Zapisano {written} ogłoszeń w {elapsed:.1f}s ({len(records) / elapsed:.0f} stron/s), "
+          f"błędy parsowania: {failed}, w kwarantannie: {rejected}")
+
+
+if __name__ == "__main__":
+    main()
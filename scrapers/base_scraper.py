@@ -1,26 +1,82 @@
 # scrapers/base_scraper.py
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Tuple
 import requests
 from bs4 import BeautifulSoup
 import time
 import logging
 from datetime import datetime
 
+from .http_cache import CachingAdapter, HttpCache
+from .listing_index import ListingIndex
+from .metrics import CrawlMetrics, InstrumentedAdapter
+from .page_archive import ArchivingAdapter, PageArchive
+from .pipeline import ParsePipeline
+from .rate_limiter import HostRateLimiter, RateLimitedAdapter
+from .resilience import ResilientAdapter
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# lxml buduje drzewo kilkukrotnie szybciej niż wbudowany html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
 
 class BaseScraper(ABC):
     """Abstrakcyjna klasa bazowa dla scraperów"""
     
-    def __init__(self, base_url: str, delay: float = 1.0):
+    # Czas świeżości wpisów cache HTTP: (regex URLa, sekundy)
+    cache_ttls: List[Tuple[str, float]] = []
+    
+    def __init__(self, base_url: str, delay: float = 1.0, concurrency: int = 1, burst: float = 1.0,
+                 cache_dir: str = None, cache_max_bytes: int = 512 * 1024 * 1024,
+                 index_path: str = None, index_max_age: float = 7 * 24 * 60 * 60,
+                 parse_workers: int = 0, timeout: Tuple[float, float] = (5.0, 30.0), max_retries: int = 3,
+                 archive_dir: str = None):
         self.base_url = base_url
         self.delay = delay
+        self.concurrency = max(1, concurrency)
+        # Procesy parsujące: 0 - parsowanie w wątkach pobierających, -1 - liczba rdzeni
+        self.parse_workers = parse_workers
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        
+        # Uprzejmość wobec serwisu: kubełek tokenów per host zamiast stałego sleep
+        self.rate_limiter = HostRateLimiter(rate=1.0 / delay if delay > 0 else None, burst=burst)
+        adapter = RateLimitedAdapter(self.rate_limiter, pool_maxsize=max(10, self.concurrency + 1))
+        
+        # Ponowienia, bezpiecznik i limit równoległości dostosowywany do
+        # odpowiedzi serwisu (`concurrency` to jego górna granica)
+        self.metrics = CrawlMetrics()
+        self.resilience = ResilientAdapter(adapter, timeout=timeout, max_retries=max_retries,
+                                           max_concurrency=self.concurrency, metrics=self.metrics)
+        adapter = self.resilience
+        
+        # Archiwum surowych stron do ponownego parsowania bez sieci (reparse.py)
+        self.archive = None
+        if archive_dir:
+            self.archive = PageArchive(archive_dir)
+            adapter = ArchivingAdapter(self.archive, adapter)
+        
+        self.cache = None
+        if cache_dir:
+            self.cache = HttpCache(cache_dir, max_bytes=cache_max_bytes, ttls=self.cache_ttls)
+            adapter = CachingAdapter(self.cache, adapter)
+        
+        adapter = InstrumentedAdapter(self.metrics, adapter)
+        
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # Indeks znanych ofert dla crawlu przyrostowego
+        self.index = ListingIndex(index_path, max_age=index_max_age) if index_path else None
     
     @abstractmethod
     def parse_listing(self, soup: BeautifulSoup) -> Dict[str, Any]:
@@ -28,18 +84,36 @@ class BaseScraper(ABC):
         pass
     
     @abstractmethod
-    def get_listings_urls(self, page: int) -> List[str]:
-        """Pobiera URLe ogłoszeń z danej strony"""
+    def get_listings_urls(self, page: int, search: str = None) -> List[str]:
+        """Pobiera URLe ogłoszeń z danej strony (opcjonalnie dla innego zakresu wyszukiwania)"""
         pass
     
-    def scrape_listing(self, url: str) -> Dict[str, Any]:
-        """Scrapuje pojedyncze ogłoszenie"""
+    def listing_id(self, url: str) -> str:
+        """Stały identyfikator oferty wyznaczony z URLa"""
+        return url
+    
+    def parse_content(self, content: bytes) -> Dict[str, Any]:
+        """Parsuje surową treść strony ogłoszenia"""
+        soup = BeautifulSoup(content, HTML_PARSER)
+        return self.parse_listing(soup)
+    
+    def fetch_listing(self, url: str) -> Optional[bytes]:
+        """Pobiera surową treść strony ogłoszenia"""
         try:
             response = self.session.get(url)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            return response.content
             
-            listing_data = self.parse_listing(soup)
+        except Exception as e:
+            self.metrics.increment('fetch_failed')
+            logger.error(f"Błąd przy pobieraniu {url}: {e}")
+            return None
+    
+    def build_listing(self, content: bytes, url: str) -> Dict[str, Any]:
+        """Parsuje pobraną stronę i uzupełnia pola techniczne"""
+        try:
+            with self.metrics.timer('parse'):
+                listing_data = self.parse_content(content)
             listing_data['url'] = url
             listing_data['scraped_at'] = datetime.now().isoformat()
             
@@ -49,21 +123,85 @@ class BaseScraper(ABC):
             logger.error(f"Błąd przy scrapowaniu {url}: {e}")
             return None
     
-    def scrape_all(self, max_pages: int = 5) -> List[Dict[str, Any]]:
-        """Scrapuje wszystkie ogłoszenia"""
+    def scrape_listing(self, url: str) -> Dict[str, Any]:
+        """Scrapuje pojedyncze ogłoszenie"""
+        content = self.fetch_listing(url)
+        if content is None:
+            return None
+        return self.build_listing(content, url)
+    
+    def scrape_all(self, max_pages: int = 5, concurrency: int = None,
+                   incremental: bool = True, start_page: int = 1,
+                   on_listing: Callable[[Dict[str, Any]], None] = None,
+                   on_page_done: Callable[[int], None] = None) -> List[Dict[str, Any]]:
+        """Scrapuje wszystkie ogłoszenia
+        
+        Szczegóły ofert pobiera `concurrency` wątków naraz, a w tle pobierana
+        jest już lista URLi z następnej strony wyników. Tempo żądań do hosta
+        ogranicza kubełek tokenów (`delay` sekund na token).
+        
+        Z indeksem ofert (`index_path`) crawl jest przyrostowy: świeże oferty
+        są pomijane, nieaktualne pobierane ponownie, a paginacja kończy się
+        na pierwszej stronie, na której wszystkie oferty są już znane.
+        
+        Przy `parse_workers` różnym od 0 pobieranie i parsowanie są
+        rozdzielone: strony trafiają przez ograniczoną kolejkę do puli
+        procesów parsujących (patrz `ParsePipeline`).
+        
+        Z `on_listing` każde ogłoszenie jest przekazywane od razu i nie jest
+        gromadzone w zwracanej liście; `on_page_done` dostaje numer każdej
+        ukończonej strony (np. do zapisu checkpointu). Oferty trafiają do
+        indeksu dopiero po `on_page_done` - po przerwaniu crawla oferty ze
+        strony bez checkpointu nie są uznane za świeże i przy wznowieniu
+        zostaną pobrane ponownie.
+        """
+        concurrency = max(1, concurrency or self.concurrency)
+        index = self.index if incremental else None
         all_listings = []
         
-        for page in range(1, max_pages + 1):
-            logger.info(f"Scrapuję stronę {page}/{max_pages}")
+        with ParsePipeline(self, fetchers=concurrency, parsers=self.parse_workers) as pipeline, \
+                ThreadPoolExecutor(max_workers=1) as prefetcher:
+            next_urls = prefetcher.submit(self.get_listings_urls, start_page)
             
-            urls = self.get_listings_urls(page)
-            
-            for url in urls:
-                listing = self.scrape_listing(url)
-                if listing:
-                    all_listings.append(listing)
-                time.sleep(self.delay)
+            for page in range(start_page, max_pages + 1):
+                logger.info(f"Scrapuję stronę {page}/{max_pages}")
+                
+                urls = next_urls.result()
+                page_fully_known = False
+                if index is not None and urls:
+                    known = index.lookup(self.listing_id(url) for url in urls)
+                    page_fully_known = len(known) == len(set(map(self.listing_id, urls)))
+                    stale = [url for url in urls if not index.is_fresh(known.get(self.listing_id(url)))]
+                    logger.info(f"Strona {page}: {len(urls) - len(stale)} ofert aktualnych w indeksie, "
+                                f"{len(stale)} do pobrania")
+                    urls = stale
+                
+                if page < max_pages and not page_fully_known:
+                    next_urls = prefetcher.submit(self.get_listings_urls, page + 1)
+                
+                started = time.monotonic()
+                fetched = []
+                for url, listing in pipeline.run(urls):
+                    if listing:
+                        self.metrics.record_listing(listing)
+                        if on_listing:
+                            on_listing(listing)
+                        else:
+                            all_listings.append(listing)
+                        fetched.append((url, listing))
+                
+                self.metrics.increment('pages')
+                if urls:
+                    elapsed = time.monotonic() - started
+                    logger.info(f"Strona {page}: {len(urls)} ofert w {elapsed:.1f}s")
+                if on_page_done:
+                    on_page_done(page)
+                if index is not None:
+                    changed = sum(index.record(self.listing_id(url), url, listing) for url, listing in fetched)
+                    logger.info(f"Strona {page}: {changed} ofert nowych lub zmienionych")
+                
+                if page_fully_known:
+                    logger.info(f"Wszystkie oferty ze strony {page} są już znane - kończę paginację")
+                    break
             
         return all_listings
-
-
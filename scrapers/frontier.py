@@ -0,0 +1,287 @@
+# scrapers/frontier.py
+import itertools
+import os
+import sqlite3
+import time
+import logging
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Województwa w zapisie ścieżek wyszukiwania Otodom
+REGIONS = [
+    'dolnoslaskie', 'kujawsko--pomorskie', 'lubelskie', 'lubuskie', 'lodzkie', 'malopolskie',
+    'mazowieckie', 'opolskie', 'podkarpackie', 'podlaskie', 'pomorskie', 'slaskie',
+    'swietokrzyskie', 'warminsko--mazurskie', 'wielkopolskie', 'zachodniopomorskie',
+]
+TRANSACTIONS = ['sprzedaz', 'wynajem']
+ESTATES = ['mieszkanie', 'dom', 'dzialka', 'lokal', 'pokoj', 'garaz']
+
+# Najpierw oferty, potem kolejne strony wyników - inaczej kolejka ofert rosłaby bez końca
+KIND_PRIORITY = {'offer': 0, 'search': 1}
+
+
+def search_scopes(regions: Sequence[str] = ('mazowieckie',), transactions: Sequence[str] = ('sprzedaz',),
+                  estates: Sequence[str] = ('mieszkanie',), cities: Sequence[str] = ()) -> List[str]:
+    """Ścieżki wyszukiwania `transakcja/typ/województwo[/miasto]` dla wszystkich kombinacji
+
+    `cities` w postaci `województwo/miasto` zastępują całe województwo
+    - mniejsze zakresy rozkładają się na więcej krótszych paginacji.
+    """
+    areas = list(cities) or list(regions)
+    return [f'{transaction}/{estate}/{area}'
+            for transaction, estate, area in itertools.product(transactions, estates, areas)]
+
+
+class CrawlFrontier:
+    """Wspólna kolejka zadań crawla w SQLite z dzierżawą wierszy
+
+    Zadaniem jest strona wyników (`search`) albo strona oferty (`offer`),
+    a kluczem - URL, więc oferta widoczna w kilku zakresach jest pobierana
+    raz. Proces roboczy bierze partię zadań na `lease_timeout` sekund; gdy
+    jej nie zamknie (awaria, zabity proces), zadania wracają do puli po
+    wygaśnięciu dzierżawy. Zamknięcie zadania przez proces, któremu
+    dzierżawa już wygasła, jest ignorowane - nikt nie nadpisze cudzej pracy.
+
+    Tylko procesy jednej maszyny: baza działa w trybie WAL, który wymaga
+    pamięci współdzielonej i nie działa na sieciowym systemie plików
+    (NFS, SMB) - plik musi leżeć na dysku lokalnym.
+
+    Limit tempa żądań (`delay`) jest liczony osobno w każdym procesie
+    roboczym - N procesów wysyła do hosta do N razy więcej żądań, więc
+    przy N procesach `delay` trzeba pomnożyć przez N.
+    """
+
+    def __init__(self, path: str, lease_timeout: float = 300.0, max_attempts: int = 3):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # isolation_level=None - transakcje otwieramy jawnie (BEGIN IMMEDIATE)
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                scope TEXT NOT NULL,
+                page INTEGER,
+                state TEXT NOT NULL DEFAULT 'pending',
+                owner TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS tasks_queue ON tasks (state, priority, lease_until)")
+
+    def _add(self, tasks: Iterable[Tuple[str, str, str, int]]) -> int:
+        now = time.time()
+        rows = [(url, kind, KIND_PRIORITY[kind], scope, page, now) for url, kind, scope, page in tasks]
+        if not rows:
+            return 0
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.db.total_changes
+            self.db.executemany(
+                "INSERT OR IGNORE INTO tasks (url, kind, priority, scope, page, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            added = self.db.total_changes - before
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return added
+
+    def add_search(self, url: str, scope: str, page: int) -> int:
+        return self._add([(url, 'search', scope, page)])
+
+    def add_offers(self, urls: Iterable[str], scope: str) -> int:
+        """Dodaje oferty ze strony wyników, zwraca liczbę nowych (reszta już była)"""
+        return self._add((url, 'offer', scope, None) for url in urls)
+
+    def lease(self, owner: str, limit: int = 36) -> List[Tuple[str, str, str, int]]:
+        """Dzierżawi do `limit` zadań jednego rodzaju: [(url, kind, scope, page)]
+
+        Wybór i oznaczenie wierszy to jedna transakcja z blokadą zapisu,
+        więc dwa procesy nigdy nie dostaną tego samego zadania.
+        """
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            head = self.db.execute(
+                "SELECT kind FROM tasks WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?) "
+                "ORDER BY priority LIMIT 1", (now,)
+            ).fetchone()
+            if head is None:
+                self.db.execute("COMMIT")
+                return []
+            rows = self.db.execute(
+                "UPDATE tasks SET state = 'leased', owner = ?, lease_until = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE url IN (SELECT url FROM tasks WHERE kind = ? AND "
+                "(state = 'pending' OR (state = 'leased' AND lease_until < ?)) ORDER BY page LIMIT ?) "
+                "RETURNING url, kind, scope, page",
+                (owner, now + self.lease_timeout, now, head[0], now, limit),
+            ).fetchall()
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _finish(self, owner: str, urls: Sequence[str], state: str, condition: str = '') -> int:
+        if not urls:
+            return 0
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.db.total_changes
+            self.db.executemany(
+                f"UPDATE tasks SET state = ?, owner = NULL, lease_until = NULL, updated_at = ? "
+                f"WHERE url = ? AND owner = ? AND state = 'leased'{condition}",
+                [(state, time.time(), url, owner) for url in urls],
+            )
+            changed = self.db.total_changes - before
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return changed
+
+    def complete(self, owner: str, urls: Sequence[str]) -> int:
+        """Zamyka wykonane zadania, zwraca liczbę zamkniętych przez tego właściciela"""
+        return self._finish(owner, urls, 'done')
+
+    def release(self, owner: str, urls: Sequence[str]) -> int:
+        """Oddaje nieudane zadania do ponowienia albo - po `max_attempts` - oznacza jako błędne"""
+        failed = self._finish(owner, urls, 'failed', f" AND attempts >= {int(self.max_attempts)}")
+        return failed + self._finish(owner, urls, 'pending')
+
+    def reset(self):
+        """Nowy crawl: czyści kolejkę (zakresy trzeba zasiać ponownie)"""
+        self.db.execute("DELETE FROM tasks")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Liczba zadań według rodzaju i stanu"""
+        counts: Dict[str, Dict[str, int]] = {}
+        for kind, state, count in self.db.execute("SELECT kind, state, COUNT(*) FROM tasks GROUP BY kind, state"):
+            counts.setdefault(kind, {})[state] = count
+        return counts
+
+    def pending(self) -> int:
+        """Zadania do zrobienia, łącznie z wydzierżawionymi"""
+        return self.db.execute("SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'leased')").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+class FrontierWorker:
+    """Proces roboczy: dzierżawi zadania z `CrawlFrontier` i wykonuje je scraperem
+
+    Strona wyników dodaje do kolejki swoje oferty i następną stronę, aż do
+    pustej strony, `max_pages` albo - w crawlu przyrostowym - strony, na
+    której wszystkie oferty są świeże w indeksie. Oferty pobiera potok
+    scrapera (`ParsePipeline`) całymi dzierżawionymi partiami.
+    """
+
+    def __init__(self, scraper, frontier: CrawlFrontier, owner: str, max_pages: int = 500,
+                 incremental: bool = True, batch_size: int = 36):
+        self.scraper = scraper
+        self.frontier = frontier
+        self.owner = owner
+        self.max_pages = max_pages
+        self.index = scraper.index if incremental else None
+        self.batch_size = batch_size
+
+    def process_search(self, scope: str, page: int):
+        """Dodaje oferty ze strony wyników i następną stronę; błąd pobrania przechodzi wyżej"""
+        urls = self.scraper.fetch_listings_urls(page, search=scope)
+        if not urls:
+            logger.info(f"{scope}: koniec wyników na stronie {page}")
+            return
+
+        page_fully_known = False
+        if self.index is not None:
+            known = self.index.lookup(self.scraper.listing_id(url) for url in urls)
+            page_fully_known = len(known) == len(set(map(self.scraper.listing_id, urls)))
+            urls = [url for url in urls if not self.index.is_fresh(known.get(self.scraper.listing_id(url)))]
+
+        added = self.frontier.add_offers(urls, scope)
+        logger.info(f"{scope} strona {page}: {added} nowych ofert w kolejce")
+        if page < self.max_pages and not page_fully_known:
+            self.frontier.add_search(self.scraper.search_url(scope, page + 1), scope, page + 1)
+        self.scraper.metrics.increment('pages')
+
+    def run(self, on_listing=None, on_batch_done=None, idle_timeout: float = 30.0,
+            poll_interval: float = 2.0) -> int:
+        """Pracuje do wyczerpania kolejki, zwraca liczbę zapisanych ofert
+
+        Pusta kolejka przy zadaniach wydzierżawionych przez innych może się
+        jeszcze zapełnić (ich strony wyników), więc proces czeka do
+        `idle_timeout` sekund bez nowej pracy.
+
+        `on_batch_done` po każdej partii utrwala zapisane oferty (checkpoint
+        zapisu); dopiero potem oferty trafiają do indeksu, a zadania są
+        zamykane. Zabity proces nie gubi więc ofert - zadania partii bez
+        checkpointu wracają do kolejki po wygaśnięciu dzierżawy.
+        """
+        from .pipeline import ParsePipeline
+
+        written = 0
+        idle_since = None
+        with ParsePipeline(self.scraper, fetchers=self.scraper.concurrency,
+                           parsers=self.scraper.parse_workers) as pipeline:
+            while True:
+                tasks = self.frontier.lease(self.owner, self.batch_size)
+                if not tasks:
+                    if not self.frontier.pending():
+                        break
+                    idle_since = idle_since or time.monotonic()
+                    if time.monotonic() - idle_since > idle_timeout:
+                        logger.info("Brak nowych zadań - kończę pracę")
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                idle_since = None
+
+                done, failed = [], []
+                offers = {url: scope for url, kind, scope, _ in tasks if kind == 'offer'}
+                for url, kind, scope, page in tasks:
+                    if kind != 'search':
+                        continue
+                    try:
+                        self.process_search(scope, page)
+                        done.append(url)
+                    except Exception as e:
+                        self.scraper.metrics.increment('fetch_failed')
+                        logger.error(f"Błąd przy pobieraniu listy ogłoszeń {url}: {e}")
+                        failed.append(url)
+
+                fetched = []
+                for url, listing in pipeline.run(list(offers)):
+                    if not listing:
+                        failed.append(url)
+                        continue
+                    listing['search'] = offers[url]
+                    self.scraper.metrics.record_listing(listing)
+                    if on_listing:
+                        on_listing(listing)
+                    fetched.append((url, listing))
+                    done.append(url)
+                    written += 1
+
+                if on_batch_done:
+                    on_batch_done()
+                if self.index is not None:
+                    for url, listing in fetched:
+                        self.index.record(self.scraper.listing_id(url), url, listing)
+                completed = self.frontier.complete(self.owner, done)
+                if completed < len(done):
+                    logger.warning(f"{len(done) - completed} zadań zamknął już inny proces - dzierżawa wygasła")
+                self.frontier.release(self.owner, failed)
+        return written
@@ -0,0 +1,217 @@
+# scrapers/http_cache.py
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+# Nagłówki, których nie zapisujemy - treść trzymamy już zdekompresowaną
+SKIPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'set-cookie'}
+
+
+class HttpCache:
+    """Trwały cache odpowiedzi HTTP na dysku z usuwaniem LRU
+
+    Treści leżą w osobnych plikach, a metadane (ETag, Last-Modified, czas
+    zapisu i ostatniego użycia) w indeksie SQLite w tym samym katalogu.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024,
+                 ttls: List[Tuple[str, float]] = None, default_ttl: float = 0.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in (ttls or [])]
+        self.default_ttl = default_ttl
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), timeout=60, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self.db.commit()
+
+    def ttl_for(self, url: str) -> float:
+        """Czas świeżości dla danej klasy URLi (pierwsza pasująca reguła)"""
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + '.bin')
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Zwraca wpis z cache lub None"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT key, etag, last_modified, headers, stored_at FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        if not row:
+            return None
+
+        key, etag, last_modified, headers, stored_at = row
+        try:
+            with open(self._path(key), 'rb') as f:
+                body = f.read()
+        except OSError:
+            self.delete(url)
+            return None
+
+        return {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'headers': json.loads(headers or '{}'),
+            'stored_at': stored_at,
+            'body': body,
+            'fresh': time.time() - stored_at < self.ttl_for(url),
+        }
+
+    def store(self, url: str, body: bytes, headers: Dict[str, str]):
+        """Zapisuje odpowiedź i w razie potrzeby zwalnia miejsce"""
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Katalog dzielą wątki i procesy (ParsePipeline, crawl_worker) - identyfikatory
+        # wątków powtarzają się między procesami, więc nazwa zawiera też PID
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        kept = {k: v for k, v in headers.items() if k.lower() not in SKIPPED_HEADERS}
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, key, headers.get('ETag'), headers.get('Last-Modified'),
+                 json.dumps(kept), len(body), now, now)
+            )
+            self.db.commit()
+        self.evict()
+
+    def touch(self, url: str, revalidated: bool = False):
+        """Odnotowuje użycie wpisu; po 304 odnawia też jego świeżość"""
+        now = time.time()
+        with self.lock:
+            if revalidated:
+                self.db.execute("UPDATE entries SET accessed_at = ?, stored_at = ? WHERE url = ?", (now, now, url))
+            else:
+                self.db.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (now, url))
+            self.db.commit()
+
+    def delete(self, url: str):
+        with self.lock:
+            row = self.db.execute("SELECT key FROM entries WHERE url = ?", (url,)).fetchone()
+            self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self.db.commit()
+        if row:
+            try:
+                os.remove(self._path(row[0]))
+            except OSError:
+                pass
+
+    def size(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """Usuwa najdawniej używane wpisy, aż cache zmieści się w limicie"""
+        total = self.size()
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        with self.lock:
+            rows = self.db.execute("SELECT url, key, size FROM entries ORDER BY accessed_at").fetchall()
+        removed = 0
+        for url, key, size in rows:
+            if total <= target:
+                break
+            self.delete(url)
+            total -= size
+            removed += 1
+        logger.info(f"Cache HTTP: usunięto {removed} wpisów (LRU)")
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class CachingAdapter(BaseAdapter):
+    """Adapter requests obsługujący cache i warunkowe odświeżanie (ETag/304)
+
+    Świeże wpisy zwraca bez sieci, a nieświeże odpytuje przez `inner`
+    z nagłówkami If-None-Match/If-Modified-Since.
+    """
+
+    def __init__(self, cache: HttpCache, inner: BaseAdapter):
+        super().__init__()
+        self.cache = cache
+        self.inner = inner
+
+    def _cached_response(self, request, entry: Dict[str, Any]) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response._content = entry['body']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.from_cache = True
+        return response
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET':
+            return self.inner.send(request, **kwargs)
+
+        entry = self.cache.get(request.url)
+        if entry and entry['fresh']:
+            self.cache.touch(request.url)
+            return self._cached_response(request, entry)
+
+        if entry:
+            request = request.copy()
+            if entry['etag']:
+                request.headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request.headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self.inner.send(request, **kwargs)
+
+        if response.status_code == 304 and entry:
+            response.close()
+            self.cache.touch(request.url, revalidated=True)
+            return self._cached_response(request, entry)
+
+        if response.status_code == 200:
+            self.cache.store(request.url, response.content, response.headers)
+        response.from_cache = False
+        return response
+
+    def close(self):
+        self.inner.close()
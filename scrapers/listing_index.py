@@ -0,0 +1,93 @@
+# scrapers/listing_index.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+# Pola techniczne, które nie wchodzą do odcisku treści oferty
+VOLATILE_FIELDS = {'url', 'scraped_at', 'search'}
+
+
+def listing_fingerprint(listing: Dict[str, Any]) -> str:
+    """Odcisk treści ogłoszenia niezależny od kolejności pól i cech"""
+    content = {k: v for k, v in listing.items() if k not in VOLATILE_FIELDS}
+    if isinstance(content.get('features'), list):
+        content['features'] = sorted(content['features'])
+    payload = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class ListingIndex:
+    """Trwały indeks znanych ofert (SQLite): ID, czas ostatniego pobrania, odcisk"""
+
+    def __init__(self, path: str, max_age: float = 7 * 24 * 60 * 60):
+        self.path = path
+        self.max_age = max_age
+        self.lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # WAL i dłuższe czekanie na blokadę - indeks dzielą procesy crawla rozproszonego
+        self.db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS listings (
+                listing_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_scraped REAL NOT NULL,
+                fingerprint TEXT NOT NULL
+            )
+        """)
+        self.db.commit()
+
+    def lookup(self, listing_ids: Iterable[str]) -> Dict[str, float]:
+        """Zwraca {listing_id: last_scraped} dla znanych ofert"""
+        ids = list(listing_ids)
+        found = {}
+        with self.lock:
+            # SQLite ogranicza liczbę parametrów w jednym zapytaniu
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                found.update(self.db.execute(
+                    f"SELECT listing_id, last_scraped FROM listings WHERE listing_id IN ({placeholders})", chunk
+                ).fetchall())
+        return found
+
+    def is_fresh(self, last_scraped: Optional[float], now: float = None) -> bool:
+        if last_scraped is None:
+            return False
+        return (now or time.time()) - last_scraped < self.max_age
+
+    def record(self, listing_id: str, url: str, listing: Dict[str, Any]) -> bool:
+        """Zapisuje pobraną ofertę, zwraca True jeśli jej treść się zmieniła"""
+        fingerprint = listing_fingerprint(listing)
+        now = time.time()
+        with self.lock:
+            row = self.db.execute(
+                "SELECT fingerprint FROM listings WHERE listing_id = ?", (listing_id,)
+            ).fetchone()
+            if row:
+                self.db.execute(
+                    "UPDATE listings SET url = ?, last_scraped = ?, fingerprint = ? WHERE listing_id = ?",
+                    (url, now, fingerprint, listing_id)
+                )
+            else:
+                self.db.execute(
+                    "INSERT INTO listings VALUES (?, ?, ?, ?, ?)",
+                    (listing_id, url, now, now, fingerprint)
+                )
+            self.db.commit()
+        return row is None or row[0] != fingerprint
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,237 @@
+# scrapers/metrics.py
+import json
+import os
+import threading
+import time
+import logging
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from requests.adapters import BaseAdapter
+
+logger = logging.getLogger(__name__)
+
+# Granice kubełków histogramów opóźnień (sekundy)
+LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+# Pola, których brak w większości ofert świadczy o zmianie struktury strony
+CORE_FIELDS = ['title', 'price', 'area', 'rooms', 'floor', 'address']
+
+
+class Histogram:
+    """Histogram o stałych kubełkach, jak w Prometheusie"""
+
+    def __init__(self, buckets: List[float] = None):
+        self.buckets = buckets or LATENCY_BUCKETS
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Górna granica kubełka zawierającego kwantyl q"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + [float('inf')], self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts)),
+        }
+
+
+class CrawlMetrics:
+    """Metryki crawla: opóźnienia etapów, bajty, statusy HTTP, trafienia pól, kolejki"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.latency: Dict[str, Histogram] = defaultdict(Histogram)
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.http_status: Dict[int, int] = defaultdict(int)
+        self.field_hits: Dict[str, int] = defaultdict(int)
+        self.listings = 0
+        self.gauges: Dict[str, float] = {}
+        self.gauge_max: Dict[str, float] = defaultdict(float)
+
+    def observe(self, stage: str, seconds: float):
+        with self.lock:
+            self.latency[stage].observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def increment(self, name: str, value: float = 1):
+        with self.lock:
+            self.counters[name] += value
+
+    def record_response(self, status: int, size: int, from_cache: bool = False):
+        with self.lock:
+            self.http_status[status] += 1
+            self.counters['bytes_downloaded'] += 0 if from_cache else size
+            self.counters['cache_hits'] += 1 if from_cache else 0
+
+    def record_listing(self, listing: Dict[str, Any]):
+        """Zlicza, które pola parser zdołał wypełnić"""
+        with self.lock:
+            self.listings += 1
+            for key, value in listing.items():
+                if value not in (None, '', []):
+                    self.field_hits[key] += 1
+
+    def set_gauge(self, name: str, value: float):
+        with self.lock:
+            self.gauges[name] = value
+            self.gauge_max[name] = max(self.gauge_max[name], value)
+
+    def field_hit_rates(self) -> Dict[str, float]:
+        with self.lock:
+            if not self.listings:
+                return {}
+            return {field: hits / self.listings for field, hits in sorted(self.field_hits.items())}
+
+    def broken_fields(self, threshold: float = 0.5) -> List[str]:
+        """Kluczowe pola obecne w mniej niż `threshold` ofert"""
+        rates = self.field_hit_rates()
+        if not rates:
+            return []
+        return [field for field in CORE_FIELDS if rates.get(field, 0.0) < threshold]
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = time.time() - self.started
+        rates = self.field_hit_rates()
+        with self.lock:
+            return {
+                'elapsed_s': elapsed,
+                'listings': self.listings,
+                'listings_per_sec': self.listings / elapsed if elapsed else 0.0,
+                'latency': {stage: histogram.to_dict() for stage, histogram in self.latency.items()},
+                'counters': dict(self.counters),
+                'http_status': {str(status): count for status, count in sorted(self.http_status.items())},
+                'field_hit_rates': rates,
+                'gauges': dict(self.gauges),
+                'gauges_max': dict(self.gauge_max),
+            }
+
+    def to_prometheus(self, prefix: str = 'scraper') -> str:
+        """Zrzut metryk w formacie tekstowym Prometheusa"""
+        lines = []
+        rates = self.field_hit_rates()
+        with self.lock:
+            lines.append(f'# TYPE {prefix}_stage_seconds histogram')
+            for stage, histogram in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ['+Inf'], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'# TYPE {prefix}_{name}_total counter')
+                lines.append(f'{prefix}_{name}_total {value}')
+
+            lines.append(f'# TYPE {prefix}_http_responses_total counter')
+            for status, count in sorted(self.http_status.items()):
+                lines.append(f'{prefix}_http_responses_total{{status="{status}"}} {count}')
+
+            lines.append(f'# TYPE {prefix}_listings_total counter')
+            lines.append(f'{prefix}_listings_total {self.listings}')
+            lines.append(f'# TYPE {prefix}_field_hit_ratio gauge')
+            for field, rate in rates.items():
+                lines.append(f'{prefix}_field_hit_ratio{{field="{field}"}} {rate}')
+
+            for name, value in sorted(self.gauges.items()):
+                lines.append(f'# TYPE {prefix}_{name} gauge')
+                lines.append(f'{prefix}_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, json_path: str = None, prometheus_path: str = None):
+        if json_path:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        if prometheus_path:
+            tmp_path = prometheus_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            # Atomowa podmiana - czytnik textfile nie zobaczy połowy pliku
+            os.replace(tmp_path, prometheus_path)
+
+    def serve(self, port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+        """Udostępnia /metrics w tle na czas crawla"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = metrics.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Metryki dostępne pod http://{host}:{port}/metrics")
+        return server
+
+
+class InstrumentedAdapter(BaseAdapter):
+    """Zewnętrzna warstwa sesji mierząca czas pobrania, statusy i bajty"""
+
+    def __init__(self, metrics: CrawlMetrics, inner: BaseAdapter):
+        super().__init__()
+        self.metrics = metrics
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        started = time.perf_counter()
+        size = 0
+        try:
+            response = self.inner.send(request, **kwargs)
+            if not kwargs.get('stream'):
+                # Czas obejmuje pobranie całej treści, nie tylko nagłówków
+                size = len(response.content or b'')
+        except Exception:
+            self.metrics.increment('fetch_errors')
+            raise
+        finally:
+            self.metrics.observe('fetch', time.perf_counter() - started)
+        self.metrics.record_response(response.status_code, size,
+                                     from_cache=getattr(response, 'from_cache', False))
+        return response
+
+    def close(self):
+        self.inner.close()
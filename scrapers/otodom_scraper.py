@@ -1,27 +1,98 @@
 # scrapers/otodom_scraper.py
+import html
 import re
-import sys
-import os
 from typing import List, Dict, Any, Optional
 from bs4 import BeautifulSoup
 import json
-import time
 
-if __name__ == "__main__":
-    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from scrapers.base_scraper import BaseScraper
-else:
-    from .base_scraper import BaseScraper
+from .base_scraper import BaseScraper, HTML_PARSER
+from .otodom_urls import offer_id
+from storage.records import Listing
 
 import logging
 logger = logging.getLogger(__name__)
 
+# Blok stanu strony osadzony przez Next.js - pełne dane oferty w JSON
+NEXT_DATA_RE = re.compile(rb'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+# Linki do ofert na stronie wyników
+OFFER_HREF_RE = re.compile(r'/pl/oferta/[^/]+$')
+OFFER_LINK_RE = re.compile(r'/oferta/')
+
+# Wzorce ścieżki zapasowej (parsowanie tekstu strony)
+RENT_RE = re.compile(r'Czynsz:\s*([^:]+?)(?=Stan|Rynek|Forma|$)')
+NON_DIGIT_RE = re.compile(r'[^\d]')
+FINISH_STATE_RE = re.compile(r'Stan wykończenia:\s*([^:]+?)(?=Rynek|Forma|Dostępne|$)')
+MARKET_RE = re.compile(r'Rynek:\s*(pierwotny|wtórny)')
+OWNERSHIP_RE = re.compile(r'Forma własności:\s*([^:]+?)(?=Dostępne|Typ|$)')
+ADVERTISER_RE = re.compile(r'Typ ogłoszeniodawcy:\s*([^:]+?)(?=Informacje|$)')
+YEAR_BUILT_RE = re.compile(r'Rok budowy:\s*(\d{4})')
+ELEVATOR_RE = re.compile(r'Winda:\s*(tak|nie)')
+BUILDING_TYPE_RE = re.compile(r'Rodzaj zabudowy:\s*([^:]+?)(?=Materiał|Okna|$)')
+BUILDING_MATERIAL_RE = re.compile(r'Materiał budynku:\s*([^:]+?)(?=Okna|Wyposażenie|$)')
+
+PRICE_PATTERNS = [
+    re.compile(r'(\d+[\s\d]*)\s*zł', re.IGNORECASE),
+    re.compile(r'PLN\s*(\d+[\s\d]*)', re.IGNORECASE),
+    re.compile(r'"price":\s*"?(\d+)"?', re.IGNORECASE),
+    re.compile(r'"amount":\s*(\d+)', re.IGNORECASE),
+]
+AREA_RE = re.compile(r'(\d+[,.]?\d*)\s*m[²2]')
+ROOMS_PATTERNS = [
+    re.compile(r'(\d+)-pokojowe', re.IGNORECASE),
+    re.compile(r'(\d+)\s*poko[ij]', re.IGNORECASE),
+    re.compile(r'Liczba pokoi:\s*(\d+)', re.IGNORECASE),
+]
+STUDIO_RE = re.compile(r'kawalerka', re.IGNORECASE)
+FLOOR_PATTERNS = [
+    re.compile(r'piętro[:\s]*([^/\s]+)(?:/|$)', re.IGNORECASE),
+    re.compile(r'(\d+|parter|suterena)/\d+', re.IGNORECASE),
+    re.compile(r'Piętro:\s*([^/\n]+)', re.IGNORECASE),
+]
+STREET_RE = re.compile(r'ul\.\s*([^,]+)')
+CITY_RE = re.compile(r'w miejscowości\s+([^,]+)')
+LAST_PART_RE = re.compile(r',\s*([^,]+)$')
+EXTRA_INFO_RE = re.compile(r'Informacje dodatkowe:\s*([^:]+?)(?=Budynek|$)')
+EQUIPMENT_RE = re.compile(r'Wyposażenie:\s*([^:]+?)(?=Zabezpieczenia|Media|Opis|$)')
+MEDIA_RE = re.compile(r'Media:\s*([^:]+?)(?=Opis|$)')
+
+# Kody wartości z danych strony -> wartości jak w ścieżce tekstowej
+FLOOR_CODES = {
+    'cellar': 'suterena',
+    'ground_floor': 'parter',
+    'garret': 'poddasze',
+    'floor_higher_10': '> 10',
+}
+MARKET_CODES = {'primary': 'pierwotny', 'secondary': 'wtórny'}
+ADVERTISER_CODES = {
+    'private': 'prywatny',
+    'agency': 'biuro nieruchomości',
+    'developer': 'deweloper',
+}
+# Pola tekstowe: klucz charakterystyki w JSON -> nazwa pola
+CHARACTERISTIC_FIELDS = {
+    'construction_status': 'finish_state',
+    'building_ownership': 'ownership',
+    'building_type': 'building_type',
+    'building_material': 'building_material',
+}
+
 
 class OtodomScraper(BaseScraper):
     """Scraper dla portalu Otodom"""
     
-    def __init__(self):
-        super().__init__(base_url="https://www.otodom.pl")
+    # Domyślny zakres wyszukiwania (patrz scrapers/frontier.py dla wielu zakresów)
+    search_path = 'sprzedaz/mieszkanie/mazowieckie/warszawa'
+    
+    # Wyniki wyszukiwania zmieniają się często, treść oferty rzadko
+    cache_ttls = [
+        (r'/pl/wyniki/', 15 * 60),
+        (r'/pl/oferta/', 3 * 24 * 60 * 60),
+    ]
+    
+    def __init__(self, base_url: str = "https://www.otodom.pl", **kwargs):
+        super().__init__(base_url=base_url, **kwargs)
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -32,100 +103,242 @@ class OtodomScraper(BaseScraper):
             'Upgrade-Insecure-Requests': '1'
         })
     
-    def get_listings_urls(self, page: int) -> List[str]:
-        """Pobiera URLe ogłoszeń z listy wyników"""
-        url = f"{self.base_url}/pl/wyniki/sprzedaz/mieszkanie/mazowieckie/warszawa?page={page}"
+    def listing_id(self, url: str) -> str:
+        """ID oferty z końcówki URLa, np. ...-ID4v2IA -> 4v2IA"""
+        return offer_id(url)
+    
+    def search_url(self, search: str = None, page: int = 1) -> str:
+        """URL strony wyników dla ścieżki `transakcja/typ/województwo[/miasto]`"""
+        return f"{self.base_url}/pl/wyniki/{search or self.search_path}?page={page}"
+    
+    def fetch_listings_urls(self, page: int, search: str = None) -> List[str]:
+        """Pobiera URLe ogłoszeń z listy wyników - błędy pobrania przechodzą wyżej"""
+        response = self.session.get(self.search_url(search, page))
+        response.raise_for_status()
+        
+        listings = self.extract_listing_urls(response.content)
         
+        logger.info(f"Znaleziono {len(listings)} ofert na stronie {page}")
+        return listings
+    
+    def get_listings_urls(self, page: int, search: str = None) -> List[str]:
+        """Pobiera URLe ogłoszeń z listy wyników"""
         try:
-            response = self.session.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            listings = []
-            
-            links = soup.find_all('a', {'data-cy': 'listing.link'})
-            if not links:
-                links = soup.find_all('a', href=re.compile(r'/pl/oferta/[^/]+$'))
-            if not links:
-                articles = soup.find_all('article')
-                for article in articles:
-                    link = article.find('a', href=re.compile(r'/oferta/'))
-                    if link:
-                        links.append(link)
-            
-            for link in links:
-                href = link.get('href')
-                if href:
-                    full_url = self.base_url + href if href.startswith('/') else href
-                    if '/oferta/' in full_url and full_url not in listings:
-                        listings.append(full_url)
-            
-            logger.info(f"Znaleziono {len(listings)} ofert na stronie {page}")
-            return listings[:36]
-            
+            return self.fetch_listings_urls(page, search)
         except Exception as e:
+            self.metrics.increment('fetch_failed')
             logger.error(f"Błąd przy pobieraniu listy ogłoszeń: {e}")
             return []
     
+    def extract_listing_urls(self, content: bytes) -> List[str]:
+        """Wyciąga URLe ofert ze strony wyników"""
+        soup = BeautifulSoup(content, HTML_PARSER)
+        
+        listings = []
+        
+        links = soup.find_all('a', {'data-cy': 'listing.link'})
+        if not links:
+            links = soup.find_all('a', href=OFFER_HREF_RE)
+        if not links:
+            articles = soup.find_all('article')
+            for article in articles:
+                link = article.find('a', href=OFFER_LINK_RE)
+                if link:
+                    links.append(link)
+        
+        for link in links:
+            href = link.get('href')
+            if href:
+                full_url = self.base_url + href if href.startswith('/') else href
+                if '/oferta/' in full_url and full_url not in listings:
+                    listings.append(full_url)
+        
+        return listings[:36]
+    
     def parse_parameters_block(self, text: str) -> Dict[str, Any]:
         """Parsuje blok parametrów z tekstu"""
         params = {}
         
         # Czynsz
-        czynsz_match = re.search(r'Czynsz:\s*([^:]+?)(?=Stan|Rynek|Forma|$)', text)
+        czynsz_match = RENT_RE.search(text)
         if czynsz_match:
             czynsz = czynsz_match.group(1).strip()
             if czynsz != 'brak informacji':
                 try:
-                    params['rent'] = int(re.sub(r'[^\d]', '', czynsz))
+                    params['rent'] = int(NON_DIGIT_RE.sub('', czynsz))
                 except:
                     pass
         
         # Stan wykończenia
-        stan_match = re.search(r'Stan wykończenia:\s*([^:]+?)(?=Rynek|Forma|Dostępne|$)', text)
+        stan_match = FINISH_STATE_RE.search(text)
         if stan_match:
             params['finish_state'] = stan_match.group(1).strip()
         
         # Rynek
-        rynek_match = re.search(r'Rynek:\s*(pierwotny|wtórny)', text)
+        rynek_match = MARKET_RE.search(text)
         if rynek_match:
             params['market'] = rynek_match.group(1)
         
         # Forma własności
-        forma_match = re.search(r'Forma własności:\s*([^:]+?)(?=Dostępne|Typ|$)', text)
+        forma_match = OWNERSHIP_RE.search(text)
         if forma_match:
             params['ownership'] = forma_match.group(1).strip()
         
         # Typ ogłoszeniodawcy
-        typ_match = re.search(r'Typ ogłoszeniodawcy:\s*([^:]+?)(?=Informacje|$)', text)
+        typ_match = ADVERTISER_RE.search(text)
         if typ_match:
             params['advertiser_type'] = typ_match.group(1).strip()
         
         # Rok budowy
-        rok_match = re.search(r'Rok budowy:\s*(\d{4})', text)
+        rok_match = YEAR_BUILT_RE.search(text)
         if rok_match:
             params['year_built'] = int(rok_match.group(1))
         
         # Winda
-        winda_match = re.search(r'Winda:\s*(tak|nie)', text)
+        winda_match = ELEVATOR_RE.search(text)
         if winda_match:
             params['elevator'] = winda_match.group(1) == 'tak'
         
         # Rodzaj zabudowy
-        zabudowa_match = re.search(r'Rodzaj zabudowy:\s*([^:]+?)(?=Materiał|Okna|$)', text)
+        zabudowa_match = BUILDING_TYPE_RE.search(text)
         if zabudowa_match:
             params['building_type'] = zabudowa_match.group(1).strip()
         
         # Materiał budynku
-        material_match = re.search(r'Materiał budynku:\s*([^:]+?)(?=Okna|Wyposażenie|$)', text)
+        material_match = BUILDING_MATERIAL_RE.search(text)
         if material_match:
             params['building_material'] = material_match.group(1).strip()
         
         return params
     
+    def parse_content(self, content: bytes) -> Dict[str, Any]:
+        """Parsuje stronę oferty - najpierw z osadzonego JSON, potem z HTML"""
+        data = self.parse_embedded_state(content)
+        if data is not None:
+            return data
+        
+        logger.info("Brak danych __NEXT_DATA__ - parsuję tekst strony")
+        return super().parse_content(content)
+    
+    def parse_embedded_state(self, content: bytes) -> Optional[Dict[str, Any]]:
+        """Wyciąga pola oferty z bloku __NEXT_DATA__ bez budowania drzewa HTML"""
+        match = NEXT_DATA_RE.search(content)
+        if not match:
+            return None
+        
+        try:
+            state = json.loads(match.group(1))
+            ad = state['props']['pageProps']['ad']
+        except (ValueError, KeyError, TypeError):
+            return None
+        if not ad:
+            return None
+        
+        data = Listing()
+        characteristics = {
+            item.get('key'): item for item in ad.get('characteristics') or [] if item.get('key')
+        }
+        target = ad.get('target') or {}
+        
+        def value(key: str) -> Optional[str]:
+            item = characteristics.get(key)
+            if item and item.get('value') not in (None, ''):
+                return str(item['value'])
+            return None
+        
+        def label(key: str) -> Optional[str]:
+            item = characteristics.get(key)
+            if item and item.get('localizedValue') and item['localizedValue'] != 'brak informacji':
+                return item['localizedValue'].strip()
+            return None
+        
+        def number(key: str, target_key: str, cast):
+            raw = value(key) or target.get(target_key)
+            if isinstance(raw, list):
+                raw = raw[0] if raw else None
+            try:
+                return cast(float(raw)) if raw is not None else None
+            except (TypeError, ValueError):
+                return None
+        
+        if ad.get('title'):
+            data['title'] = ad['title'].strip()
+        
+        for field, key, target_key, cast in [
+            ('price', 'price', 'Price', int),
+            ('area', 'm', 'Area', float),
+            ('rooms', 'rooms_num', 'Rooms_num', int),
+            ('rent', 'rent', 'Rent', int),
+            ('year_built', 'build_year', 'Build_year', int),
+        ]:
+            parsed = number(key, target_key, cast)
+            if parsed is not None:
+                data[field] = parsed
+        
+        # Floor_no w danych reklamowych bywa listą kodów, a bywa samym kodem
+        target_floor = target.get('Floor_no')
+        if isinstance(target_floor, list):
+            target_floor = target_floor[0] if target_floor else None
+        floor_code = value('floor_no') or target_floor
+        if floor_code:
+            if floor_code in FLOOR_CODES:
+                data['floor'] = FLOOR_CODES[floor_code]
+            elif floor_code.startswith('floor_'):
+                data['floor'] = floor_code[len('floor_'):]
+        if 'floor' not in data and label('floor_no'):
+            data['floor'] = label('floor_no').split('/')[0].strip()
+        
+        for key, field in CHARACTERISTIC_FIELDS.items():
+            if label(key):
+                data[field] = label(key)
+        
+        market = (ad.get('market') or value('market') or '').lower()
+        if market in MARKET_CODES:
+            data['market'] = MARKET_CODES[market]
+        
+        advertiser = (ad.get('advertiserType') or '').lower()
+        if advertiser in ADVERTISER_CODES:
+            data['advertiser_type'] = ADVERTISER_CODES[advertiser]
+        
+        extras = target.get('Extras_types')
+        if isinstance(extras, list):
+            data['elevator'] = 'lift' in extras
+        
+        location = ad.get('location') or {}
+        address = location.get('address') or {}
+        street = (address.get('street') or {}).get('name')
+        district = (address.get('district') or {}).get('name')
+        city = (address.get('city') or {}).get('name')
+        parts = [part for part in (street, district, city) if part]
+        if parts:
+            data['address'] = ', '.join(parts)
+        if district:
+            data['district'] = district
+        if city:
+            data['city'] = city
+        
+        coordinates = location.get('coordinates') or {}
+        if coordinates.get('latitude') and coordinates.get('longitude'):
+            data['latitude'] = float(coordinates['latitude'])
+            data['longitude'] = float(coordinates['longitude'])
+        
+        features = list(ad.get('features') or [])
+        if not features:
+            for category in ad.get('featuresByCategory') or []:
+                features.extend(category.get('values') or [])
+        data['features'] = list(dict.fromkeys(feature.strip() for feature in features if feature))
+        
+        description = HTML_TAG_RE.sub(' ', ad.get('description') or '')
+        description = ' '.join(html.unescape(description).split())
+        if len(description) > 10:
+            data['description'] = description
+        
+        logger.info(f"Sparsowano z JSON: {len([v for v in data.values() if v])} pól danych")
+        return data
+    
     def parse_listing(self, soup: BeautifulSoup) -> Dict[str, Any]:
         """Parsuje dane z pojedynczego ogłoszenia"""
-        data = {}
+        data = Listing()
         
         try:
             # Tytuł
@@ -134,16 +347,9 @@ class OtodomScraper(BaseScraper):
                 data['title'] = title_elem.text.strip()
             
             # Cena
-            price_patterns = [
-                r'(\d+[\s\d]*)\s*zł',
-                r'PLN\s*(\d+[\s\d]*)',
-                r'"price":\s*"?(\d+)"?',
-                r'"amount":\s*(\d+)'
-            ]
-            
             page_text = str(soup)
-            for pattern in price_patterns:
-                match = re.search(pattern, page_text, re.IGNORECASE)
+            for pattern in PRICE_PATTERNS:
+                match = pattern.search(page_text)
                 if match:
                     price_str = match.group(1).replace(' ', '').replace('\xa0', '')
                     try:
@@ -156,35 +362,24 @@ class OtodomScraper(BaseScraper):
             main_text = soup.get_text()
             
             # Powierzchnia
-            area_match = re.search(r'(\d+[,.]?\d*)\s*m[²2]', main_text)
+            area_match = AREA_RE.search(main_text)
             if area_match:
                 data['area'] = float(area_match.group(1).replace(',', '.'))
             
             # Liczba pokoi
-            rooms_patterns = [
-                r'(\d+)-pokojowe',
-                r'(\d+)\s*poko[ij]',
-                r'Liczba pokoi:\s*(\d+)'
-            ]
-            for pattern in rooms_patterns:
-                rooms_match = re.search(pattern, main_text, re.IGNORECASE)
+            for pattern in ROOMS_PATTERNS:
+                rooms_match = pattern.search(main_text)
                 if rooms_match:
                     data['rooms'] = int(rooms_match.group(1))
                     break
             
             # Kawalerka = 1 pokój
-            if 'rooms' not in data and re.search(r'kawalerka', main_text, re.IGNORECASE):
+            if 'rooms' not in data and STUDIO_RE.search(main_text):
                 data['rooms'] = 1
             
             # Piętro - tylko pierwsza wartość przed "/"
-            floor_patterns = [
-                r'piętro[:\s]*([^/\s]+)(?:/|$)',
-                r'(\d+|parter|suterena)/\d+',
-                r'Piętro:\s*([^/\n]+)'
-            ]
-            
-            for pattern in floor_patterns:
-                floor_match = re.search(pattern, main_text, re.IGNORECASE)
+            for pattern in FLOOR_PATTERNS:
+                floor_match = pattern.search(main_text)
                 if floor_match:
                     floor_value = floor_match.group(1).strip()
                     if floor_value and floor_value != 'brak informacji':
@@ -211,14 +406,14 @@ class OtodomScraper(BaseScraper):
             if meta_desc:
                 desc_content = meta_desc.get('content', '')
                 # Szukamy ulicy
-                street_match = re.search(r'ul\.\s*([^,]+)', desc_content)
-                city_match = re.search(r'w miejscowości\s+([^,]+)', desc_content)
+                street_match = STREET_RE.search(desc_content)
+                city_match = CITY_RE.search(desc_content)
                 
                 if street_match and city_match:
                     data['address'] = f"{street_match.group(0)}, {city_match.group(1)}"
                 elif city_match:
                     # Szukamy dzielnicy
-                    district_match = re.search(r',\s*([^,]+)$', desc_content)
+                    district_match = LAST_PART_RE.search(desc_content)
                     if district_match:
                         data['address'] = f"{city_match.group(1)}, {district_match.group(1)}"
                     else:
@@ -228,24 +423,24 @@ class OtodomScraper(BaseScraper):
             features = []
             
             # Informacje dodatkowe
-            info_match = re.search(r'Informacje dodatkowe:\s*([^:]+?)(?=Budynek|$)', main_text)
+            info_match = EXTRA_INFO_RE.search(main_text)
             if info_match:
                 info_items = info_match.group(1).strip().split()
                 features.extend([item.strip() for item in info_items if item.strip()])
             
             # Wyposażenie
-            wypos_match = re.search(r'Wyposażenie:\s*([^:]+?)(?=Zabezpieczenia|Media|Opis|$)', main_text)
+            wypos_match = EQUIPMENT_RE.search(main_text)
             if wypos_match:
                 wypos_items = wypos_match.group(1).strip().split()
                 features.extend([item.strip() for item in wypos_items if item.strip()])
             
             # Media
-            media_match = re.search(r'Media:\s*([^:]+?)(?=Opis|$)', main_text)
+            media_match = MEDIA_RE.search(main_text)
             if media_match:
                 media_items = media_match.group(1).strip().split()
                 features.extend([item.strip() for item in media_items if item.strip()])
             
-            data['features'] = list(set(features))  # Usuń duplikaty
+            data['features'] = features  # Maska cech usuwa duplikaty
             
             # Opis
             opis_start = main_text.find('OpisPokaż więcej')
@@ -263,47 +458,3 @@ class OtodomScraper(BaseScraper):
             
         return data
 
-
-if __name__ == "__main__":
-    import pandas as pd
-    import json
-    
-    os.makedirs('../data/raw', exist_ok=True)
-    
-    print("Testowanie zaktualizowanego scrapera Otodom v3...")
-    scraper = OtodomScraper()
-    
-    print("\nPobieranie listy ofert...")
-    test_urls = scraper.get_listings_urls(1)
-    
-    if test_urls:
-        print(f"Znaleziono {len(test_urls)} ofert")
-        
-        test_results = []
-        for i, url in enumerate(test_urls[:5]):
-            print(f"\nTestowanie oferty {i+1}/5: {url}")
-            result = scraper.scrape_listing(url)
-            if result:
-                print("Znalezione dane:")
-                for key, value in result.items():
-                    if key not in ['description', 'features', 'url', 'scraped_at']:
-                        print(f"  {key}: {value}")
-                if result.get('features'):
-                    print(f"  features ({len(result['features'])}): {', '.join(result['features'][:5])}...")
-                test_results.append(result)
-            time.sleep(2)
-        
-        if test_results:
-            with open('../data/raw/test_results_v3.json', 'w', encoding='utf-8') as f:
-                json.dump(test_results, f, ensure_ascii=False, indent=2)
-            print("\nWyniki zapisane do test_results_v3.json")
-            
-            df = pd.DataFrame(test_results)
-            print("\n=== KOMPLETNOŚĆ DANYCH ===")
-            for col in ['price', 'area', 'rooms', 'floor', 'address', 'market', 'finish_state', 'year_built']:
-                if col in df.columns:
-                    count = df[col].notna().sum()
-                    pct = (count / len(df)) * 100
-                    print(f"{col}: {count}/{len(df)} ({pct:.0f}%)")
-    else:
-        print("Nie udało się pobrać URLi ofert")
\ No newline at end of file
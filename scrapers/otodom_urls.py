@@ -0,0 +1,14 @@
+# scrapers/otodom_urls.py
+import re
+
+# ID oferty na końcu URLa Otodom, np. .../pl/oferta/mieszkanie-3-pokoje-ID4v2IA -> 4v2IA
+OFFER_ID_RE = re.compile(r'-ID(\w+)/?$')
+
+
+def offer_id(url: str) -> str:
+    """Stały identyfikator oferty: ID z końcówki URLa albo cały URL
+
+    Bez zależności scrapera - używają go też analizy (analytics/dedup.py).
+    """
+    match = OFFER_ID_RE.search(url or '')
+    return match.group(1) if match else url
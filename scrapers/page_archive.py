@@ -0,0 +1,185 @@
+# scrapers/page_archive.py
+import os
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import zstandard
+from requests.adapters import BaseAdapter
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = '.warc.zst'
+
+
+def warc_record(url: str, fetched_at: float, status: int, reason: str,
+                headers: Dict[str, str], body: bytes) -> bytes:
+    """Rekord WARC/1.0 typu response: nagłówki WARC, nagłówki HTTP i treść"""
+    http = [f'HTTP/1.1 {status} {reason or ""}'.rstrip()]
+    http += [f'{key}: {value}' for key, value in headers.items()]
+    payload = ('\r\n'.join(http) + '\r\n\r\n').encode('utf-8') + body
+    date = datetime.fromtimestamp(fetched_at, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    header = (f'WARC/1.0\r\nWARC-Type: response\r\nWARC-Target-URI: {url}\r\nWARC-Date: {date}\r\n'
+              f'Content-Type: application/http; msgtype=response\r\nContent-Length: {len(payload)}\r\n\r\n')
+    return header.encode('utf-8') + payload + b'\r\n\r\n'
+
+
+def parse_warc_record(record: bytes) -> Tuple[Dict[str, str], bytes]:
+    """(nagłówki HTTP, treść) z rekordu zapisanego przez `warc_record`"""
+    _, payload = record.split(b'\r\n\r\n', 1)
+    http, body = payload.split(b'\r\n\r\n', 1)
+    headers = {}
+    for line in http.decode('utf-8', 'replace').split('\r\n')[1:]:
+        key, _, value = line.partition(': ')
+        headers[key] = value
+    return headers, body[:-4]
+
+
+class PageArchive:
+    """Archiwum pobranych stron: segmenty WARC kompresowane zstd + indeks SQLite
+
+    Każdy rekord to osobna ramka zstd dopisywana na końcu bieżącego
+    segmentu, więc segmenty są tylko dopisywane, a pojedynczą stronę
+    można odczytać bez rozpakowywania reszty - indeks trzyma URL, czas
+    pobrania, segment i przesunięcie. Każdy proces pisze do własnych
+    segmentów; nowy segment zaczyna się po przekroczeniu `segment_bytes`.
+    """
+
+    def __init__(self, directory: str = 'data/archive', segment_bytes: int = 256 * 1024 * 1024,
+                 level: int = 10):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.level = level
+        self.lock = threading.Lock()
+        self.segment = None
+        self.segment_name = None
+        self.segment_count = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), timeout=60, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                status INTEGER NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS records_url ON records (url, fetched_at)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS records_time ON records (fetched_at)")
+        self.db.commit()
+
+    def _open_segment(self):
+        if self.segment:
+            self.segment.close()
+        self.segment_count += 1
+        self.segment_name = (f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_"
+                             f"{self.segment_count:05d}{SEGMENT_SUFFIX}")
+        self.segment = open(os.path.join(self.directory, self.segment_name), 'ab')
+
+    def append(self, url: str, status: int, reason: str, headers: Dict[str, str], body: bytes,
+               fetched_at: float = None):
+        """Dopisuje odpowiedź do bieżącego segmentu i indeksu"""
+        fetched_at = fetched_at or time.time()
+        frame = zstandard.ZstdCompressor(level=self.level).compress(
+            warc_record(url, fetched_at, status, reason, headers, body))
+        with self.lock:
+            if self.segment is None or self.segment.tell() >= self.segment_bytes:
+                self._open_segment()
+            offset = self.segment.tell()
+            self.segment.write(frame)
+            self.segment.flush()
+            self.db.execute("INSERT INTO records VALUES (?, ?, ?, ?, ?, ?)",
+                            (url, fetched_at, status, self.segment_name, offset, len(frame)))
+            self.db.commit()
+
+    def read(self, segment: str, offset: int, length: int) -> Tuple[Dict[str, str], bytes]:
+        with open(os.path.join(self.directory, segment), 'rb') as f:
+            f.seek(offset)
+            return parse_warc_record(zstandard.ZstdDecompressor().decompress(f.read(length)))
+
+    def get(self, url: str) -> Optional[Tuple[Dict[str, str], bytes]]:
+        """Ostatnia zarchiwizowana odpowiedź dla URLa"""
+        row = self.db.execute(
+            "SELECT segment, offset, length FROM records WHERE url = ? ORDER BY fetched_at DESC LIMIT 1", (url,)
+        ).fetchone()
+        return self.read(*row) if row else None
+
+    def records(self, pattern: str = '%', start: float = None, end: float = None,
+                latest: bool = True) -> List[Tuple[str, float, str, int, int]]:
+        """Wpisy indeksu (url, fetched_at, segment, offset, length) odpowiedzi 200
+
+        Przy `latest` tylko ostatnie pobranie każdego URLa w przedziale czasu.
+        Wynik jest posortowany po segmencie i przesunięciu - odczyt idzie
+        po kolei przez każdy plik.
+        """
+        conditions, params = ["status = 200", "url LIKE ?"], [pattern]
+        if start is not None:
+            conditions.append("fetched_at >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("fetched_at < ?")
+            params.append(end)
+        where = ' AND '.join(conditions)
+        if latest:
+            query = (f"SELECT url, MAX(fetched_at), segment, offset, length FROM records WHERE {where} "
+                     f"GROUP BY url")
+        else:
+            query = f"SELECT url, fetched_at, segment, offset, length FROM records WHERE {where}"
+        return sorted(self.db.execute(query, params).fetchall(), key=lambda row: (row[2], row[3]))
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            if self.segment:
+                self.segment.close()
+                self.segment = None
+            self.db.close()
+
+
+def read_segment_records(directory: str, segment: str,
+                         entries: Sequence[Tuple[str, float, int, int]]) -> Iterator[Tuple[str, float, bytes]]:
+    """(url, fetched_at, treść) dla wpisów jednego segmentu, czytanych po kolei"""
+    decompressor = zstandard.ZstdDecompressor()
+    with open(os.path.join(directory, segment), 'rb') as f:
+        for url, fetched_at, offset, length in entries:
+            f.seek(offset)
+            _, body = parse_warc_record(decompressor.decompress(f.read(length)))
+            yield url, fetched_at, body
+
+
+class ArchivingAdapter(BaseAdapter):
+    """Adapter requests zapisujący do archiwum każdą odpowiedź pobraną z sieci
+
+    Leży pod cache HTTP, więc trafienia w cache i odpowiedzi 304 nie są
+    archiwizowane ponownie - strona trafia do archiwum raz na pobranie.
+    """
+
+    def __init__(self, archive: PageArchive, inner: BaseAdapter):
+        super().__init__()
+        self.archive = archive
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        response = self.inner.send(request, **kwargs)
+        if request.method == 'GET' and response.status_code != 304:
+            try:
+                headers = {key: value for key, value in response.headers.items()
+                           if key.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')}
+                self.archive.append(request.url, response.status_code, response.reason, headers,
+                                    response.content)
+            except Exception as e:
+                # Archiwum nie może zatrzymać crawla
+                logger.error(f"Błąd zapisu do archiwum {request.url}: {e}")
+        return response
+
+    def close(self):
+        self.inner.close()
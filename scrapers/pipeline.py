@@ -0,0 +1,123 @@
+# scrapers/pipeline.py
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Scraper zbudowany raz w każdym procesie parsującym
+_worker_scraper = None
+
+
+def _init_worker(scraper_cls):
+    global _worker_scraper
+    _worker_scraper = scraper_cls()
+
+
+def _parse_in_worker(content: bytes, url: str) -> Tuple[Optional[Dict[str, Any]], float]:
+    started = time.perf_counter()
+    listing = _worker_scraper.build_listing(content, url)
+    return listing, time.perf_counter() - started
+
+
+class ParsePipeline:
+    """Potok: pobieranie (wątki) -> kolejka surowych stron -> parsowanie (procesy)
+
+    Wątki pobierające wkładają treść stron do ograniczonej kolejki, więc gdy
+    parsowanie nie nadąża, pobieranie się wstrzymuje. Parsowanie odbywa się
+    w puli procesów, żeby nie blokować GIL. Przy `parsers=0` strony są
+    parsowane od razu w wątkach pobierających.
+
+    Klasa scrapera musi dać się utworzyć bez argumentów - każdy proces
+    parsujący tworzy własną instancję.
+    """
+
+    def __init__(self, scraper, fetchers: int = 1, parsers: int = 0, queue_size: int = None):
+        self.scraper = scraper
+        self.fetchers = max(1, fetchers)
+        self.parsers = (os.cpu_count() or 1) if parsers < 0 else parsers
+        self.queue_size = queue_size or max(2 * self.fetchers, 2 * self.parsers)
+        self.stopping = threading.Event()
+
+        self.fetch_pool = ThreadPoolExecutor(max_workers=self.fetchers, thread_name_prefix='fetch')
+        self.parse_pool = None
+        if self.parsers:
+            # spawn - fork przy działających wątkach pobierających grozi zakleszczeniem
+            self.parse_pool = ProcessPoolExecutor(
+                max_workers=self.parsers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(type(scraper),),
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Zatrzymuje pobieranie i czeka na zakończenie obu pul"""
+        self.stopping.set()
+        self.fetch_pool.shutdown(wait=True, cancel_futures=True)
+        if self.parse_pool:
+            self.parse_pool.shutdown(wait=True, cancel_futures=True)
+
+    def _fetch(self, url: str, raw: queue.Queue):
+        content = None
+        if not self.stopping.is_set():
+            content = self.scraper.fetch_listing(url)
+        raw.put((url, content))
+
+    def run(self, urls: Iterable[str]) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Przetwarza URLe, zwraca pary (url, ogłoszenie lub None)"""
+        urls = list(urls)
+        if not self.parse_pool:
+            yield from zip(urls, self.fetch_pool.map(self.scraper.scrape_listing, urls))
+            return
+
+        raw = queue.Queue(maxsize=self.queue_size)
+        for url in urls:
+            self.fetch_pool.submit(self._fetch, url, raw)
+
+        in_flight = deque()
+        received = 0
+        try:
+            while received < len(urls) or in_flight:
+                # Nie więcej zadań w procesach niż 2x liczba parserów
+                while received < len(urls) and len(in_flight) < 2 * self.parsers:
+                    url, content = raw.get()
+                    received += 1
+                    self.scraper.metrics.set_gauge('fetch_queue_depth', raw.qsize())
+                    if content is None:
+                        yield url, None
+                        continue
+                    in_flight.append((url, self.parse_pool.submit(_parse_in_worker, content, url)))
+                    self.scraper.metrics.set_gauge('parse_in_flight', len(in_flight))
+
+                if in_flight:
+                    url, future = in_flight.popleft()
+                    try:
+                        listing, seconds = future.result()
+                    except Exception as e:
+                        logger.error(f"Błąd procesu parsującego dla {url}: {e}")
+                        listing = None
+                    else:
+                        self.scraper.metrics.observe('parse', seconds)
+                    yield url, listing
+        finally:
+            if received < len(urls):
+                # Przerwano w trakcie - odblokuj wątki czekające na miejsce w kolejce
+                self.stopping.set()
+                while received < len(urls):
+                    raw.get()
+                    received += 1
+                self.stopping.clear()
+            for _, future in in_flight:
+                future.cancel()
@@ -0,0 +1,76 @@
+# scrapers/rate_limiter.py
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+
+class TokenBucket:
+    """Kubełek tokenów - `rate` żądań na sekundę, chwilowo do `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Blokuje do czasu uzyskania tokenu, zwraca czas oczekiwania"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class HostRateLimiter:
+    """Osobny kubełek tokenów dla każdego hosta"""
+
+    def __init__(self, rate: Optional[float], burst: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url: str) -> Optional[TokenBucket]:
+        if not self.rate:
+            return None
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def acquire(self, url: str) -> float:
+        bucket = self.bucket(url)
+        return bucket.acquire() if bucket else 0.0
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """Adapter requests, który przed każdym żądaniem pobiera token z limitera
+
+    Czas oczekiwania na token trafia do `response.rate_limit_wait`.
+    """
+
+    def __init__(self, limiter: HostRateLimiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        waited = self.limiter.acquire(request.url)
+        response = super().send(request, **kwargs)
+        response.rate_limit_wait = waited
+        return response
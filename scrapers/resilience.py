@@ -0,0 +1,257 @@
+# scrapers/resilience.py
+import random
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+
+logger = logging.getLogger(__name__)
+
+# Statusy, po których warto ponowić żądanie
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statusy oznaczające, że serwis prosi o zwolnienie
+THROTTLE_STATUSES = {429, 503}
+# Tylko idempotentne żądania są ponawiane
+RETRY_METHODS = {'GET', 'HEAD'}
+# Błędy sieci ponawiane jak odpowiedź 5xx (także przerwany odczyt treści)
+RETRY_ERRORS = (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Obwód dla hosta jest otwarty - żądanie odrzucone bez wysyłania"""
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Nagłówek Retry-After (sekundy albo data HTTP) w sekundach"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveConcurrency:
+    """Limit równoległych żądań sterowany AIMD
+
+    Po każdej szybkiej odpowiedzi limit rośnie o 1/limit (czyli o jeden na
+    „rundę” żądań), po odpowiedzi 429/503 lub timeoucie spada o połowę.
+    Odpowiedź jest szybka, gdy jej czas nie przekracza `latency_tolerance`
+    razy najlepszego zaobserwowanego czasu - przy rosnących opóźnieniach
+    limit przestaje rosnąć, zanim serwis zacznie odmawiać.
+    """
+
+    def __init__(self, initial: float = 2, minimum: float = 1, maximum: float = 16,
+                 backoff: float = 0.5, latency_tolerance: float = 2.0):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = min(self.maximum, max(minimum, initial))
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.baseline: Optional[float] = None
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """Blokuje, dopóki liczba żądań w toku nie spadnie poniżej limitu"""
+        with self.condition:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self.condition.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False):
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                # Jedno zmniejszenie na okno opóźnienia - seria 429 z tej samej
+                # rundy nie zbija limitu od razu do minimum
+                if now - self.last_decrease > (self.baseline or 0.0):
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self.last_decrease = now
+            elif latency is not None:
+                # Bazowy czas powoli zapomina stare minimum (np. po zmianie sieci)
+                self.baseline = latency if self.baseline is None else min(latency, self.baseline * 1.01)
+                if latency <= self.latency_tolerance * self.baseline:
+                    self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self.condition.notify_all()
+
+    def pause(self, seconds: float):
+        """Wstrzymuje nowe żądania do hosta (np. na czas Retry-After)"""
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """Bezpiecznik: po `failure_threshold` kolejnych błędach odrzuca żądania
+    przez `reset_timeout` sekund, potem przepuszcza jedno próbne"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            # Półotwarty - próbne żądanie już trwa
+            return False
+
+    def abort_trial(self):
+        """Próbne żądanie przerwane innym błędem - obwód znów otwarty zamiast półotwarty na zawsze"""
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> bool:
+        """Zwraca True, jeśli ten błąd otworzył obwód"""
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                opened = self.state != self.OPEN
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                return opened
+            return False
+
+
+class ResilientAdapter(BaseAdapter):
+    """Warstwa sesji: timeouty, ponowienia z wykładniczym backoffem,
+    bezpiecznik i adaptacyjny limit równoległości - osobno dla każdego hosta
+    """
+
+    def __init__(self, inner: BaseAdapter, timeout: Tuple[float, float] = (5.0, 30.0), max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, max_concurrency: int = 16,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0, metrics=None):
+        super().__init__()
+        self.inner = inner
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.metrics = metrics
+        self.hosts: Dict[str, Tuple[AdaptiveConcurrency, CircuitBreaker]] = {}
+        self.lock = threading.Lock()
+
+    def host_state(self, url: str) -> Tuple[AdaptiveConcurrency, CircuitBreaker]:
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = (
+                    AdaptiveConcurrency(initial=max(1, self.max_concurrency // 2), maximum=self.max_concurrency),
+                    CircuitBreaker(self.failure_threshold, self.reset_timeout),
+                )
+            return self.hosts[host]
+
+    def _count(self, name: str):
+        if self.metrics is not None:
+            self.metrics.increment(name)
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Pełny jitter: losowo z [0, base * 2^attempt], ale nie krócej niż Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        limiter, breaker = self.host_state(request.url)
+        retries = self.max_retries if request.method in RETRY_METHODS else 0
+
+        for attempt in range(retries + 1):
+            if not breaker.allow():
+                self._count('circuit_rejected')
+                raise CircuitOpenError(f"Obwód otwarty dla {urlsplit(request.url).netloc}", request=request)
+
+            limiter.acquire()
+            started = time.monotonic()
+            response = error = None
+            try:
+                response = self.inner.send(request, **kwargs)
+                if not kwargs.get('stream'):
+                    # Treść czytana tutaj - timeout w trakcie odczytu też jest ponawiany
+                    response.content
+            except RETRY_ERRORS as e:
+                error = e
+            except BaseException:
+                breaker.abort_trial()
+                raise
+            finally:
+                # Bez czekania na token limitera tempa - to nie jest opóźnienie serwisu
+                latency = time.monotonic() - started - getattr(response, 'rate_limit_wait', 0.0)
+                throttled = error is not None or (response is not None and
+                                                  response.status_code in THROTTLE_STATUSES)
+                limiter.release(latency, throttled=throttled)
+                if self.metrics is not None:
+                    self.metrics.set_gauge('concurrency_limit', limiter.limit)
+
+            retry_after = None
+            if error is None and response.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                return response
+
+            if error is None and response.status_code == 429:
+                # Serwis żyje, tylko każe zwolnić - nie liczy się do bezpiecznika
+                breaker.record_success()
+                self._count('throttled')
+                retry_after = retry_after_seconds(response.headers.get('Retry-After'))
+                if retry_after:
+                    limiter.pause(min(retry_after, self.backoff_max))
+            elif breaker.record_failure():
+                self._count('circuit_opened')
+                logger.warning(f"Otwieram obwód dla {urlsplit(request.url).netloc} "
+                               f"na {self.reset_timeout:.0f}s")
+
+            if attempt == retries:
+                if error is not None:
+                    raise error
+                return response
+
+            if response is not None:
+                retry_after = retry_after or retry_after_seconds(response.headers.get('Retry-After'))
+                response.close()
+            delay = self.backoff(attempt, retry_after)
+            self._count('retries')
+            logger.info(f"Ponawiam {request.url} za {delay:.1f}s "
+                        f"({error or response.status_code}, próba {attempt + 2}/{retries + 1})")
+            time.sleep(delay)
+
+    def close(self):
+        self.inner.close()
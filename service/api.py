@@ -0,0 +1,246 @@
+# service/api.py
+import argparse
+import asyncio
+import os
+import sys
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, ConfigDict
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.comparables import INDEX_PATH, ComparablesIndex
+from model.predictor import PricePredictor
+
+logger = logging.getLogger(__name__)
+
+
+class Listing(BaseModel):
+    """Ogłoszenie w formacie zwracanym przez OtodomScraper.parse_content"""
+
+    model_config = ConfigDict(extra='ignore')
+
+    title: Optional[str] = None
+    price: Optional[float] = None
+    area: Optional[float] = None
+    rooms: Optional[int] = None
+    floor: Optional[str] = None
+    rent: Optional[float] = None
+    finish_state: Optional[str] = None
+    market: Optional[str] = None
+    ownership: Optional[str] = None
+    advertiser_type: Optional[str] = None
+    year_built: Optional[int] = None
+    elevator: Optional[bool] = None
+    building_type: Optional[str] = None
+    building_material: Optional[str] = None
+    address: Optional[str] = None
+    district: Optional[str] = None
+    city: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    features: Optional[List[str]] = None
+    url: Optional[str] = None
+
+
+class Comparable(BaseModel):
+    url: Optional[str] = None
+    title: Optional[str] = None
+    price: Optional[float] = None
+    area: Optional[float] = None
+    rooms: Optional[float] = None
+    district: Optional[str] = None
+    price_m2: Optional[float] = None
+    distance: float
+
+
+class Prediction(BaseModel):
+    predicted_price: float
+    predicted_price_m2: Optional[float] = None
+    # Stosunek ceny ofertowej do przewidywanej (< 1 - oferta tańsza niż model)
+    price_ratio: Optional[float] = None
+
+
+def to_prediction(listing: Dict[str, Any], price: float) -> Prediction:
+    area = listing.get('area')
+    asked = listing.get('price')
+    return Prediction(
+        predicted_price=round(price, 0),
+        predicted_price_m2=round(price / area, 0) if area else None,
+        price_ratio=round(asked / price, 4) if asked and price > 0 else None,
+    )
+
+
+class MicroBatcher:
+    """Łączy równoczesne pojedyncze żądania w jedną partię dla modelu
+
+    Pierwsze żądanie otwiera okno `max_wait` sekund; partia idzie do modelu
+    po jego upływie albo po zebraniu `max_batch` ogłoszeń. Model działa
+    w osobnym wątku, więc pętla zdarzeń w tym czasie przyjmuje kolejne
+    żądania do następnej partii.
+    """
+
+    def __init__(self, predictor: PricePredictor, max_batch: int = 64, max_wait: float = 0.002):
+        self.predictor = predictor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue: asyncio.Queue = None
+        self.task: asyncio.Task = None
+        # Partia zbierana albo liczona - przy zatrzymaniu jej żądania dostają błąd
+        self.batch: list = []
+        self.closed = False
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='predict')
+        self.batches = 0
+        self.items = 0
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Zatrzymuje pętlę partii; żądania w kolejce i w toku kończą się błędem zamiast wisieć"""
+        self.closed = True
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        waiting = list(self.batch)
+        while self.queue is not None and not self.queue.empty():
+            waiting.append(self.queue.get_nowait())
+        error = RuntimeError("Serwis predykcji jest zatrzymywany")
+        for _, future in waiting:
+            if not future.done():
+                future.set_exception(error)
+        self.batch = []
+        self.executor.shutdown(wait=True)
+
+    async def predict(self, listing: Dict[str, Any]) -> float:
+        if self.closed:
+            raise RuntimeError("Serwis predykcji jest zatrzymywany")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((listing, future))
+        return await future
+
+    async def _collect(self) -> list:
+        self.batch = batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Wszystko, co już czeka w kolejce, też trafia do partii
+        while len(batch) < self.max_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            listings = [listing for listing, _ in batch]
+            try:
+                prices = await loop.run_in_executor(self.executor, self.predictor.predict, listings)
+            except Exception as e:
+                logger.exception("Błąd predykcji partii")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self.batch = []
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), price in zip(batch, prices):
+                if not future.done():
+                    future.set_result(float(price))
+            self.batch = []
+
+
+def create_app(model_path: str = None, max_batch: int = 64, max_wait: float = 0.002,
+               comparables_path: str = INDEX_PATH) -> FastAPI:
+    state: Dict[str, Any] = {}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Model i słowniki kategorii ładowane raz, przy starcie
+        predictor = PricePredictor(model_path or os.environ.get('PRICE_MODEL'))
+        batcher = MicroBatcher(predictor, max_batch=max_batch, max_wait=max_wait)
+        batcher.start()
+        comparables = ComparablesIndex.load(comparables_path) if os.path.exists(comparables_path) else None
+        state.update(predictor=predictor, batcher=batcher, comparables=comparables)
+        logger.info(f"Załadowano model {predictor.name}")
+        yield
+        await batcher.stop()
+
+    app = FastAPI(title="Housing price predictor", lifespan=lifespan)
+
+    @app.get('/health')
+    async def health():
+        batcher: MicroBatcher = state['batcher']
+        return {
+            'model': state['predictor'].name,
+            'batches': batcher.batches,
+            'mean_batch': batcher.items / batcher.batches if batcher.batches else 0.0,
+        }
+
+    @app.post('/predict', response_model=Prediction)
+    async def predict(listing: Listing):
+        data = listing.model_dump()
+        try:
+            price = await state['batcher'].predict(data)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Błąd predykcji: {e}")
+        return to_prediction(data, price)
+
+    @app.post('/predict/batch', response_model=List[Prediction])
+    async def predict_batch(listings: List[Listing]):
+        # Żądanie zbiorcze to już partia - jedno wywołanie modelu poza kolejką
+        data = [listing.model_dump() for listing in listings]
+        loop = asyncio.get_running_loop()
+        try:
+            prices = await loop.run_in_executor(state['batcher'].executor, state['predictor'].predict, data)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Błąd predykcji: {e}")
+        return [to_prediction(listing, float(price)) for listing, price in zip(data, prices)]
+
+    @app.post('/comparables', response_model=List[Comparable])
+    async def comparables(listing: Listing, k: int = 10):
+        index: ComparablesIndex = state['comparables']
+        if index is None:
+            raise HTTPException(status_code=503, detail="Brak indeksu ofert porównywalnych")
+        found = index.query(listing.model_dump(), k=k)
+        columns = list(Comparable.model_fields)
+        return found[columns].astype(object).where(found[columns].notna(), None).to_dict('records')
+
+    return app
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Serwis predykcji cen mieszkań")
+    parser.add_argument('--model', help="Plik modelu (domyślnie najnowszy z data/models)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0, help="Okno zbierania partii")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(create_app(args.model, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000),
+                host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# storage/listing_sink.py
+import json
+import os
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import pyarrow.parquet as pq
+
+from .listing_store import ListingStore
+from .records import to_table
+
+logger = logging.getLogger(__name__)
+
+
+class ListingSink:
+    """Strumieniowy zapis ogłoszeń z punktami kontrolnymi
+
+    Każde ogłoszenie od razu trafia do pliku JSON Lines, a co `row_group_size`
+    ogłoszeń do katalogu zrzutu w magazynie (`ListingStore`) jako kolejny
+    plik `part-NNNNN.parquet`. Z `validator` (`BatchValidator`) każda taka
+    partia jest najpierw walidowana - odrzucone ogłoszenia trafiają z
+    przyczynami do pliku kwarantanny JSON Lines zamiast do magazynu, a
+    zaakceptowane dodatkowo do `on_accept`.
+    Po każdej ukończonej stronie wyników zapisywany jest checkpoint, więc
+    przerwany crawl można wznowić (`resume=True`) od następnej strony.
+    """
+
+    def __init__(self, directory: str = 'data/raw', prefix: str = 'otodom',
+                 row_group_size: int = 500, resume: bool = False, store: ListingStore = None,
+                 run_id: str = None, validator=None,
+                 on_accept: Callable[[List[Dict[str, Any]]], None] = None):
+        self.directory = directory
+        self.validator = validator
+        self.on_accept = on_accept
+        self.store = store or ListingStore()
+        self.prefix = prefix
+        self.row_group_size = row_group_size
+        self.checkpoint_path = os.path.join(directory, f'{prefix}_checkpoint.json')
+        self.buffer: List[Dict[str, Any]] = []
+        os.makedirs(directory, exist_ok=True)
+
+        state = self._load_checkpoint() if resume else None
+        if state and not state.get('completed'):
+            self.run_id = state['run_id']
+            self.last_page = state['last_page']
+            self.count = state['count']
+            self.parquet_rows = state['parquet_rows']
+            self.parts = state['parts']
+            self.rejected = state.get('rejected', 0)
+            self.quarantine_bytes = state.get('quarantine_bytes', 0)
+            self._restore(state['jsonl_bytes'])
+            self.store.mark_incomplete(self.run_id)
+            logger.info(f"Wznawiam zapis {self.run_id} od strony {self.last_page + 1}")
+        else:
+            if resume:
+                logger.info("Brak przerwanego crawlu do wznowienia - zaczynam nowy")
+            self.run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+            self.last_page = 0
+            self.count = 0
+            self.parquet_rows = 0
+            self.parts = 0
+            self.rejected = 0
+            self.quarantine_bytes = 0
+            os.makedirs(self.parquet_dir, exist_ok=True)
+
+        self.jsonl = open(self.jsonl_path, 'a', encoding='utf-8')
+
+    @property
+    def jsonl_path(self) -> str:
+        return os.path.join(self.directory, f'{self.prefix}_listings_{self.run_id}.jsonl')
+
+    @property
+    def quarantine_path(self) -> str:
+        return os.path.join(self.directory, f'{self.prefix}_quarantine_{self.run_id}.jsonl')
+
+    @property
+    def parquet_dir(self) -> str:
+        return self.store.run_dir(self.run_id)
+
+    @property
+    def next_page(self) -> int:
+        return self.last_page + 1
+
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _restore(self, jsonl_bytes: int):
+        """Obcina niedokończoną stronę i odtwarza bufor Parquet z JSON Lines"""
+        for name in os.listdir(self.parquet_dir):
+            if name.startswith('part-') and int(name[5:10]) >= self.parts:
+                os.remove(os.path.join(self.parquet_dir, name))
+        with open(self.jsonl_path, 'r+b') as f:
+            f.truncate(jsonl_bytes)
+        if os.path.exists(self.quarantine_path):
+            with open(self.quarantine_path, 'r+b') as f:
+                f.truncate(self.quarantine_bytes)
+        with open(self.jsonl_path, 'r', encoding='utf-8') as f:
+            for i, line in enumerate(f):
+                if i >= self.parquet_rows:
+                    self.buffer.append(json.loads(line))
+
+    def write(self, listing: Dict[str, Any]):
+        """Dopisuje jedno ogłoszenie"""
+        self.jsonl.write(json.dumps(dict(listing), ensure_ascii=False) + '\n')
+        self.buffer.append(listing)
+        self.count += 1
+        if len(self.buffer) >= self.row_group_size:
+            self.flush_parquet()
+
+    def flush_parquet(self):
+        """Zapisuje bufor jako kolejny plik Parquet (jedna grupa wierszy)"""
+        if not self.buffer:
+            return
+        listings, rejected = self.buffer, []
+        if self.validator:
+            listings, rejected = self.validator.validate(self.buffer)
+        if listings:
+            name = f'part-{self.parts:05d}.parquet'
+            path = os.path.join(self.parquet_dir, name)
+            # Kropka na początku - czytelnik magazynu pomija niedokończony plik
+            tmp_path = os.path.join(self.parquet_dir, f'.{name}.tmp')
+            pq.write_table(to_table(listings), tmp_path)
+            os.replace(tmp_path, path)
+            self.parts += 1
+        if rejected:
+            self.quarantine(rejected)
+        self.parquet_rows += len(self.buffer)
+        self.buffer = []
+        if self.on_accept and listings:
+            self.on_accept(listings)
+
+    def quarantine(self, rejected: List[Dict[str, Any]]):
+        """Dopisuje odrzucone ogłoszenia (z przyczynami) do pliku kwarantanny"""
+        with open(self.quarantine_path, 'a', encoding='utf-8') as f:
+            for record in rejected:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.quarantine_bytes = f.tell()
+        self.rejected += len(rejected)
+        logger.info(f"Kwarantanna: {len(rejected)} ogłoszeń odrzuconych przez walidację")
+
+    def checkpoint(self, page: int, completed: bool = False):
+        """Utrwala zapisane dane i zapamiętuje ostatnią ukończoną stronę"""
+        self.jsonl.flush()
+        os.fsync(self.jsonl.fileno())
+        self.last_page = page
+
+        state = {
+            'run_id': self.run_id,
+            'last_page': page,
+            'count': self.count,
+            'jsonl_bytes': self.jsonl.tell(),
+            'parquet_rows': self.parquet_rows,
+            'parts': self.parts,
+            'rejected': self.rejected,
+            'quarantine_bytes': self.quarantine_bytes,
+            'completed': completed,
+            'updated_at': datetime.now().isoformat(),
+        }
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def update_latest(self):
+        """Przestawia wskaźnik `<prefix>_latest` na bieżący zapis"""
+        for name, target in [(f'{self.prefix}_latest.jsonl', self.jsonl_path),
+                             (f'{self.prefix}_latest.parquet', self.parquet_dir)]:
+            link = os.path.join(self.directory, name)
+            tmp_link = link + '.tmp'
+            try:
+                if os.path.lexists(tmp_link):
+                    os.remove(tmp_link)
+                os.symlink(os.path.relpath(target, self.directory), tmp_link)
+                os.replace(tmp_link, link)
+            except OSError:
+                # System bez dowiązań symbolicznych - zapisujemy samą ścieżkę
+                with open(link + '.path', 'w', encoding='utf-8') as f:
+                    f.write(os.path.relpath(target, self.directory))
+
+    def abort(self):
+        """Zamyka plik bez oznaczania crawlu jako ukończonego - do wznowienia"""
+        self.jsonl.close()
+
+    def close(self):
+        """Kończy zapis: ostatnia grupa wierszy, znacznik `_SUCCESS`, checkpoint i wskaźnik latest"""
+        self.flush_parquet()
+        self.store.mark_complete(self.run_id)
+        self.checkpoint(self.last_page, completed=True)
+        self.jsonl.close()
+        if self.count:
+            self.update_latest()
@@ -0,0 +1,190 @@
+# storage/listing_store.py
+import ast
+import json
+import os
+import sys
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from storage.records import to_table
+    from storage.schema import LISTING_SCHEMA, PARTITION_SCHEMA, pandas_types
+else:
+    from .records import to_table
+    from .schema import LISTING_SCHEMA, PARTITION_SCHEMA, pandas_types
+
+logger = logging.getLogger(__name__)
+
+# Znacznik ukończonego zrzutu w katalogu run_id=... - zrzut bez niego jest jeszcze zapisywany
+SUCCESS_MARKER = '_SUCCESS'
+# Przyrostek zrzutów z ponownego parsowania archiwum (reparse.py), np. 20250726_reparse
+REPARSE_SUFFIX = '_reparse'
+
+
+def run_date(run_id: str) -> str:
+    """Data zrzutu z identyfikatora przebiegu, np. 20250726_212042 -> 2025-07-26"""
+    return f"{run_id[:4]}-{run_id[4:6]}-{run_id[6:8]}"
+
+
+class ListingStore:
+    """Magazyn ogłoszeń w Parquet z jawnym schematem
+
+    Każdy przebieg crawla (zrzut) to osobny katalog
+    `scrape_date=RRRR-MM-DD/run_id=.../part-NNNNN.parquet`, więc odczyt
+    może pominąć całe partycje i wczytać tylko potrzebne kolumny.
+    """
+
+    def __init__(self, root: str = 'data/store'):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def run_dir(self, run_id: str) -> str:
+        return os.path.join(self.root, f'scrape_date={run_date(run_id)}', f'run_id={run_id}')
+
+    def mark_complete(self, run_id: str):
+        """Oznacza zrzut jako ukończony (plik `_SUCCESS`)"""
+        open(os.path.join(self.run_dir(run_id), SUCCESS_MARKER), 'w').close()
+
+    def mark_incomplete(self, run_id: str):
+        """Zdejmuje znacznik ukończenia - zrzut będzie jeszcze dopisywany"""
+        path = os.path.join(self.run_dir(run_id), SUCCESS_MARKER)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def is_complete(self, run_id: str) -> bool:
+        return os.path.exists(os.path.join(self.run_dir(run_id), SUCCESS_MARKER))
+
+    def snapshots(self, include_incomplete: bool = False) -> List[Tuple[str, str]]:
+        """Lista zrzutów (scrape_date, run_id) od najstarszego
+
+        Domyślnie tylko zrzuty ukończone - zapisywany właśnie zrzut nie
+        trafia do indeksów ani ocen, dopóki nie ma znacznika `_SUCCESS`.
+        """
+        found = []
+        for date_dir in os.listdir(self.root):
+            if not date_dir.startswith('scrape_date='):
+                continue
+            for run_dir in os.listdir(os.path.join(self.root, date_dir)):
+                if not run_dir.startswith('run_id='):
+                    continue
+                if include_incomplete or os.path.exists(os.path.join(self.root, date_dir, run_dir, SUCCESS_MARKER)):
+                    found.append((date_dir.split('=', 1)[1], run_dir.split('=', 1)[1]))
+        return sorted(found)
+
+    def runs(self, completed: bool = True, include_reparse: bool = False) -> List[str]:
+        """Identyfikatory zrzutów do analiz, od najstarszego
+
+        Domyślnie tylko ukończone crawle: bez zrzutów w toku (brak `_SUCCESS`)
+        i bez zrzutów z reparse.py, które powtarzają oferty crawli z tych
+        samych dni. Tej listy używają indeks cen, trendy, deduplikacja,
+        trening i ocena modelu, więc wszystkie widzą te same dane.
+        """
+        return [run_id for _, run_id in self.snapshots(include_incomplete=not completed)
+                if include_reparse or not run_id.endswith(REPARSE_SUFFIX)]
+
+    def dataset(self) -> ds.Dataset:
+        return ds.dataset(
+            self.root,
+            format='parquet',
+            partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+            schema=pa.unify_schemas([LISTING_SCHEMA, PARTITION_SCHEMA]),
+            exclude_invalid_files=False,
+            ignore_prefixes=['.', '_'],
+        )
+
+    def _filter(self, start: str = None, end: str = None, runs: Sequence[str] = None):
+        expression = None
+        conditions = []
+        if start:
+            conditions.append(ds.field('scrape_date') >= start)
+        if end:
+            conditions.append(ds.field('scrape_date') <= end)
+        if runs is not None:
+            conditions.append(ds.field('run_id').isin(list(runs)))
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def read_table(self, columns: Sequence[str] = None, start: str = None, end: str = None,
+                   runs: Sequence[str] = None) -> pa.Table:
+        """Wczytuje wybrane kolumny z wybranych partycji jako tabelę Arrow"""
+        return self.dataset().to_table(columns=list(columns) if columns else None,
+                                       filter=self._filter(start, end, runs))
+
+    def read(self, columns: Sequence[str] = None, start: str = None, end: str = None,
+             runs: Sequence[str] = None):
+        """Wczytuje wybrane kolumny z wybranych partycji jako DataFrame
+
+        Liczby całkowite mają typ Int64, a kolumny słownikowe - category.
+        """
+        return self.read_table(columns, start, end, runs).to_pandas(types_mapper=pandas_types)
+
+    def scan(self, columns: Sequence[str] = None, start: str = None, end: str = None,
+             runs: Sequence[str] = None, batch_size: int = 64 * 1024):
+        """Strumień partii rekordów Arrow - pamięć nie rośnie z liczbą zrzutów"""
+        return self.dataset().to_batches(columns=list(columns) if columns else None,
+                                         filter=self._filter(start, end, runs),
+                                         batch_size=batch_size)
+
+    def write_run(self, run_id: str, listings: List[Dict[str, Any]]) -> str:
+        """Zapisuje cały zrzut naraz (np. import starszych plików)"""
+        directory = self.run_dir(run_id)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, 'part-00000.parquet')
+        pq.write_table(to_table(listings), path)
+        self.mark_complete(run_id)
+        return path
+
+    def import_file(self, file_path: str) -> Optional[str]:
+        """Importuje zrzut zapisany po staremu (CSV/JSON/JSONL) do magazynu"""
+        name = os.path.basename(file_path)
+        stem = name.split('.')[0]
+        run_id = stem[-15:]
+        if not (len(run_id) == 15 and run_id[8] == '_' and run_id.replace('_', '').isdigit()):
+            logger.warning(f"Pomijam {file_path} - brak znacznika czasu w nazwie")
+            return None
+
+        if file_path.endswith('.csv'):
+            import pandas as pd
+            records = pd.read_csv(file_path).astype(object).where(lambda df: df.notna(), None).to_dict('records')
+        elif file_path.endswith('.jsonl'):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        else:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+
+        return self.write_run(run_id, [normalize_listing(record) for record in records])
+
+
+def normalize_listing(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Doprowadza rekord ze starszego zapisu do typów ze schematu"""
+    listing = dict(record)
+    features = listing.get('features')
+    if isinstance(features, str):
+        try:
+            listing['features'] = list(ast.literal_eval(features))
+        except (ValueError, SyntaxError):
+            listing['features'] = [features]
+    for field in LISTING_SCHEMA:
+        value = listing.get(field.name)
+        if value is None:
+            continue
+        if pa.types.is_integer(field.type) and isinstance(value, float):
+            listing[field.name] = int(value)
+        elif pa.types.is_boolean(field.type) and isinstance(value, str):
+            listing[field.name] = value.lower() == 'true'
+    return listing
+
+
+if __name__ == "__main__":
+    store = ListingStore()
+    for path in sys.argv[1:]:
+        imported = store.import_file(path)
+        if imported:
+            print(f"Zaimportowano {path} -> {imported}")
@@ -0,0 +1,206 @@
+# storage/records.py
+import json
+import threading
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+import pyarrow as pa
+
+from .schema import LISTING_SCHEMA, pandas_types
+
+# Pola o niewielkiej liczbie powtarzających się wartości - trzymane jako kody
+INTERNED_FIELDS = ['floor', 'finish_state', 'market', 'ownership', 'advertiser_type', 'building_type',
+                   'building_material', 'district', 'city', 'search']
+FIELDS = LISTING_SCHEMA.names
+_FIELD_SET = frozenset(FIELDS)
+_ABSENT = object()
+
+
+class Vocabulary:
+    """Wspólny słownik wartość <-> mały int, rosnący w miarę napotykania wartości"""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        for value in values:
+            self.code(value)
+
+    def code(self, value: str) -> int:
+        if not isinstance(value, str):
+            # Słownik trafia do Arrow jako kolumna tekstowa - liczba (np. piętro 3.0)
+            # zepsułaby `to_table` dla wszystkich kolejnych rekordów procesu
+            value = str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+        code = self.codes.get(value)
+        if code is None:
+            with self.lock:
+                code = self.codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(value)
+                    self.codes[value] = code
+        return code
+
+    def mask(self, values: Iterable[str]) -> int:
+        """Maska bitowa zbioru wartości"""
+        mask = 0
+        for value in values:
+            mask |= 1 << self.code(value)
+        return mask
+
+    def unmask(self, mask: int) -> List[str]:
+        values = []
+        code = 0
+        while mask:
+            if mask & 1:
+                values.append(self.values[code])
+            mask >>= 1
+            code += 1
+        return values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+# Słowniki wspólne dla wszystkich rekordów w procesie
+VOCABULARIES: Dict[str, Vocabulary] = {field: Vocabulary() for field in INTERNED_FIELDS}
+FEATURES = Vocabulary()
+
+
+class Listing(MutableMapping):
+    """Zwarty rekord ogłoszenia z interfejsem słownika
+
+    Pola ze schematu leżą w slotach zamiast w słowniku, wartości
+    kategoryczne jako kody ze wspólnego słownika (`VOCABULARIES`), a cechy
+    jako maska bitowa nad `FEATURES`. Z zewnątrz rekord zachowuje się jak
+    dotychczasowy `dict` - brakujące pole to brak klucza, nie None.
+
+    Cechy są zbiorem: po odczycie wracają w kolejności słownika, bez
+    powtórzeń. Kody obowiązują tylko w bieżącym procesie, więc rekord
+    przesyłany do innego procesu (pickle) podróżuje jako zwykły słownik.
+    """
+
+    __slots__ = FIELDS + ['_extra']
+
+    def __init__(self, data: Dict[str, Any] = None, **fields):
+        self._extra = None
+        if data:
+            self.update(data)
+        if fields:
+            self.update(fields)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in VOCABULARIES:
+            code = getattr(self, key, _ABSENT)
+            if code is _ABSENT:
+                raise KeyError(key)
+            return None if code is None else VOCABULARIES[key].values[code]
+        if key == 'features':
+            mask = getattr(self, key, _ABSENT)
+            if mask is _ABSENT:
+                raise KeyError(key)
+            return None if mask is None else FEATURES.unmask(mask)
+        if key in _FIELD_SET:
+            value = getattr(self, key, _ABSENT)
+            if value is _ABSENT:
+                raise KeyError(key)
+            return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key: str, value: Any):
+        if key in VOCABULARIES:
+            setattr(self, key, None if value is None else VOCABULARIES[key].code(value))
+        elif key == 'features':
+            setattr(self, key, None if value is None else FEATURES.mask(value))
+        elif key in _FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str):
+        if key in _FIELD_SET:
+            if not hasattr(self, key):
+                raise KeyError(key)
+            delattr(self, key)
+        elif self._extra is not None:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for key in FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f'Listing({self.to_dict()!r})'
+
+    def __reduce__(self):
+        return Listing, (self.to_dict(),)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text: str) -> 'Listing':
+        return cls(json.loads(text))
+
+
+def to_table(listings: Sequence[Dict[str, Any]]) -> pa.Table:
+    """Tabela Arrow z rekordów; kolumny kategoryczne zwartych rekordów bez dekodowania
+
+    Kody `Listing` trafiają wprost jako indeksy tablic słownikowych, więc
+    wartości tekstowe nie są odtwarzane dla każdego rekordu osobno.
+    """
+    compact = all(isinstance(listing, Listing) for listing in listings)
+    arrays = []
+    for field in LISTING_SCHEMA:
+        name = field.name
+        if compact and name in VOCABULARIES:
+            codes = pa.array([getattr(listing, name, None) for listing in listings], type=pa.int32())
+            dictionary = pa.array(VOCABULARIES[name].values, type=pa.string())
+            array = pa.DictionaryArray.from_arrays(codes, dictionary)
+            arrays.append(array if pa.types.is_dictionary(field.type) else array.cast(field.type))
+        else:
+            arrays.append(pa.array([listing.get(name) for listing in listings], type=field.type))
+    return pa.Table.from_arrays(arrays, schema=LISTING_SCHEMA)
+
+
+def from_table(table: pa.Table) -> List[Listing]:
+    """Rekordy z tabeli Arrow; brak wartości (null) to brak pola"""
+    columns = {name: table.column(name).to_pylist() for name in table.column_names if name in FIELDS}
+    listings = []
+    for i in range(table.num_rows):
+        listing = Listing()
+        for name, values in columns.items():
+            if values[i] is not None:
+                listing[name] = values[i]
+        listings.append(listing)
+    return listings
+
+
+def to_frame(listings: Sequence[Dict[str, Any]]):
+    """DataFrame w typach magazynu (Int64, category, listy cech)"""
+    return to_table(listings).to_pandas(types_mapper=pandas_types)
+
+
+def from_frame(df) -> List[Listing]:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return from_table(table.select([name for name in table.column_names if name in FIELDS]))
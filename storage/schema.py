@@ -0,0 +1,56 @@
+# storage/schema.py
+import pyarrow as pa
+
+# Kolumny o niewielkiej liczbie powtarzających się wartości - kodowane słownikowo
+CATEGORICAL_COLUMNS = ['market', 'finish_state', 'ownership', 'building_type']
+
+
+def _category() -> pa.DataType:
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+# Schemat ogłoszenia zwracanego przez OtodomScraper.parse_content
+LISTING_SCHEMA = pa.schema([
+    ('title', pa.string()),
+    ('price', pa.int64()),
+    ('area', pa.float64()),
+    ('rooms', pa.int64()),
+    ('floor', pa.string()),
+    ('rent', pa.int64()),
+    ('finish_state', _category()),
+    ('market', _category()),
+    ('ownership', _category()),
+    ('advertiser_type', pa.string()),
+    ('year_built', pa.int64()),
+    ('elevator', pa.bool_()),
+    ('building_type', _category()),
+    ('building_material', pa.string()),
+    ('address', pa.string()),
+    ('district', pa.string()),
+    ('city', pa.string()),
+    ('latitude', pa.float64()),
+    ('longitude', pa.float64()),
+    ('features', pa.list_(pa.string())),
+    ('description', pa.string()),
+    ('url', pa.string()),
+    ('scraped_at', pa.string()),
+    # Zakres wyszukiwania crawla rozproszonego, np. wynajem/mieszkanie/pomorskie
+    ('search', pa.string()),
+])
+
+# Kolumny partycji magazynu ogłoszeń (katalogi w stylu Hive)
+PARTITION_SCHEMA = pa.schema([
+    ('scrape_date', pa.string()),
+    ('run_id', pa.string()),
+])
+
+
+def pandas_types(arrow_type: pa.DataType):
+    """Mapowanie typów przy to_pandas: liczby całkowite i bool z obsługą braków"""
+    import pandas as pd
+
+    if pa.types.is_integer(arrow_type):
+        return pd.Int64Dtype()
+    if pa.types.is_boolean(arrow_type):
+        return pd.BooleanDtype()
+    return None
@@ -0,0 +1,231 @@
+# storage/validation.py
+import time
+import logging
+from datetime import date
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analytics.history import extract_district
+from analytics.sketches import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+# Pola liczbowe ogłoszenia; całkowite muszą mieć wartość całkowitą (schemat int64)
+NUMERIC_FIELDS = ['price', 'area', 'rooms', 'rent', 'year_built', 'latitude', 'longitude']
+INTEGER_FIELDS = ['price', 'rooms', 'rent', 'year_built']
+# Kolumny potrzebne do walidacji
+VALIDATED_COLUMNS = NUMERIC_FIELDS + ['floor', 'district', 'address', 'search']
+
+# Dopuszczalne zakresy (włącznie); cena i cena za m² zależą od rodzaju transakcji
+RANGES = {
+    'area': (8.0, 1000.0),
+    'rooms': (1, 20),
+    'rent': (0, 20_000),
+    'year_built': (1800, date.today().year + 6),
+    'latitude': (49.0, 55.0),
+    'longitude': (14.0, 24.2),
+}
+PRICE_RANGES = {'sprzedaz': (50_000, 50_000_000), 'wynajem': (300, 100_000)}
+PRICE_M2_RANGES = {'sprzedaz': (1_000.0, 100_000.0), 'wynajem': (5.0, 500.0)}
+# Transakcja ogłoszeń bez zakresu wyszukiwania (OtodomScraper.search_path)
+DEFAULT_TRANSACTION = 'sprzedaz'
+
+# Piętro po normalizacji parsera: słowo, "> 10" albo numer (opcjonalnie "/liczba pięter")
+FLOOR_RE = r'^(?:parter|suterena|poddasze|> 10|\d{1,2})(?:/\d{1,2})?$'
+
+# Powierzchnia na pokój (m²) - poza zakresem pokoje i powierzchnia sobie przeczą
+AREA_PER_ROOM = (6.0, 200.0)
+
+# Odstające ceny za m²: odporny z-score (Iglewicz-Hoaglin) na log(ceny za m²)
+# w grupie (transakcja, dzielnica); mniejsze grupy porównywane z całą transakcją
+MAD_THRESHOLD = 3.5
+MAD_MIN_GROUP = 10
+# Dzielnica z co najmniej tyloma zaakceptowanymi wcześniej ofertami ma skalę z historii
+HISTORY_MIN_COUNT = 50
+# Dolne ograniczenie MAD w skali log - partia prawie identycznych cen nie odrzuca sąsiadów
+MAD_FLOOR = 0.05
+
+CHECKS = ['type', 'range', 'floor', 'rooms_area', 'price_m2_outlier']
+
+
+def listing_frame(listings: Sequence[Dict[str, Any]]) -> pd.DataFrame:
+    """Kolumny potrzebne do walidacji z listy ogłoszeń (bez konwersji typów)"""
+    return pd.DataFrame({name: pd.Series([listing.get(name) for listing in listings], dtype=object)
+                         for name in VALIDATED_COLUMNS})
+
+
+def _numeric(values: pd.Series, integer: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """(wartości float64 z NaN w miejsce braków i błędów, maska błędnego typu)"""
+    kinds = values.map(type)
+    valid = kinds.isin([int, float, np.int64, np.float64]).to_numpy()
+    missing = values.isna().to_numpy()
+    numbers = pd.to_numeric(values.where(valid), errors='coerce').to_numpy(dtype=np.float64)
+    bad = ~valid & ~missing
+    if integer:
+        fractional = np.isfinite(numbers) & (numbers != np.floor(numbers))
+        bad |= fractional
+        numbers[fractional] = np.nan
+    return numbers, bad
+
+
+class BatchValidator:
+    """Walidacja całych partii ogłoszeń - wszystkie reguły liczone kolumnowo
+
+    Kolejne reguły (`CHECKS`) dają maski wierszy błędnych; wiersz z choć
+    jedną flagą trafia do kwarantanny z listą przyczyn. Czas i liczba
+    wierszy każdej reguły są sumowane (`report`) i - gdy podano metryki
+    crawla - zapisywane jako etap `validate_<reguła>`.
+
+    Partia z crawla jest mała (500 ofert), więc dzielnice mają w niej po
+    kilka ofert. Zaakceptowane ceny za m² trafiają do szkiców kwantyli
+    (transakcja, dzielnica) i od `HISTORY_MIN_COUNT` ofert to one dają
+    medianę i skalę (MAD ≈ połowa rozstępu międzykwartylowego w skali log).
+    """
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        self.history: Dict[Tuple[str, str], QuantileSketch] = {}
+        self.stats = {name: {'rows': 0, 'seconds': 0.0, 'rejected': 0} for name in CHECKS}
+        self.batches = 0
+        self.rows = 0
+        self.rejected = 0
+
+    def _record(self, name: str, rows: int, started: float, bad: np.ndarray):
+        seconds = time.perf_counter() - started
+        rejected = int(bad.sum())
+        stats = self.stats[name]
+        stats['rows'] += rows
+        stats['seconds'] += seconds
+        stats['rejected'] += rejected
+        if self.metrics:
+            self.metrics.observe(f'validate_{name}', seconds)
+            if rejected:
+                self.metrics.increment(f'rejected_{name}', rejected)
+
+    def check_frame(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Maski wierszy błędnych dla każdej reguły"""
+        rows = len(df)
+        masks = {}
+
+        started = time.perf_counter()
+        numbers, bad = {}, np.zeros(rows, dtype=bool)
+        for name in NUMERIC_FIELDS:
+            numbers[name], wrong = _numeric(df[name], name in INTEGER_FIELDS)
+            bad |= wrong
+        masks['type'] = bad
+        self._record('type', rows, started, bad)
+
+        started = time.perf_counter()
+        transaction = (df['search'].astype('string').str.split('/', n=1).str[0]
+                       .fillna(DEFAULT_TRANSACTION).to_numpy(dtype=object))
+        price, area = numbers['price'], numbers['area']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price_m2 = np.where(area > 0, price / area, np.nan)
+        bad = np.zeros(rows, dtype=bool)
+        # Porównania z NaN są fałszywe - brak wartości nie jest błędem zakresu
+        for name, (low, high) in RANGES.items():
+            bad |= (numbers[name] < low) | (numbers[name] > high)
+        for kind in PRICE_RANGES:
+            rows_of_kind = transaction == kind
+            low, high = PRICE_RANGES[kind]
+            bad |= rows_of_kind & ((price < low) | (price > high))
+            low, high = PRICE_M2_RANGES[kind]
+            bad |= rows_of_kind & ((price_m2 < low) | (price_m2 > high))
+        masks['range'] = bad
+        self._record('range', rows, started, bad)
+
+        started = time.perf_counter()
+        floor = df['floor'].astype('string').str.strip()
+        bad = (floor.notna() & ~floor.str.match(FLOOR_RE).fillna(False)).to_numpy(dtype=bool)
+        masks['floor'] = bad
+        self._record('floor', rows, started, bad)
+
+        started = time.perf_counter()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            per_room = area / numbers['rooms']
+        bad = (per_room < AREA_PER_ROOM[0]) | (per_room > AREA_PER_ROOM[1])
+        masks['rooms_area'] = bad
+        self._record('rooms_area', rows, started, bad)
+
+        started = time.perf_counter()
+        clean = ~(masks['type'] | masks['range'] | masks['rooms_area']) & (price_m2 > 0)
+        log_m2 = np.log(np.where(clean, price_m2, np.nan))
+        keys = [transaction, extract_district(df).fillna('').to_numpy(dtype=object)]
+        groups = pd.Series(log_m2).groupby(keys).indices
+        bad = self._outliers(log_m2, keys, groups)
+        masks['price_m2_outlier'] = bad
+        self._record('price_m2_outlier', rows, started, bad)
+
+        accepted = np.isfinite(log_m2) & ~(masks['floor'] | bad)
+        for key, indices in groups.items():
+            values = price_m2[indices][accepted[indices]]
+            if len(values):
+                self.history.setdefault(key, QuantileSketch()).add(values)
+        return masks
+
+    def _outliers(self, log_m2: np.ndarray, keys: List[np.ndarray],
+                  groups: Dict[Tuple[str, str], np.ndarray]) -> np.ndarray:
+        """Odporny z-score log(ceny za m²) w grupie (transakcja, dzielnica)"""
+        values = pd.Series(log_m2)
+        median = np.full(len(values), np.nan)
+        mad = np.full(len(values), np.nan)
+        # Najpierw cała transakcja, potem dzielnice wystarczająco liczne, by mieć własną skalę
+        for level in (keys[:1], keys):
+            grouped = values.groupby(level)
+            size = grouped.transform('count').to_numpy()
+            group_median = grouped.transform('median').to_numpy()
+            group_mad = (values - group_median).abs().groupby(level).transform('median').to_numpy()
+            enough = size >= MAD_MIN_GROUP
+            median[enough] = group_median[enough]
+            mad[enough] = group_mad[enough]
+        # Dzielnice znane z poprzednich partii - skala ze szkicu zamiast z kilku ofert partii
+        for key, indices in groups.items():
+            sketch = self.history.get(key)
+            if sketch is not None and sketch.count >= HISTORY_MIN_COUNT:
+                low, mid, high = (np.log(sketch.quantile(q)) for q in (0.25, 0.5, 0.75))
+                median[indices] = mid
+                mad[indices] = (high - low) / 2
+        with np.errstate(invalid='ignore'):
+            score = 0.6745 * np.abs(log_m2 - median) / np.maximum(mad, MAD_FLOOR)
+        return score > MAD_THRESHOLD
+
+    def validate(self, listings: Sequence[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """(zaakceptowane ogłoszenia, odrzucone jako {'reasons': [...], 'listing': {...}})"""
+        if not listings:
+            return [], []
+        masks = self.check_frame(listing_frame(listings))
+        flags = np.column_stack([masks[name] for name in CHECKS])
+        rejected_rows = np.flatnonzero(flags.any(axis=1))
+
+        self.batches += 1
+        self.rows += len(listings)
+        self.rejected += len(rejected_rows)
+        if self.metrics and len(rejected_rows):
+            self.metrics.increment('quarantined', len(rejected_rows))
+        if not len(rejected_rows):
+            return list(listings), []
+
+        rejected_set = set(rejected_rows.tolist())
+        accepted = [listing for i, listing in enumerate(listings) if i not in rejected_set]
+        rejected = [{'reasons': [CHECKS[j] for j in np.flatnonzero(flags[i])], 'listing': dict(listings[i])}
+                    for i in rejected_rows]
+        return accepted, rejected
+
+    def report(self) -> Dict[str, Any]:
+        """Przepustowość i liczba odrzuceń każdej reguły"""
+        checks = {}
+        for name, stats in self.stats.items():
+            checks[name] = {
+                **stats,
+                'rows_per_sec': stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0,
+            }
+        seconds = sum(stats['seconds'] for stats in self.stats.values())
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'rejected': self.rejected,
+            'rows_per_sec': self.rows / seconds if seconds else 0.0,
+            'checks': checks,
+        }
@@ -0,0 +1,94 @@
+# tests/conftest.py
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class ScriptedServer:
+    """Lokalny serwer HTTP z zaplanowanymi odpowiedziami dla każdej ścieżki
+
+    `script(path, *responses)` kolejkuje odpowiedzi - słowniki z kluczami
+    `status`, `headers`, `body`, `delay` (s przed nagłówkami) i `truncate`
+    (liczba bajtów treści wysłanych przed zerwaniem połączenia). Po
+    wyczerpaniu kolejki ścieżka odpowiada 200 z treścią równą ścieżce.
+    """
+
+    def __init__(self):
+        self.responses = defaultdict(deque)
+        self.hits = defaultdict(int)
+        self.times = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def script(self, path: str, *responses):
+        self.responses[path].extend(responses)
+
+    def _next(self, path: str) -> dict:
+        with self.lock:
+            self.hits[path] += 1
+            self.times.append(time.monotonic())
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            queue = self.responses[path]
+            return queue.popleft() if queue else {}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                response = server._next(self.path)
+                try:
+                    time.sleep(response.get('delay', 0.0))
+                    body = response.get('body', self.path.encode())
+                    self.send_response(response.get('status', 200))
+                    for name, value in response.get('headers', {}).items():
+                        self.send_header(name, value)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    if 'truncate' in response:
+                        self.wfile.write(body[:response['truncate']])
+                        self.wfile.flush()
+                        self.close_connection = True
+                        return
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def server():
+    with ScriptedServer() as scripted:
+        yield scripted
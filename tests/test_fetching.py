@@ -0,0 +1,52 @@
+# tests/test_fetching.py
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapers.base_scraper import BaseScraper
+
+OFFERS = 8
+
+
+class LocalScraper(BaseScraper):
+    """Scraper stron z lokalnego serwera testowego"""
+
+    def get_listings_urls(self, page, search=None):
+        return [f'{self.base_url}/oferta-{page}-{i}' for i in range(OFFERS)] if page == 1 else []
+
+    def parse_listing(self, soup):
+        return {'title': soup.get_text(), 'price': 500_000}
+
+
+def test_listings_are_fetched_concurrently(server):
+    for i in range(OFFERS):
+        server.script(f'/oferta-1-{i}', {'delay': 0.2})
+    scraper = LocalScraper(server.base_url, delay=0, concurrency=4)
+
+    started = time.monotonic()
+    listings = scraper.scrape_all(max_pages=1, incremental=False)
+    elapsed = time.monotonic() - started
+
+    assert sorted(listing['url'] for listing in listings) == sorted(
+        f'{server.base_url}/oferta-1-{i}' for i in range(OFFERS))
+    # Limit równoległości (AIMD) zaczyna od połowy `concurrency` i nie przekracza całości
+    assert 2 <= server.max_in_flight <= 4
+    assert elapsed < OFFERS * 0.2 / 1.5
+
+
+def test_rate_limiter_spaces_requests_to_host(server):
+    scraper = LocalScraper(server.base_url, delay=0.1, concurrency=4, burst=1)
+
+    started = time.monotonic()
+    listings = scraper.scrape_all(max_pages=1, incremental=False)
+    elapsed = time.monotonic() - started
+
+    assert len(listings) == OFFERS
+    # Kubełek tokenów: jedno żądanie na `delay` mimo czterech wątków pobierających
+    gaps = np.diff(sorted(server.times))
+    assert gaps.min() >= 0.08
+    assert elapsed >= (OFFERS - 1) * 0.1 * 0.9
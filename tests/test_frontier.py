@@ -0,0 +1,107 @@
+# tests/test_frontier.py
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapers.base_scraper import BaseScraper
+from scrapers.frontier import CrawlFrontier, FrontierWorker
+from scrapers.listing_index import ListingIndex
+from storage.listing_sink import ListingSink
+from storage.listing_store import ListingStore
+
+PAGES = 3
+PER_PAGE = 5
+LEASE = 0.5
+
+
+class Interrupted(Exception):
+    pass
+
+
+class FakeScraper(BaseScraper):
+    """Syntetyczne strony wyników zakresu bez sieci"""
+
+    def __init__(self, index_path: str):
+        super().__init__('http://example.invalid', delay=0, index_path=index_path)
+
+    def search_url(self, search, page):
+        return f'http://example.invalid/wyniki/{search}?page={page}'
+
+    def fetch_listings_urls(self, page, search=None):
+        if page > PAGES:
+            return []
+        return [f'http://example.invalid/oferta-{page}-{i}' for i in range(PER_PAGE)]
+
+    def get_listings_urls(self, page, search=None):
+        return self.fetch_listings_urls(page, search)
+
+    def fetch_listing(self, url):
+        return f'<html><title>{url}</title></html>'.encode()
+
+    def parse_listing(self, soup):
+        return {'title': soup.title.string, 'price': 500_000, 'area': 50.0, 'rooms': 2}
+
+
+def crawl(tmp_path, name, kill_after=None):
+    """Crawl procesu roboczego jak w crawl_worker.py; z `kill_after` przerwany i wznowiony"""
+    root = tmp_path / name
+    store = ListingStore(str(root / 'store'))
+    index_path = str(root / 'index.sqlite')
+    frontier = CrawlFrontier(str(root / 'frontier.sqlite'), lease_timeout=LEASE)
+    frontier.add_search(FakeScraper(index_path).search_url('scope', 1), 'scope', 1)
+
+    def open_sink(resume=False):
+        return ListingSink(str(root / 'raw'), prefix='otodom_w1', store=store, run_id='20250106_120000_w1',
+                           row_group_size=3, resume=resume)
+
+    def run(sink, on_listing):
+        worker = FrontierWorker(FakeScraper(index_path), frontier, 'w1', batch_size=4)
+        worker.run(on_listing=on_listing, on_batch_done=lambda: sink.checkpoint(sink.next_page),
+                   idle_timeout=LEASE * 3, poll_interval=0.05)
+
+    sink = open_sink()
+    seen = 0
+
+    def on_listing(listing):
+        nonlocal seen
+        seen += 1
+        if kill_after is not None and seen > kill_after:
+            raise Interrupted
+        sink.write(listing)
+
+    try:
+        run(sink, on_listing)
+    except Interrupted:
+        sink.abort()
+        # Dzierżawa zabitego procesu wygasa, jego zadania wracają do kolejki
+        time.sleep(LEASE + 0.1)
+        sink = open_sink(resume=True)
+        # Indeks zna tylko oferty utrwalone checkpointem - reszta będzie pobrana ponownie
+        with open(sink.jsonl_path, encoding='utf-8') as f:
+            saved = {json.loads(line)['url'] for line in f}
+        urls = [url for page in range(1, PAGES + 1) for url in FakeScraper(index_path).fetch_listings_urls(page)]
+        assert set(ListingIndex(index_path).lookup(urls)) <= saved
+        run(sink, sink.write)
+    sink.close()
+
+    with open(sink.jsonl_path, encoding='utf-8') as f:
+        jsonl = [json.loads(line)['url'] for line in f]
+    stored = store.read(columns=['url'], runs=store.runs())['url'].tolist()
+    return jsonl, stored, frontier.stats()
+
+
+# Przerwanie w środku partii ofert, na jej ostatniej ofercie i w kolejnej partii
+@pytest.mark.parametrize('kill_after', [2, 4, 9])
+def test_worker_resume_matches_uninterrupted_crawl(tmp_path, kill_after):
+    expected_jsonl, expected_stored, _ = crawl(tmp_path, 'full')
+    jsonl, stored, stats = crawl(tmp_path, 'resumed', kill_after=kill_after)
+
+    assert len(expected_jsonl) == PAGES * PER_PAGE
+    assert sorted(jsonl) == sorted(expected_jsonl)
+    assert sorted(stored) == sorted(expected_stored)
+    assert set(stats['offer']) == {'done'}
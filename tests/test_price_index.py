@@ -0,0 +1,76 @@
+# tests/test_price_index.py
+import os
+import sys
+
+import numpy as np
+import pytest
+from pandas.testing import assert_frame_equal
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.history import aggregate_history
+from analytics.price_index import PriceIndex
+from storage.listing_sink import ListingSink
+from storage.listing_store import REPARSE_SUFFIX, ListingStore
+
+DISTRICTS = ['Mokotów', 'Wola', 'Ursynów']
+
+
+def listings(n, seed):
+    rng = np.random.RandomState(seed)
+    return [{
+        'url': f'https://www.otodom.pl/pl/oferta/m-{seed}-{i}-ID{seed}x{i}',
+        'price': int(rng.randint(400_000, 1_500_000)),
+        'area': float(rng.randint(25, 120)),
+        'rooms': int(rng.randint(1, 5)),
+        'market': rng.choice(['pierwotny', 'wtórny']),
+        'address': f'ul. Prosta, {DISTRICTS[i % len(DISTRICTS)]}, Warszawa, mazowieckie',
+    } for i in range(n)]
+
+
+def crawl(store, raw, run_id, rows, index):
+    """Crawl jak w main.py: ogłoszenia do indeksu przez on_accept, commit po zamknięciu"""
+    def on_accept(accepted):
+        for listing in accepted:
+            index.add(listing, run_id)
+
+    sink = ListingSink(raw, store=store, run_id=run_id, row_group_size=50, on_accept=on_accept)
+    for listing in rows:
+        sink.write(listing)
+    sink.close()
+    index.commit(run_id, sink.parquet_rows - sink.rejected, store)
+    index.update(store)
+
+
+def test_incremental_index_matches_history(tmp_path):
+    store = ListingStore(str(tmp_path / 'store'))
+    raw = str(tmp_path / 'raw')
+    index = PriceIndex()
+
+    # Dwa crawle w różnych tygodniach, zapisywane przyrostowo
+    crawl(store, raw, '20250106_120000', listings(300, 1), index)
+    crawl(store, raw, '20250113_120000', listings(200, 2), index)
+    # Zrzut z reparse.py tego samego dnia i zrzut przerwany w połowie - żaden nie jest liczony
+    store.write_run('20250106' + REPARSE_SUFFIX, listings(300, 1))
+    interrupted = ListingSink(raw, prefix='broken', store=store, run_id='20250113_180000', row_group_size=50)
+    for listing in listings(120, 3):
+        interrupted.write(listing)
+    interrupted.checkpoint(1)
+    interrupted.abort()
+    index.update(store)
+
+    assert index.runs == {'20250106_120000', '20250113_120000'}
+    history = aggregate_history(store).results()
+    by_district = history[history['grouping'] == 'district']
+    assert by_district['count'].sum() == 500
+    for row in by_district.itertuples():
+        cell = index.query(district=row.group, week=row.scrape_date)
+        assert cell['count'] == row.count
+        assert cell['mean_price'] == pytest.approx(row.mean_price)
+        assert cell['median_price'] == pytest.approx(row.median_price)
+        assert cell['median_price_m2'] == pytest.approx(row.median_price_m2)
+
+    # Indeks przebudowany od zera - ten sam stan co przyrostowy
+    rebuilt = PriceIndex.rebuild(store)
+    assert rebuilt.runs == index.runs
+    assert_frame_equal(rebuilt.table(by=['district', 'week']), index.table(by=['district', 'week']))
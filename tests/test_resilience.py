@@ -0,0 +1,162 @@
+# tests/test_resilience.py
+import os
+import sys
+import time
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapers.metrics import CrawlMetrics
+from scrapers.rate_limiter import HostRateLimiter, RateLimitedAdapter
+from scrapers.resilience import CircuitBreaker, CircuitOpenError, ResilientAdapter
+
+
+def session(rate: float = None, **kwargs):
+    """Sesja z łańcuchem jak w BaseScraper: limiter tempa pod warstwą ponowień"""
+    metrics = CrawlMetrics()
+    options = dict(backoff_base=0.01, timeout=(1.0, 2.0), metrics=metrics)
+    options.update(kwargs)
+    adapter = ResilientAdapter(RateLimitedAdapter(HostRateLimiter(rate=rate)), **options)
+    s = requests.Session()
+    s.mount('http://', adapter)
+    return s, adapter, metrics
+
+
+def test_retries_server_errors_until_success(server):
+    server.script('/a', {'status': 503}, {'status': 500})
+    s, _, metrics = session()
+
+    response = s.get(server.url('/a'))
+
+    assert response.status_code == 200
+    assert server.hits['/a'] == 3
+    assert metrics.counters['retries'] == 2
+
+
+def test_gives_up_after_max_retries(server):
+    server.script('/a', *[{'status': 502}] * 5)
+    s, _, metrics = session(max_retries=2)
+
+    assert s.get(server.url('/a')).status_code == 502
+    assert server.hits['/a'] == 3
+    assert metrics.counters['retries'] == 2
+
+
+def test_retry_after_is_respected_and_halves_concurrency(server):
+    server.script('/a', {'status': 429, 'headers': {'Retry-After': '1'}})
+    s, adapter, metrics = session(max_concurrency=8)
+    limiter, breaker = adapter.host_state(server.url('/a'))
+    initial = limiter.limit
+
+    started = time.monotonic()
+    response = s.get(server.url('/a'))
+
+    assert response.status_code == 200
+    assert time.monotonic() - started >= 0.95
+    assert metrics.counters['throttled'] == 1
+    # 429 to prośba o zwolnienie, nie awaria - bezpiecznik zostaje zamknięty
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert limiter.limit < initial
+
+
+def test_slow_response_times_out_and_is_retried(server):
+    server.script('/a', {'delay': 0.6})
+    s, _, metrics = session(timeout=(1.0, 0.2))
+
+    response = s.get(server.url('/a'))
+
+    assert response.content == b'/a'
+    assert server.hits['/a'] == 2
+    assert metrics.counters['retries'] == 1
+
+
+def test_truncated_body_is_retried(server):
+    server.script('/a', {'body': b'x' * 1000, 'truncate': 10})
+    s, _, metrics = session()
+
+    response = s.get(server.url('/a'))
+
+    assert response.content == b'/a'
+    assert server.hits['/a'] == 2
+    assert metrics.counters['retries'] == 1
+
+
+def test_circuit_opens_and_recovers_through_half_open_trial(server):
+    server.script('/a', {'status': 503}, {'status': 503}, {'status': 503})
+    s, adapter, metrics = session(max_retries=0, failure_threshold=2, reset_timeout=0.3)
+    _, breaker = adapter.host_state(server.url('/a'))
+
+    s.get(server.url('/a'))
+    assert breaker.state == CircuitBreaker.CLOSED
+    s.get(server.url('/a'))
+    assert breaker.state == CircuitBreaker.OPEN
+    assert metrics.counters['circuit_opened'] == 1
+
+    # Obwód otwarty - żądanie odrzucone bez wysyłania
+    with pytest.raises(CircuitOpenError):
+        s.get(server.url('/a'))
+    assert server.hits['/a'] == 2
+
+    # Po reset_timeout próbne żądanie; nieudane otwiera obwód ponownie
+    time.sleep(0.35)
+    assert s.get(server.url('/a')).status_code == 503
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.35)
+    assert s.get(server.url('/a')).status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert server.hits['/a'] == 4
+
+
+class BrokenAdapter(BaseAdapter):
+    """Adapter zgłaszający błąd spoza ponawianych (np. błąd programu)"""
+
+    def send(self, request, **kwargs):
+        raise ValueError("zepsuty adapter")
+
+    def close(self):
+        pass
+
+
+def test_half_open_trial_with_unexpected_error_reopens_circuit():
+    adapter = ResilientAdapter(BrokenAdapter(), reset_timeout=0.0)
+    request = requests.Request('GET', 'http://example.invalid/a').prepare()
+    _, breaker = adapter.host_state(request.url)
+    breaker.state, breaker.opened_at = CircuitBreaker.OPEN, 0.0
+
+    with pytest.raises(ValueError):
+        adapter.send(request)
+    # Zamiast utknąć w stanie półotwartym - kolejne próbne żądanie jest możliwe
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow()
+
+
+def test_fast_responses_raise_concurrency_limit(server):
+    s, adapter, _ = session(max_concurrency=8)
+    limiter, _ = adapter.host_state(server.url('/a'))
+    initial = limiter.limit
+
+    for _ in range(20):
+        s.get(server.url('/a'))
+
+    # +1/limit po każdej szybkiej odpowiedzi
+    assert initial < limiter.limit <= 8
+
+
+def test_rate_limiter_wait_is_not_counted_as_latency(server):
+    s, adapter, _ = session(rate=5.0)
+    limiter, _ = adapter.host_state(server.url('/a'))
+    initial = limiter.limit
+
+    started = time.monotonic()
+    for _ in range(4):
+        s.get(server.url('/a'))
+
+    # Trzy oczekiwania na token po 0.2 s - gdyby liczyły się do opóźnienia,
+    # odpowiedzi wyglądałyby na wolne i limit AIMD przestałby rosnąć
+    assert time.monotonic() - started >= 0.55
+    assert limiter.baseline < 0.1
+    assert limiter.limit > initial + 0.25
@@ -0,0 +1,77 @@
+# tests/test_resume.py
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapers.base_scraper import BaseScraper
+from storage.listing_sink import ListingSink
+from storage.listing_store import ListingStore
+
+PAGES = 4
+PER_PAGE = 5
+
+
+class Interrupted(Exception):
+    pass
+
+
+class FakeScraper(BaseScraper):
+    """Syntetyczne strony wyników bez sieci"""
+
+    def __init__(self, index_path: str):
+        super().__init__('http://example.invalid', delay=0, index_path=index_path)
+
+    def get_listings_urls(self, page, search=None):
+        return [f'http://example.invalid/oferta-{page}-{i}' for i in range(PER_PAGE)]
+
+    def fetch_listing(self, url):
+        return f'<html><title>{url}</title></html>'.encode()
+
+    def parse_listing(self, soup):
+        return {'title': soup.title.string, 'price': 500_000, 'area': 50.0, 'rooms': 2}
+
+
+def crawl(tmp_path, name, kill_after=None):
+    """Crawl w katalogu `<name>`; z `kill_after` przerwany po tylu ofertach i wznowiony"""
+    root = tmp_path / name
+    store = ListingStore(str(root / 'store'))
+    index_path = str(root / 'index.sqlite')
+    sink = ListingSink(str(root / 'raw'), store=store, row_group_size=3)
+    seen = 0
+
+    def on_listing(listing):
+        nonlocal seen
+        seen += 1
+        if kill_after is not None and seen > kill_after:
+            raise Interrupted
+        sink.write(listing)
+
+    try:
+        FakeScraper(index_path).scrape_all(max_pages=PAGES, on_listing=on_listing,
+                                           on_page_done=sink.checkpoint)
+    except Interrupted:
+        sink.abort()
+        sink = ListingSink(str(root / 'raw'), store=store, row_group_size=3, resume=True)
+        FakeScraper(index_path).scrape_all(max_pages=PAGES, start_page=sink.next_page,
+                                           on_listing=sink.write, on_page_done=sink.checkpoint)
+    sink.close()
+
+    with open(sink.jsonl_path, encoding='utf-8') as f:
+        jsonl = [json.loads(line)['url'] for line in f]
+    stored = store.read(columns=['url'], runs=[sink.run_id])['url'].tolist()
+    return jsonl, stored
+
+
+# Przerwanie w środku strony, tuż przed checkpointem i na pierwszej ofercie kolejnej strony
+@pytest.mark.parametrize('kill_after', [7, 2 * PER_PAGE, 2 * PER_PAGE + 1])
+def test_resume_matches_uninterrupted_crawl(tmp_path, kill_after):
+    expected_jsonl, expected_stored = crawl(tmp_path, 'full')
+    jsonl, stored = crawl(tmp_path, 'resumed', kill_after=kill_after)
+
+    assert len(expected_jsonl) == PAGES * PER_PAGE
+    assert sorted(jsonl) == sorted(expected_jsonl)
+    assert sorted(stored) == sorted(expected_stored)